@@ -1,2 +1,30 @@
 from .main import PayPay,PayPayLoginError,PayPayError,PayPayNetWorkError
+from .policy import RequestPolicy,RequestPolicies
+from .ratelimit import RateLimiter,TokenBucket
+from .metrics import Metrics,RequestRecord
+from .tracing import Tracer,FileExporter,OTLPHttpExporter,InMemoryExporter
+from .watcher import PaymentWatcher,PaymentEvent,BalanceWatcher
+from .chat import ChatCursor,ChatFanout,ChatMessage
+from .bulk import LinkResult
+from .links import LinkExtractor,ExtractedLink,extract_links
+from .inventory import Inventory,StockItem
+from .reconcile import LinkReconciler,LinkStatusChange
+from .results import DeviceHeaders,GetBalance,LinkInfo,CreateLink,SendMoney,P2PCode,Profile,P2PUser,InitializeChatRoom,BarcodeInfo
 __version__      = '1.0.0'
+
+# httpx / sqlite3 を使うものは、使われたときに初めて import する
+_LAZY = {
+    "AsyncPayPay": ".async_main",
+    "HistoryStore": ".history_store",
+    "Cassette": ".cassette",
+    "MockPayPayServer": ".mock_server",
+    "Outbox": ".outbox",
+}
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,602 @@
+import asyncio
+from uuid import uuid4
+
+try:
+    import httpx
+except Exception as e:
+    raise RuntimeError("AsyncPayPay を使うには httpx が必要です（pip install httpx）") from e
+
+from .policy import _is_retryable_result
+from .ratelimit import RateLimiter
+from .main import (
+    PayPay, PayPayError, PayPayLoginError, PayPayNetWorkError, RATE_LIMITED, WEB_API_HEADERS, _debug,
+    _raise_for_result, _strip_link, _refresh_data, _check_refresh,
+    _ALIVE_EXTRA_CALLS, _history_params, _point_history_params, _history_page_params, _history_items, _history_next,
+    _parse_time, _history_reached, _balance_params, _parse_balance,
+    _link_info_params, _parse_link_info, _link_receive_payload, _link_reject_payload, _link_cancel_payload,
+    _create_link_payload, _parse_create_link, _send_money_payload, _parse_send_money,
+    _send_message_payload, _p2pcode_payload, _parse_p2pcode, _profile_params, _parse_profile,
+    _money_priority_payload, _chat_rooms_params, _chat_room_messages_params,
+    _search_p2puser_payload, _parse_p2puser, _initialize_chatroom_payload,
+    _parse_initialize_chatroom, _parse_barcode_info
+)
+from .metrics import RequestTimer
+from .singleflight import AsyncSingleFlight, _flight_key
+from .bulk import aiter_many
+
+class _RateLimitedTransport(httpx.AsyncHTTPTransport):
+    """送信前に RateLimiter の予算を消費するトランスポート"""
+    def __init__(self, rate_limiter: RateLimiter, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(**kwargs)
+
+    async def throttle(self, request) -> None:
+        """予算を消費する（足りなければ PayPayError。カセットの再生時にも呼ばれる）"""
+        if not await self.rate_limiter.acquire_async(str(request.url)):
+            raise PayPayError(RATE_LIMITED)
+
+    async def handle_async_request(self, request):
+        await self.throttle(request)
+        return await super().handle_async_request(request)
+
+class AsyncPayPay(PayPay):
+    def __init__(self, phone: str = None, password: str = None, device_uuid: str = None,
+                 client_uuid: str = str(uuid4()), access_token: str = None, proxy=None,
+                 link_info_ttl: float = 5.0, refresh_token: str = None, auto_refresh: bool = True,
+                 refresh_margin: float = 60.0, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 5.0, policies=None, rate_limiter: RateLimiter = None,
+                 keep_raw: bool = True, json_codec="auto", metrics=None, tracer=None, cassette=None,
+                 single_flight: bool = False):
+        """
+        asyncio 版 PayPay クライアント
+
+        API 呼び出しは httpx.AsyncClient のコネクションプール上で行います。
+        ログインフロー（WAF 回避を含む）は同期版の処理をスレッドで実行します。
+
+        Args:
+            phone: 電話番号（ハイフンあり/なし）
+            password: パスワード
+            device_uuid: デバイスUUID（省略時は自動生成）
+            client_uuid: クライアントUUID
+            access_token: アクセストークン（既に持っている場合）
+            proxy: プロキシ設定
+            link_info_ttl: 送金リンク情報キャッシュの有効秒数（0 で無効）
+            refresh_token: リフレッシュトークン（既に持っている場合）
+            auto_refresh: 期限切れ前のトークン更新と、S0001 時の更新＋GET の再試行を自動で行う
+            refresh_margin: 有効期限の何秒前に更新するか
+            max_connections: 同時接続数の上限
+            max_keepalive_connections: 維持する keep-alive 接続数の上限
+            keepalive_expiry: アイドルな keep-alive 接続を閉じるまでの秒数
+            policies: エンドポイントごとのタイムアウト・再試行設定（RequestPolicies）
+            rate_limiter: bff / p2p / portal ごとのクライアント側レート制限（RateLimiter）
+            keep_raw: 結果型に raw（レスポンス全体）を保持するか
+            json_codec: リクエスト / レスポンスの JSON コーデック（"auto" / "orjson" / "ujson" / "stdlib"）
+            metrics: 呼び出しごとの計測結果を受け取るオブザーバー（Metrics、または observe(record) を持つもの）
+            tracer: ログインフローの各ステップをスパンとして記録する Tracer
+            cassette: 通信を記録 / 再生する Cassette（オフラインでのベンチマーク・回帰テスト用）
+            single_flight: 同時に来た同じ GET を 1 回の通信にまとめ、結果を共有する（POST には適用しない）
+
+        接続の事前確立は await client.awarm_up()、snapshot() からの復元は await AsyncPayPay.arestore() で行います
+        （同期版の warm_up() / restore() は使えません）。
+        """
+        super().__init__(phone=phone, password=password, device_uuid=device_uuid,
+                         client_uuid=client_uuid, access_token=access_token, proxy=proxy,
+                         link_info_ttl=link_info_ttl, refresh_token=refresh_token,
+                         auto_refresh=auto_refresh, refresh_margin=refresh_margin,
+                         policies=policies, rate_limiter=rate_limiter, keep_raw=keep_raw,
+                         json_codec=json_codec, metrics=metrics, tracer=tracer, cassette=cassette)
+        self._flight = AsyncSingleFlight() if single_flight else None
+
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_keepalive_connections,
+                              keepalive_expiry=keepalive_expiry)
+        proxy_url = self.proxy.get("https") if isinstance(self.proxy, dict) else None
+        if rate_limiter:
+            transport = _RateLimitedTransport(rate_limiter, limits=limits, proxy=proxy_url)
+        else:
+            transport = httpx.AsyncHTTPTransport(limits=limits, proxy=proxy_url)
+        if cassette is not None:
+            transport = cassette.async_transport(transport)
+        # rate_limiter / cassette を含むトランスポート（MockPayPayServer.attach はこれを包む）
+        self.transport = transport
+        self.client = httpx.AsyncClient(transport=transport, timeout=None)
+        # link_check(web_api=True) 用。アプリの通信で受け取った Cookie を www に送らないよう分ける
+        self._web_client = httpx.AsyncClient(transport=transport, timeout=None)
+        self._async_refresh_lock = asyncio.Lock()
+        self._refresh_task = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """コネクションプールを閉じる"""
+        self.stop_auto_refresh()
+        await self.client.aclose()
+        await self._web_client.aclose()
+        self.session.close()
+
+    def warm_up(self, connections: int = 1) -> None:
+        raise TypeError("AsyncPayPay では await client.awarm_up() を使ってください")
+
+    async def awarm_up(self, connections: int = 1) -> None:
+        """app4.paypay.ne.jp / www.paypay.ne.jp への TLS 接続を先に張ってプールに入れておく（PayPay.warm_up の asyncio 版）"""
+        async def touch(url):
+            try:
+                await self.client.head(url, timeout=10)
+            except (httpx.HTTPError, PayPayError, PayPayNetWorkError) as e:
+                _debug("warm up failed:", url, repr(e))
+
+        urls = ["https://app4.paypay.ne.jp/", "https://www.paypay.ne.jp/"] * max(1, connections)
+        await asyncio.gather(*(touch(url) for url in urls))
+
+    async def _refresh_access_token(self, stale_token: str) -> None:
+        """トークン更新を 1 回にまとめる（PayPay._refresh_access_token の asyncio 版）"""
+        async with self._async_refresh_lock:
+            if self.access_token != stale_token:
+                return
+            if not self.refresh_token:
+                raise PayPayLoginError("refresh_token がないためトークンを更新できません")
+            await self.token_refresh(self.refresh_token)
+
+    def start_auto_refresh(self) -> None:
+        """イベントループ上のタスクで有効期限前にトークンを更新し続ける"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(self._auto_refresh_loop())
+
+    def stop_auto_refresh(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    async def _auto_refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._auto_refresh_delay())
+            token = self.access_token
+            if not self._token_expiring():
+                continue
+            try:
+                await self._refresh_access_token(token)
+            except Exception as e:
+                _debug("バックグラウンドのトークン更新に失敗:", repr(e))
+
+    async def _request(self, method: str, url: str, params: dict = None, json: dict = None,
+                       data: dict = None, headers: dict = None) -> dict:
+        """API を呼び出し、レスポンスの JSON を返す（single_flight・トークン自動更新は PayPay._request と同じ）"""
+        if self._flight is not None and method == "GET" and headers is None:
+            return await self._flight.do(_flight_key(url, params), lambda: self._call(method, url, params))
+        return await self._call(method, url, params, json, data, headers)
+
+    async def _call(self, method: str, url: str, params: dict = None, json: dict = None,
+                    data: dict = None, headers: dict = None) -> dict:
+        """_request の本体"""
+        refreshable = self.auto_refresh and headers is None and "/oauth2/" not in url
+        # 期限の確認より前のトークンを渡す（確認後に他で更新済みなら、もう一度は更新しない）
+        token = self.access_token
+        if refreshable and self._token_expiring():
+            await self._refresh_access_token(token)
+            token = self.access_token
+
+        result = await self._send(method, url, params, json, data, headers)
+        if (refreshable and method == "GET" and self.refresh_token and isinstance(result, dict)
+                and result.get("header", {}).get("resultCode") == "S0001"):
+            _debug("S0001: トークンを更新して再試行します")
+            await self._refresh_access_token(token)
+            result = await self._send(method, url, params, json, data, headers)
+        return result
+
+    async def _send(self, method: str, url: str, params: dict = None, json: dict = None,
+                    data: dict = None, headers: dict = None, client=None) -> dict:
+        """HTTP リクエストを送り JSON をデコードする（タイムアウト・再試行は RequestPolicy に従う。client 省略時は self.client）"""
+        policy = self.policies.get(url)
+        idempotent = policy.is_idempotent(method)
+        timeout = httpx.Timeout(policy.read_timeout, connect=policy.connect_timeout)
+        content = self.codec.dumps(json) if json is not None else None
+        timer = None if self.metrics is None else RequestTimer(self.metrics, method, url)
+        extensions = None if timer is None else {"trace": timer.trace}
+        attempt = 0
+        while True:
+            if timer:
+                timer.start()
+            try:
+                resp = await (client or self.client).request(method, url, headers=headers or self.headers,
+                                                             params=params, content=content, data=data,
+                                                             timeout=timeout, extensions=extensions)
+            except httpx.TransportError as e:
+                unsent = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+                if attempt < policy.retries and (idempotent or unsent):
+                    _debug(f"{method} {url} 再試行 {attempt + 1}/{policy.retries}:", repr(e))
+                    delay = policy.delay(attempt)
+                    if timer:
+                        timer.backoff(delay)
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                if timer:
+                    timer.finish(error=type(e).__name__)
+                raise PayPayNetWorkError(str(e)) from e
+            except PayPayError:
+                # レート制限で送れなかった
+                if timer:
+                    timer.finish(error="rate_limited")
+                raise
+
+            if timer:
+                timer.received_async(resp)
+            try:
+                result = self.codec.loads(resp.content)
+            except Exception:
+                result = None
+            if timer:
+                timer.decoded()
+
+            if idempotent and attempt < policy.retries and _is_retryable_result(resp.status_code, result):
+                _debug(f"{method} {url} 再試行 {attempt + 1}/{policy.retries}: status={resp.status_code}")
+                delay = policy.delay(attempt)
+                if timer:
+                    timer.backoff(delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            if result is None:
+                if timer:
+                    timer.finish(error="non_json")
+                raise PayPayNetWorkError("日本以外からは接続できません")
+            if timer:
+                timer.finish(result)
+            return result
+
+    async def _get_link_info(self, code: str, no_cache: bool = False) -> dict:
+        """getP2PLinkInfo をキャッシュ経由で取得（no_cache=True ならキャッシュを読まず、保存もしない）"""
+        if no_cache:
+            return await self._request("GET", "https://app4.paypay.ne.jp/bff/v2/getP2PLinkInfo",
+                                             params=_link_info_params(code))
+        link_info = self._cached_link_info(code)
+        if link_info is None:
+            link_info = await self._request("GET", "https://app4.paypay.ne.jp/bff/v2/getP2PLinkInfo",
+                                            params=_link_info_params(code))
+            self._store_link_info(code, link_info)
+        return link_info
+
+    async def prepare_login_flow_with_waf(self, phone: str = None, password: str = None, device_uuid: str = None):
+        """WAF回避 + 完全なログインフロー + OTP/SMS送信（同期版をスレッドで実行）"""
+        return await asyncio.to_thread(super().prepare_login_flow_with_waf, phone, password, device_uuid)
+
+    async def login(self, url: str):
+        """OTL コードを使用してログイン完了（同期版をスレッドで実行）"""
+        return await asyncio.to_thread(super().login, url)
+
+    async def token_refresh(self, refresh_token: str = None) -> dict:
+        """トークンをリフレッシュ（refresh_token 省略時は保持しているものを使用）"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        _debug("トークンリフレッシュ中...")
+        refresh = await self._request("POST", "https://app4.paypay.ne.jp/bff/v2/oauth2/refresh",
+                                      data=_refresh_data(refresh_token or self.refresh_token))
+        _check_refresh(refresh)
+
+        self._set_tokens(refresh["payload"]["accessToken"], refresh["payload"]["refreshToken"])
+
+        return refresh
+
+    async def check_token(self) -> None:
+        """アクセストークンが使えるか 1 回だけ確認"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        status = await self._request("GET", "https://app4.paypay.ne.jp/bff/v1/getGlobalServiceStatus?payPayLang=en")
+        _raise_for_result(status)
+
+    @classmethod
+    def restore(cls, source, password: str = None, verify: bool = True, **kwargs):
+        raise TypeError("AsyncPayPay では await AsyncPayPay.arestore() を使ってください")
+
+    @classmethod
+    async def arestore(cls, source, password: str = None, verify: bool = True, **kwargs):
+        """snapshot() で保存した状態からクライアントを作り直す（ログイン不要。PayPay.restore の asyncio 版）"""
+        client = super().restore(source, password=password, verify=False, **kwargs)
+        if verify:
+            await client.check_token()
+        return client
+
+    async def get_history(self, size: int = 20, cashback: bool = False) -> dict:
+        """取引履歴を取得"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        history = await self._request("GET", "https://app4.paypay.ne.jp/bff/v3/getPaymentHistory",
+                                      params=_history_params(size, cashback))
+        _raise_for_result(history)
+
+        return history
+
+    async def iter_history(self, page_size: int = 20, cashback: bool = False, point: bool = False,
+                           until_order_id: str = None, until_time=None, limit: int = None):
+        """取引履歴を新しい順に 1 件ずつ返す非同期イテレータ（引数は PayPay.iter_history と同じ）"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        until_time = _parse_time(until_time)
+        cursor = None
+        count = 0
+        while limit is None or count < limit:
+            history = await self._request("GET", "https://app4.paypay.ne.jp/bff/v3/getPaymentHistory",
+                                          params=_history_page_params(page_size, cashback, point, cursor))
+            _raise_for_result(history)
+
+            for item in _history_items(history):
+                if limit is not None and count >= limit:
+                    return
+                if _history_reached(item, until_order_id, until_time):
+                    return
+                yield item
+                count += 1
+
+            if limit is not None and count >= limit:
+                return
+            cursor = _history_next(history, page_size)
+            if not cursor:
+                return
+
+    async def get_balance(self, include: tuple = None, no_cache: bool = True):
+        """残高情報を取得（引数は PayPay.get_balance と同じ）"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        balance = await self._request("GET", "https://app4.paypay.ne.jp/bff/v1/getBalanceInfo",
+                                      params=_balance_params(include, no_cache))
+        _raise_for_result(balance)
+
+        return _parse_balance(balance, self.keep_raw)
+
+    async def link_check(self, url: str, web_api: bool = False, no_cache: bool = False):
+        """送金リンク情報を確認（no_cache=True なら送金リンク情報のキャッシュを使わずに取得する）"""
+        url = _strip_link(url)
+
+        if web_api:
+            # ログイン不要の Web API。アプリの通信の Cookie は送らない
+            link_info = await self._send("GET", "https://www.paypay.ne.jp/app/v2/p2p-api/getP2PLinkInfo",
+                                         params={"verificationCode": url}, headers=WEB_API_HEADERS,
+                                         client=self._web_client)
+
+        else:
+            if not self.access_token:
+                raise PayPayLoginError("まずはログインしてください")
+
+            link_info = await self._get_link_info(url, no_cache)
+
+        _raise_for_result(link_info)
+
+        return _parse_link_info(link_info, self.keep_raw)
+
+    async def link_receive(self, url: str, passcode: str = None, link_info: dict = None) -> dict:
+        """送金リンクを受け取る"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        url = _strip_link(url)
+        if not link_info:
+            link_info = await self._get_link_info(url)
+
+        payload = _link_receive_payload(url, passcode, link_info)
+        try:
+            receive = await self._request("POST", "https://app4.paypay.ne.jp/bff/v2/acceptP2PSendMoneyLink",
+                                          json=payload,
+                                          params={"payPayLang": "ja", "appContext": "P2PMoneyTransferDetailScreen"})
+        finally:
+            self.invalidate_link_info(url)
+        _raise_for_result(receive)
+
+        return receive
+
+    async def link_reject(self, url: str, link_info: dict = None) -> dict:
+        """送金リンクを辞退"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        url = _strip_link(url)
+        if not link_info:
+            link_info = await self._get_link_info(url)
+
+        payload = _link_reject_payload(url, link_info)
+        try:
+            reject = await self._request("POST", "https://app4.paypay.ne.jp/bff/v2/rejectP2PSendMoneyLink",
+                                         json=payload, params=self.params)
+        finally:
+            self.invalidate_link_info(url)
+        _raise_for_result(reject)
+
+        return reject
+
+    async def link_cancel(self, url: str, link_info: dict = None) -> dict:
+        """送金リンクをキャンセル"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        url = _strip_link(url)
+        if not link_info:
+            link_info = await self._get_link_info(url)
+
+        payload = _link_cancel_payload(url, link_info)
+        try:
+            cancel = await self._request("POST", "https://app4.paypay.ne.jp/p2p/v1/cancelP2PSendMoneyLink",
+                                         json=payload, params=self.params)
+        finally:
+            self.invalidate_link_info(url)
+        _raise_for_result(cancel)
+
+        return cancel
+
+    def iter_link_check_many(self, urls, concurrency: int = 8, rate=None, web_api: bool = False):
+        """複数の送金リンクを並列に確認し、終わったものから LinkResult を返す非同期イテレータ（引数は PayPay と同じ）"""
+        return aiter_many(lambda code: self.link_check(code, web_api), urls, _strip_link, concurrency, rate)
+
+    async def link_check_many(self, urls, concurrency: int = 8, rate=None, web_api: bool = False) -> list:
+        """複数の送金リンクを並列に確認し、入力順の LinkResult のリストを返す"""
+        results = [result async for result in self.iter_link_check_many(urls, concurrency, rate, web_api)]
+        return sorted(results, key=lambda result: result.index)
+
+    def iter_link_receive_many(self, urls, passcode: str = None, concurrency: int = 8, rate=None):
+        """複数の送金リンクを並列に受け取り、終わったものから LinkResult を返す非同期イテレータ（引数は PayPay と同じ）"""
+        return aiter_many(lambda code: self.link_receive(code, passcode), urls, _strip_link, concurrency, rate)
+
+    async def link_receive_many(self, urls, passcode: str = None, concurrency: int = 8, rate=None) -> list:
+        """複数の送金リンクを並列に受け取り、入力順の LinkResult のリストを返す"""
+        results = [result async for result in self.iter_link_receive_many(urls, passcode, concurrency, rate)]
+        return sorted(results, key=lambda result: result.index)
+
+    async def create_link(self, amount: int, passcode: str = None, pochibukuro: bool = False, theme: str = "default-sendmoney",
+                          request_id: str = None):
+        """送金リンクを作成（request_id を省略すると毎回新しく生成）"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        create = await self._request("POST", "https://app4.paypay.ne.jp/bff/v2/executeP2PSendMoneyLink",
+                                     json=_create_link_payload(amount, passcode, pochibukuro, theme, request_id),
+                                     params=self.params)
+        _raise_for_result(create)
+
+        return _parse_create_link(create, self.keep_raw)
+
+    async def send_money(self, amount: int, receiver_id: str, pochibukuro: bool = False, theme: str = "default-sendmoney",
+                         request_id: str = None):
+        """ユーザーに直接送金（request_id を省略すると毎回新しく生成）"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        send = await self._request("POST", "https://app4.paypay.ne.jp/p2p/v3/executeP2PSendMoney",
+                                   json=_send_money_payload(amount, receiver_id, pochibukuro, theme, request_id),
+                                   params=self.params)
+        _raise_for_result(send)
+
+        return _parse_send_money(send, self.keep_raw)
+
+    async def send_message(self, chat_room_id: str, message: str) -> dict:
+        """チャットルームにメッセージを送信"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        send = await self._request("POST", "https://app4.paypay.ne.jp/p2p/v1/sendP2PMessage",
+                                   json=_send_message_payload(chat_room_id, message), params=self.params)
+        _raise_for_result(send)
+
+        return send
+
+    async def create_p2pcode(self, amount: int = None):
+        """P2P コードを作成"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        create_p2pcode = await self._request("POST", "https://app4.paypay.ne.jp/bff/v1/createP2PCode",
+                                             json=_p2pcode_payload(amount), params=self.params)
+        _raise_for_result(create_p2pcode)
+
+        return _parse_p2pcode(create_p2pcode, self.keep_raw)
+
+    async def get_profile(self):
+        """プロフィール情報を取得"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        profile = await self._request("GET", "https://app4.paypay.ne.jp/bff/v2/getProfileDisplayInfo",
+                                      params=_profile_params())
+        _raise_for_result(profile)
+
+        return _parse_profile(profile, self.keep_raw)
+
+    async def set_money_priority(self, paypay_money: bool = False) -> dict:
+        """マネーの優先順位を設定"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        smp = await self._request("POST", "https://app4.paypay.ne.jp/p2p/v1/setMoneyPriority",
+                                  json=_money_priority_payload(paypay_money), params={"payPayLang": "ja"})
+        _raise_for_result(smp)
+
+        return smp
+
+    async def get_chat_rooms(self, size: int = 20, last_message: bool = True):
+        """チャットルーム一覧を取得"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        getchat = await self._request("GET", "https://app4.paypay.ne.jp/p2p/v1/getP2PChatRoomListLite",
+                                      params=_chat_rooms_params(size, last_message))
+        _raise_for_result(getchat, chat_room=True)
+
+        return getchat
+
+    async def get_chat_room_messages(self, chat_room_id: str, prev: int = 15, next: int = 0, include: bool = False,
+                                     message_id: str = None) -> dict:
+        """チャットルームのメッセージを取得（message_id を指定するとそのメッセージの前後 prev / next 件）"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        getchat = await self._request("GET", "https://app4.paypay.ne.jp/bff/v1/getP2PMessageList",
+                                      params=_chat_room_messages_params(chat_room_id, prev, next, include, message_id))
+        _raise_for_result(getchat, chat_room=True)
+
+        return getchat
+
+    async def get_point_history(self) -> dict:
+        """ポイント履歴を取得"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        phistory = await self._request("GET", "https://app4.paypay.ne.jp/bff/v3/getPaymentHistory",
+                                       params=_point_history_params())
+        _raise_for_result(phistory)
+
+        return phistory
+
+    async def search_p2puser(self, user_id: str, size: int = 10, is_global: bool = True, order: int = 0):
+        """P2P ユーザーを検索"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        p2puser = await self._request("POST", "https://app4.paypay.ne.jp/p2p/v3/searchP2PUser",
+                                      json=_search_p2puser_payload(user_id, size, is_global), params=self.params)
+
+        return _parse_p2puser(p2puser, is_global, order, self.keep_raw)
+
+    async def initialize_chatroom(self, external_user_id: str):
+        """チャットルームを初期化"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        initialize = await self._request("POST", "https://app4.paypay.ne.jp/p2p/v1/initialiseOneToOneAndLinkChatRoom",
+                                         json=_initialize_chatroom_payload(external_user_id), params=self.params)
+        _raise_for_result(initialize, chat_room=True)
+
+        return _parse_initialize_chatroom(initialize, self.keep_raw)
+
+    async def get_barcode_info(self, url: str):
+        """バーコード情報を取得"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        barcode = await self._request("GET", "https://app4.paypay.ne.jp/bff/v2/getBarcodeInfo",
+                                      params={"code": url, "payPayLang": "ja"})
+        _raise_for_result(barcode)
+
+        return _parse_barcode_info(barcode, self.keep_raw)
+
+    async def alive(self) -> None:
+        """アプリのアクティブ状態を維持"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
+
+        alive = await self._request("GET", "https://app4.paypay.ne.jp/bff/v1/getGlobalServiceStatus?payPayLang=en")
+        _raise_for_result(alive)
+
+        # 結果は使わず、失敗しても無視する（metrics・再試行・レート制限は他の呼び出しと同じく適用される）
+        for method, url, json in _ALIVE_EXTRA_CALLS:
+            try:
+                await self._send(method, url, json=json)
+            except (PayPayError, PayPayNetWorkError) as e:
+                _debug("alive の補助リクエストに失敗:", url, repr(e))
@@ -0,0 +1,89 @@
+from typing import Any, NamedTuple, Optional
+
+from .ratelimit import TokenBucket
+
+class LinkResult(NamedTuple):
+    """link_check_many / link_receive_many の 1 件分の結果（失敗した場合は error に例外が入る）"""
+    index: int
+    url: str
+    code: str
+    result: Any
+    error: Optional[Exception]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+def _group(urls, strip) -> dict:
+    """verificationCode → [(入力の位置, URL)]（同じリンクは 1 回だけ処理する）"""
+    groups = {}
+    for index, url in enumerate(urls):
+        groups.setdefault(strip(url), []).append((index, url))
+    return groups
+
+def _check_concurrency(concurrency: int) -> None:
+    if not concurrency >= 1:
+        raise ValueError(f"concurrency は 1 以上にしてください: {concurrency}")
+
+def _bucket(rate) -> Optional[TokenBucket]:
+    if rate is None or isinstance(rate, TokenBucket):
+        return rate
+    return TokenBucket(rate, max(1, int(rate)))
+
+def _results(groups: dict, code: str, result, error) -> list:
+    return [LinkResult(index, url, code, result, error) for index, url in groups[code]]
+
+def iter_many(fn, urls, strip, concurrency: int, rate):
+    """fn(code) をスレッドで並列に実行し、終わったものから LinkResult を返すジェネレータ"""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    _check_concurrency(concurrency)
+    groups = _group(urls, strip)
+    if not groups:
+        return
+    bucket = _bucket(rate)
+
+    def run(code):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return code, fn(code), None
+        except Exception as e:
+            return code, None, e
+
+    pool = ThreadPoolExecutor(max_workers=min(concurrency, len(groups)))
+    try:
+        for future in as_completed([pool.submit(run, code) for code in groups]):
+            yield from _results(groups, *future.result())
+    finally:
+        # 途中で読むのをやめた場合、まだ始まっていないものは実行しない
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def aiter_many(fn, urls, strip, concurrency: int, rate):
+    """iter_many() の asyncio 版（fn はコルーチン関数）"""
+    import asyncio
+
+    _check_concurrency(concurrency)
+    groups = _group(urls, strip)
+    if not groups:
+        return
+    bucket = _bucket(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(code):
+        async with semaphore:
+            if bucket is not None:
+                await bucket.acquire_async()
+            try:
+                return code, await fn(code), None
+            except Exception as e:
+                return code, None, e
+
+    tasks = [asyncio.ensure_future(run(code)) for code in groups]
+    try:
+        for done in asyncio.as_completed(tasks):
+            for result in _results(groups, *await done):
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
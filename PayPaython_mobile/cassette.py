@@ -0,0 +1,285 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from http.client import HTTPMessage
+from urllib.parse import parse_qsl, urlsplit
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.response import HTTPResponse
+from urllib3._collections import HTTPHeaderDict
+
+from .main import PayPayNetWorkError
+from .session_state import atomic_write
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+CASSETTE_VERSION = 1
+
+# 記録しないレスポンスヘッダー（本文はデコード済みで保存するため）
+_SKIP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "date"}
+
+# match_body=True のとき、毎回変わるので比較から外す JSON のキー
+VOLATILE_KEYS = ("requestId", "sessionId")
+
+class Cassette():
+    def __init__(self, path: str, mode: str = "auto", latency=None, match_body: bool = False,
+                 ignore_params: tuple = (), allow_repeat: bool = True):
+        """
+        API のやり取りを記録 / 再生するカセット
+
+        PayPay(cassette=Cassette("history.json", mode="record")) のように渡します。
+        リクエストヘッダー（トークンを含む）は保存しません。レスポンス本文はそのまま保存されるので、
+        ログイン時のカセットにはトークンが含まれます。
+
+        Args:
+            path: カセットのファイル（.gz で終わる場合は gzip 圧縮）
+            mode: "record"（実際に通信して記録）/ "replay"（カセットから返す）/ "auto"（ファイルがあれば replay）
+            latency: 再生時の待ち時間。None なら待たない、"recorded" なら記録時の時間、数値ならその秒数
+            match_body: メソッド・URL に加えてリクエスト本文も一致させる（requestId などは無視）
+            ignore_params: 一致判定で無視するクエリパラメータ
+            allow_repeat: 同じリクエストが記録回数より多く来たとき、最後の応答を繰り返すか（False ならエラー）
+        """
+        if mode == "auto":
+            mode = "replay" if os.path.exists(path) else "record"
+        if mode not in ("record", "replay"):
+            raise ValueError(f"不明なカセットのモードです: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.match_body = match_body
+        self.ignore_params = set(ignore_params)
+        self.allow_repeat = allow_repeat
+        self.interactions = []
+        self._index = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.mode == "record":
+            self.save()
+
+    def load(self) -> None:
+        with open(self.path, "rb") as f:
+            blob = f.read()
+        if self.path.endswith(".gz"):
+            blob = gzip.decompress(blob)
+        data = json.loads(blob)
+        if data.get("v") != CASSETTE_VERSION:
+            raise ValueError(f"対応していないカセットのバージョンです: {data.get('v')}")
+        self.interactions = data["interactions"]
+        self._index = {}
+        self._cursor = {}
+        for i, interaction in enumerate(self.interactions):
+            self._index.setdefault(self._key(interaction["method"], interaction["url"], interaction.get("body_key")), []).append(i)
+
+    def save(self) -> None:
+        """記録した内容をファイルに書き出す（一時ファイル経由で置き換え）"""
+        with self._lock:
+            blob = json.dumps({"v": CASSETTE_VERSION, "interactions": self.interactions},
+                              ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if self.path.endswith(".gz"):
+            blob = gzip.compress(blob)
+        atomic_write(self.path, blob)
+
+    def _body_key(self, body):
+        if not self.match_body or not body:
+            return None
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        try:
+            data = json.loads(body)
+        except Exception:
+            return hashlib.sha1(body).hexdigest()
+        if isinstance(data, dict):
+            data = {k: v for k, v in data.items() if k not in VOLATILE_KEYS}
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _key(self, method: str, url: str, body_key=None) -> tuple:
+        parts = urlsplit(url)
+        query = tuple(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if k not in self.ignore_params))
+        return (method.upper(), parts.netloc, parts.path, query, body_key)
+
+    def _record(self, method: str, url: str, body, status: int, reason: str, headers: list,
+                content: bytes, elapsed: float) -> None:
+        interaction = {
+            "method": method.upper(),
+            "url": url,
+            "status": status,
+            "reason": reason,
+            "headers": [[k, v] for k, v in headers if k.lower() not in _SKIP_HEADERS],
+            "elapsed": round(elapsed, 4),
+        }
+        body_key = self._body_key(body)
+        if body_key is not None:
+            interaction["body_key"] = body_key
+        try:
+            interaction["text"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            interaction["b64"] = base64.b64encode(content).decode("ascii")
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def _match(self, method: str, url: str, body) -> dict:
+        key = self._key(method, url, self._body_key(body))
+        with self._lock:
+            indices = self._index.get(key)
+            if not indices:
+                raise PayPayNetWorkError(f"カセットに一致する記録がありません: {method} {url}")
+            position = self._cursor.get(key, 0)
+            if position >= len(indices):
+                if not self.allow_repeat:
+                    raise PayPayNetWorkError(f"カセットの記録を使い切りました: {method} {url}")
+                position = len(indices) - 1
+            self._cursor[key] = position + 1
+            return self.interactions[indices[position]]
+
+    def rewind(self) -> None:
+        """再生位置を最初に戻す"""
+        with self._lock:
+            self._cursor = {}
+
+    def _delay(self, interaction: dict) -> float:
+        if self.latency is None:
+            return 0.0
+        if self.latency == "recorded":
+            return interaction.get("elapsed", 0.0)
+        return float(self.latency)
+
+    def adapter(self, inner: HTTPAdapter) -> BaseAdapter:
+        """requests 用のアダプター（record なら inner を包み、replay なら置き換える）"""
+        if self.mode == "record":
+            return _RecordingAdapter(self, inner)
+        return _ReplayAdapter(self, inner)
+
+    def async_transport(self, inner):
+        """httpx 用のトランスポート（record なら inner を包み、replay なら置き換える）"""
+        if httpx is None:
+            raise RuntimeError("非同期クライアントでカセットを使うには httpx が必要です（pip install httpx）")
+        if self.mode == "record":
+            return _RecordingTransport(self, inner)
+        return _ReplayTransport(self, inner)
+
+def _content(interaction: dict) -> bytes:
+    if "b64" in interaction:
+        return base64.b64decode(interaction["b64"])
+    return interaction.get("text", "").encode("utf-8")
+
+class _RecordingAdapter(BaseAdapter):
+    def __init__(self, cassette: Cassette, inner: HTTPAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        started = time.perf_counter()
+        resp = self.inner.send(request, **kwargs)
+        content = resp.content
+        self.cassette._record(request.method, request.url, request.body, resp.status_code, resp.reason,
+                              list(resp.raw.headers.items()), content, time.perf_counter() - started)
+        return resp
+
+    def close(self):
+        self.inner.close()
+
+class _ReplayedMessage():
+    """
+    http.client.HTTPResponse の代わり
+
+    requests は Set-Cookie を original_response.msg から Cookie jar に取り込むので、それだけ持たせる。
+    """
+    def __init__(self, headers: list):
+        self.msg = HTTPMessage()
+        for name, value in headers:
+            self.msg[name] = value
+
+    def isclosed(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        pass
+
+class _ReplayAdapter(BaseAdapter):
+    """
+    カセットから応答を返すアダプター
+
+    inner が rate_limiter 付き（throttle() を持つ）なら、実際の通信と同じく予算を消費する。
+    計測（metrics）は PayPay._send 側で行われるので、接続確立の時間が 0 になる以外は通常どおり記録される。
+    """
+    def __init__(self, cassette: Cassette, inner: HTTPAdapter):
+        super().__init__()
+        self.cassette = cassette
+        # レスポンスの組み立て（Cookie の反映など）は HTTPAdapter に任せる
+        self.builder = inner
+
+    def send(self, request, **kwargs):
+        throttle = getattr(self.builder, "throttle", None)
+        if throttle is not None:
+            throttle(request)
+        interaction = self.cassette._match(request.method, request.url, request.body)
+        delay = self.cassette._delay(interaction)
+        if delay:
+            time.sleep(delay)
+        raw = HTTPResponse(body=io.BytesIO(_content(interaction)), headers=HTTPHeaderDict(interaction["headers"]),
+                           status=interaction["status"], reason=interaction.get("reason"),
+                           preload_content=False, decode_content=False,
+                           original_response=_ReplayedMessage(interaction["headers"]))
+        return self.builder.build_response(request, raw)
+
+    def close(self):
+        self.builder.close()
+
+if httpx is not None:
+    class _RecordingTransport(httpx.AsyncBaseTransport):
+        def __init__(self, cassette: Cassette, inner):
+            self.cassette = cassette
+            self.inner = inner
+
+        async def handle_async_request(self, request):
+            started = time.perf_counter()
+            resp = await self.inner.handle_async_request(request)
+            raw = b"".join([chunk async for chunk in resp.aiter_raw()])
+            await resp.aclose()
+            # 本文は圧縮されたまま返ってくるので、Content-Encoding を見てデコードしたものを記録する
+            decoded = httpx.Response(resp.status_code, headers=resp.headers, content=raw).content
+            self.cassette._record(request.method, str(request.url), request.content, resp.status_code,
+                                  resp.reason_phrase, list(resp.headers.multi_items()), decoded,
+                                  time.perf_counter() - started)
+            return httpx.Response(resp.status_code, headers=resp.headers, content=raw,
+                                  extensions=resp.extensions)
+
+        async def aclose(self):
+            await self.inner.aclose()
+
+    class _ReplayTransport(httpx.AsyncBaseTransport):
+        """カセットから応答を返すトランスポート（_ReplayAdapter と同じく inner のレート制限を通す）"""
+        def __init__(self, cassette: Cassette, inner):
+            self.cassette = cassette
+            self.inner = inner
+
+        async def handle_async_request(self, request):
+            throttle = getattr(self.inner, "throttle", None)
+            if throttle is not None:
+                await throttle(request)
+            interaction = self.cassette._match(request.method, str(request.url), request.content)
+            delay = self.cassette._delay(interaction)
+            if delay:
+                await asyncio.sleep(delay)
+            return httpx.Response(interaction["status"], headers=interaction["headers"], content=_content(interaction))
+
+        async def aclose(self):
+            await self.inner.aclose()
@@ -0,0 +1,311 @@
+import heapq
+import time
+from collections import deque
+from typing import NamedTuple, Optional
+
+from .main import _debug
+
+# getP2PMessageList のレスポンスのキー（payload 直下のメッセージ一覧 / 各メッセージの ID・作成時刻）
+MESSAGE_LIST_KEYS = ("messageList", "messages")
+MESSAGE_ID_KEYS = ("messageId", "id")
+MESSAGE_TIME_KEYS = ("createdAt", "created_at")
+# getP2PChatRoomListLite のレスポンスのキー（payload 直下のルーム一覧 / 各ルームの ID・最後のメッセージ）
+ROOM_LIST_KEYS = ("chatRooms", "chatRoomList")
+ROOM_ID_KEYS = ("chatRoomId", "channelUrl")
+ROOM_LAST_MESSAGE_KEYS = ("lastMessage",)
+ROOM_PREFIX = "sendbird_group_channel_"
+
+class ChatMessage(NamedTuple):
+    """チャットのメッセージ（created_at は API の値そのまま。通常は UNIX ミリ秒）"""
+    chat_room_id: str
+    message_id: str
+    created_at: Optional[int]
+    raw: dict
+
+def _first(data: dict, keys: tuple):
+    for key in keys:
+        if key in data:
+            return data[key]
+    return None
+
+def _message_list(getchat: dict) -> list:
+    payload = getchat.get("payload")
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        return _first(payload, MESSAGE_LIST_KEYS) or []
+    return []
+
+def _to_message(chat_room_id: str, message: dict) -> ChatMessage:
+    message_id = _first(message, MESSAGE_ID_KEYS)
+    return ChatMessage(chat_room_id, None if message_id is None else str(message_id),
+                       _first(message, MESSAGE_TIME_KEYS), message)
+
+def _sort_key(message: ChatMessage) -> tuple:
+    return (message.created_at or 0, message.chat_room_id, message.message_id or "")
+
+def _room_key(chat_room_id: str) -> str:
+    return chat_room_id if chat_room_id.startswith(ROOM_PREFIX) else ROOM_PREFIX + chat_room_id
+
+def _room_list(getchat: dict) -> list:
+    payload = getchat.get("payload")
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        return _first(payload, ROOM_LIST_KEYS) or []
+    return []
+
+def _room_markers(getchat: dict) -> dict:
+    """ルーム一覧から {ルーム: 最後のメッセージの ID（なければ作成時刻）} を作る（判断できないルームは入れない）"""
+    markers = {}
+    for room in _room_list(getchat):
+        chat_room_id = _first(room, ROOM_ID_KEYS)
+        if chat_room_id is None:
+            continue
+        last = _first(room, ROOM_LAST_MESSAGE_KEYS)
+        # メッセージのないルームは空文字
+        marker = (_first(last, MESSAGE_ID_KEYS) or _first(last, MESSAGE_TIME_KEYS)) if isinstance(last, dict) else ""
+        if marker is not None:
+            markers[_room_key(str(chat_room_id))] = marker
+    return markers
+
+class ChatCursor():
+    def __init__(self, client, chat_room_id: str, message_id: str = None, created_at: int = None,
+                 page_size: int = 50, initial: int = 15, max_pages: int = 20):
+        """
+        1 つのチャットルームの「最後に見たメッセージ」を覚えておき、それより新しいものだけを取得する
+
+        Args:
+            client: PayPay / AsyncPayPay インスタンス
+            chat_room_id: チャットルーム ID
+            message_id: 前回最後に見たメッセージ ID（再開する場合）
+            created_at: そのメッセージの作成時刻
+            page_size: 1 回に取得するメッセージ数
+            initial: カーソルがないときに取得する直近のメッセージ数
+            max_pages: 取りこぼしを埋めるときにたどる最大ページ数
+        """
+        self.client = client
+        self.chat_room_id = chat_room_id
+        self.message_id = message_id
+        self.created_at = created_at
+        self.page_size = page_size
+        self.initial = initial
+        self.max_pages = max_pages
+        # 作成時刻が同じメッセージを二重に返さないよう、直近の ID を覚えておく
+        self._recent = deque(maxlen=max(page_size, initial) * 2)
+        if message_id is not None:
+            self._recent.append(message_id)
+
+    @property
+    def state(self) -> dict:
+        """保存用のカーソル（ChatCursor(client, room, **state) で再開できる）"""
+        return {"message_id": self.message_id, "created_at": self.created_at}
+
+    def _latest_kwargs(self) -> dict:
+        return {"prev": self.initial if self.message_id is None else self.page_size, "next": 0, "include": False}
+
+    def _received(self, getchat: dict) -> list:
+        return sorted((_to_message(self.chat_room_id, m) for m in _message_list(getchat)), key=_sort_key)
+
+    def _has_gap(self, latest: list) -> bool:
+        """直近のメッセージだけでは前回の続きまで届いていないか"""
+        if self.message_id is None or len(latest) < self.page_size:
+            return False
+        for message in latest:
+            if message.message_id == self.message_id:
+                return False
+            if (self.created_at is not None and message.created_at is not None
+                    and message.created_at <= self.created_at):
+                return False
+        return True
+
+    def _page_done(self, page: list, message_id: str, latest: list) -> bool:
+        if len(page) < self.page_size or page[-1].message_id == message_id:
+            return True
+        latest_ids = {message.message_id for message in latest}
+        return any(message.message_id in latest_ids for message in page)
+
+    def _advance(self, received: list) -> list:
+        """まだ返していないメッセージ（古い順）を選び、カーソルを進める"""
+        new = []
+        for message in sorted(received, key=_sort_key):
+            if message.message_id in self._recent:
+                continue
+            if (self.created_at is not None and message.created_at is not None
+                    and message.created_at < self.created_at):
+                continue
+            new.append(message)
+            self._recent.append(message.message_id)
+        if new:
+            self.message_id = new[-1].message_id
+            self.created_at = new[-1].created_at
+        return new
+
+    def fetch(self) -> list:
+        """
+        新着メッセージを古い順に返す
+
+        通常は直近 page_size 件を 1 回取得するだけです。前回の続きがその中にない（新着が多すぎる）ときだけ、
+        前回最後に見たメッセージから next 方向にページをたどって間を埋めます。
+        """
+        latest = self._received(self.client.get_chat_room_messages(self.chat_room_id, **self._latest_kwargs()))
+        received = []
+        if self._has_gap(latest):
+            message_id = self.message_id
+            for _ in range(self.max_pages):
+                page = self._received(self.client.get_chat_room_messages(
+                    self.chat_room_id, prev=0, next=self.page_size, include=False, message_id=message_id))
+                received.extend(page)
+                if self._page_done(page, message_id, latest):
+                    break
+                message_id = page[-1].message_id
+        return self._advance(received + latest)
+
+    async def fetch_async(self) -> list:
+        """AsyncPayPay 用の fetch()"""
+        latest = self._received(await self.client.get_chat_room_messages(self.chat_room_id, **self._latest_kwargs()))
+        received = []
+        if self._has_gap(latest):
+            message_id = self.message_id
+            for _ in range(self.max_pages):
+                page = self._received(await self.client.get_chat_room_messages(
+                    self.chat_room_id, prev=0, next=self.page_size, include=False, message_id=message_id))
+                received.extend(page)
+                if self._page_done(page, message_id, latest):
+                    break
+                message_id = page[-1].message_id
+        return self._advance(received + latest)
+
+class ChatFanout():
+    def __init__(self, client, chat_room_ids: list = (), concurrency: int = 8, cursors: dict = None,
+                 skip_unchanged: bool = True, room_list_size: int = 100, **cursor_options):
+        """
+        複数のチャットルームを同時実行数を抑えて取得し、新着を 1 本の時系列にまとめる
+
+        skip_unchanged=True なら、poll ごとにルーム一覧（最後のメッセージ付き）を 1 回取得し、
+        前回取得したときから最後のメッセージが変わっていないルームは取得しません。
+        同期版ではスレッドで並列に取得します（PayPay の pool_maxsize は concurrency 以上にしてください）。
+
+        Args:
+            client: PayPay / AsyncPayPay インスタンス
+            chat_room_ids: 監視するチャットルーム ID
+            concurrency: 同時に取得するルーム数の上限
+            cursors: 保存しておいた cursors（{ルーム ID: ChatCursor.state}）
+            skip_unchanged: ルーム一覧で変化のないルームを取得しない
+            room_list_size: ルーム一覧で取得するルーム数（一覧に入らなかったルームは毎回取得する）
+            **cursor_options: ChatCursor に渡す page_size / initial / max_pages
+        """
+        self.client = client
+        self.concurrency = concurrency
+        self.skip_unchanged = skip_unchanged
+        self.room_list_size = room_list_size
+        self.cursor_options = cursor_options
+        self.rooms = {}
+        # ルーム → 前回取得したときのルーム一覧上の最後のメッセージ
+        self._markers = {}
+        # 直近の poll で失敗したルーム → 例外
+        self.errors = {}
+        cursors = cursors or {}
+        for chat_room_id in chat_room_ids:
+            self.add_room(chat_room_id, **cursors.get(chat_room_id, {}))
+
+    def add_room(self, chat_room_id: str, message_id: str = None, created_at: int = None) -> None:
+        if chat_room_id not in self.rooms:
+            self.rooms[chat_room_id] = ChatCursor(self.client, chat_room_id, message_id, created_at,
+                                                  **self.cursor_options)
+
+    def remove_room(self, chat_room_id: str) -> None:
+        self.rooms.pop(chat_room_id, None)
+        self._markers.pop(chat_room_id, None)
+
+    @property
+    def cursors(self) -> dict:
+        """保存用の全ルームのカーソル"""
+        return {chat_room_id: cursor.state for chat_room_id, cursor in self.rooms.items()}
+
+    def _changed(self, getchat) -> list:
+        """取得するカーソルと、そのルームのルーム一覧上の最後のメッセージ（一覧を使わない・取得できないときは全ルーム）"""
+        if isinstance(getchat, Exception):
+            _debug("チャットルーム一覧の取得に失敗:", repr(getchat))
+            getchat = None
+        markers = {} if getchat is None else _room_markers(getchat)
+        changed = []
+        for chat_room_id, cursor in list(self.rooms.items()):
+            marker = markers.get(_room_key(chat_room_id))
+            if marker is None or marker != self._markers.get(chat_room_id):
+                changed.append((cursor, marker))
+        return changed
+
+    def _merge(self, results: list) -> list:
+        self.errors = {}
+        batches = []
+        for cursor, marker, result in results:
+            if isinstance(result, Exception):
+                _debug("チャットの取得に失敗:", cursor.chat_room_id, repr(result))
+                self.errors[cursor.chat_room_id] = result
+            else:
+                self._markers[cursor.chat_room_id] = marker
+                batches.append(result)
+        return list(heapq.merge(*batches, key=_sort_key))
+
+    def poll(self) -> list:
+        """新着のあるルームを取得し、作成時刻順にまとめて返す（失敗したルームは errors に入る）"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        def fetch(item):
+            cursor, marker = item
+            try:
+                return cursor, marker, cursor.fetch()
+            except Exception as e:
+                return cursor, marker, e
+
+        getchat = None
+        if self.skip_unchanged and self.rooms:
+            try:
+                getchat = self.client.get_chat_rooms(self.room_list_size, last_message=True)
+            except Exception as e:
+                getchat = e
+        changed = self._changed(getchat)
+        if not changed:
+            self.errors = {}
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(changed))) as pool:
+            return self._merge(list(pool.map(fetch, changed)))
+
+    async def poll_async(self) -> list:
+        """AsyncPayPay 用の poll()"""
+        import asyncio
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(cursor, marker):
+            async with semaphore:
+                try:
+                    return cursor, marker, await cursor.fetch_async()
+                except Exception as e:
+                    return cursor, marker, e
+
+        getchat = None
+        if self.skip_unchanged and self.rooms:
+            try:
+                getchat = await self.client.get_chat_rooms(self.room_list_size, last_message=True)
+            except Exception as e:
+                getchat = e
+        return self._merge(await asyncio.gather(*(fetch(cursor, marker) for cursor, marker in self._changed(getchat))))
+
+    def stream(self, interval: float = 5.0):
+        """interval 秒ごとに poll() し、新着メッセージを 1 件ずつ返し続けるジェネレータ"""
+        while True:
+            started = time.monotonic()
+            yield from self.poll()
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    async def stream_async(self, interval: float = 5.0):
+        """stream() の asyncio 版"""
+        import asyncio
+
+        while True:
+            started = time.monotonic()
+            for message in await self.poll_async():
+                yield message
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
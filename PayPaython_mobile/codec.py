@@ -0,0 +1,69 @@
+import json
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    import ujson
+except Exception:
+    ujson = None
+
+class StdlibCodec():
+    """標準ライブラリの json"""
+    name = "stdlib"
+
+    def loads(self, data: bytes):
+        return json.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class OrjsonCodec():
+    """orjson（インストールされている場合）"""
+    name = "orjson"
+
+    def loads(self, data: bytes):
+        return orjson.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        return orjson.dumps(obj)
+
+class UjsonCodec():
+    """ujson（インストールされている場合）"""
+    name = "ujson"
+
+    def loads(self, data: bytes):
+        return ujson.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+def get_codec(codec="auto"):
+    """
+    JSON コーデックを取得
+
+    Args:
+        codec: "auto"（orjson → ujson → 標準ライブラリの順で使えるもの）/ "orjson" / "ujson" / "stdlib"、
+               または loads(bytes) と dumps(obj) -> bytes を持つオブジェクト
+    """
+    if not isinstance(codec, str):
+        return codec
+    if codec == "auto":
+        if orjson is not None:
+            return OrjsonCodec()
+        if ujson is not None:
+            return UjsonCodec()
+        return StdlibCodec()
+    if codec == "orjson":
+        if orjson is None:
+            raise RuntimeError("orjson がインストールされていません（pip install orjson）")
+        return OrjsonCodec()
+    if codec == "ujson":
+        if ujson is None:
+            raise RuntimeError("ujson がインストールされていません（pip install ujson）")
+        return UjsonCodec()
+    if codec == "stdlib":
+        return StdlibCodec()
+    raise ValueError(f"不明な JSON コーデックです: {codec}")
@@ -0,0 +1,180 @@
+import json
+import sqlite3
+import threading
+from datetime import timezone
+from typing import Optional
+
+from .main import _parse_time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    order_id     TEXT PRIMARY KEY,
+    order_type   TEXT,
+    order_status TEXT,
+    amount       INTEGER,
+    counterparty TEXT,
+    time         TEXT,
+    raw          TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_time ON transactions (time);
+CREATE INDEX IF NOT EXISTS idx_transactions_counterparty ON transactions (counterparty, time);
+CREATE INDEX IF NOT EXISTS idx_transactions_amount ON transactions (amount);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def _format_time(value) -> Optional[str]:
+    """比較しやすいよう UTC の ISO 8601 文字列に正規化"""
+    value = _parse_time(value)
+    if value is None:
+        return None
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _to_row(item: dict) -> tuple:
+    return (
+        item.get("orderId"),
+        item.get("orderType"),
+        item.get("orderStatus"),
+        item.get("amount"),
+        item.get("description"),
+        _format_time(item.get("dateTime")),
+        json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+    )
+
+class HistoryStore():
+    def __init__(self, client, path: str = "paypay_history.sqlite3"):
+        """
+        取引履歴をローカルの SQLite に差分同期するストア
+
+        sync() は新しい順に履歴を読み、保存済みの取引に到達した時点でページ取得を止めます。
+        定常状態では 1 リクエストで済み、検索はすべてローカルで行います。
+
+        Args:
+            client: PayPay / AsyncPayPay インスタンス
+            path: SQLite ファイルのパス（":memory:" も可）
+        """
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def high_water_mark(self) -> Optional[dict]:
+        """最後の同期で確認した最新の取引（{"order_id", "time"}）"""
+        with self._lock:
+            rows = dict(self._db.execute("SELECT key, value FROM meta WHERE key IN ('hw_order_id', 'hw_time')").fetchall())
+        if "hw_order_id" not in rows:
+            return None
+        return {"order_id": rows["hw_order_id"], "time": rows.get("hw_time")}
+
+    def _seen(self, order_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM transactions WHERE order_id = ?", (order_id,)).fetchone() is not None
+
+    def _save(self, items: list) -> int:
+        if not items:
+            return 0
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 [_to_row(item) for item in items])
+            newest = items[0]
+            self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                 [("hw_order_id", newest.get("orderId")),
+                                  ("hw_time", _format_time(newest.get("dateTime")))])
+        return len(items)
+
+    def sync(self, page_size: int = 20, limit: int = None) -> int:
+        """
+        新しい取引だけを取得して保存し、追加件数を返す
+
+        Args:
+            page_size: 1 ページあたりの件数
+            limit: 1 回の同期で取り込む最大件数（初回の全件取得を抑えたいとき）
+        """
+        hw = self.high_water_mark
+        items = []
+        for item in self.client.iter_history(page_size=page_size, limit=limit,
+                                             until_order_id=hw["order_id"] if hw else None):
+            if self._seen(item.get("orderId")):
+                break
+            items.append(item)
+        return self._save(items)
+
+    async def sync_async(self, page_size: int = 20, limit: int = None) -> int:
+        """AsyncPayPay 用の sync()"""
+        hw = self.high_water_mark
+        items = []
+        async for item in self.client.iter_history(page_size=page_size, limit=limit,
+                                                   until_order_id=hw["order_id"] if hw else None):
+            if self._seen(item.get("orderId")):
+                break
+            items.append(item)
+        return self._save(items)
+
+    def get(self, order_id: str) -> Optional[dict]:
+        """orderId で取引を取得"""
+        with self._lock:
+            row = self._db.execute("SELECT raw FROM transactions WHERE order_id = ?", (order_id,)).fetchone()
+        return json.loads(row["raw"]) if row else None
+
+    def find(self, counterparty: str = None, min_amount: int = None, max_amount: int = None,
+             since=None, until=None, order_type: str = None, limit: int = None) -> list:
+        """
+        保存済みの取引を検索（新しい順）
+
+        Args:
+            counterparty: 相手の表示名（description）の完全一致
+            min_amount: 金額の下限（以上）
+            max_amount: 金額の上限（以下）
+            since: この時刻以降（datetime / UNIX 秒 / ISO 8601）
+            until: この時刻以前
+            order_type: orderType（P2P_RECEIVE, CASHBACK など）
+            limit: 最大件数
+        """
+        where = []
+        args = []
+        if counterparty is not None:
+            where.append("counterparty = ?")
+            args.append(counterparty)
+        if min_amount is not None:
+            where.append("amount >= ?")
+            args.append(min_amount)
+        if max_amount is not None:
+            where.append("amount <= ?")
+            args.append(max_amount)
+        if since is not None:
+            where.append("time >= ?")
+            args.append(_format_time(since))
+        if until is not None:
+            where.append("time <= ?")
+            args.append(_format_time(until))
+        if order_type is not None:
+            where.append("order_type = ?")
+            args.append(order_type)
+
+        sql = "SELECT raw FROM transactions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY time DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [json.loads(row["raw"]) for row in rows]
@@ -0,0 +1,335 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import NamedTuple, Optional
+
+from .main import LINK_NOT_PENDING, PayPayError, _debug
+from .session_state import atomic_write
+
+class StockItem(NamedTuple):
+    """在庫の 1 件（kind は "link"（送金リンク）/ "p2p_code"。value はリンクの URL または P2P コード）"""
+    kind: str
+    amount: Optional[int]
+    theme: Optional[str]
+    value: str
+    order_id: Optional[str]
+    created_at: float
+
+def _slot(kind: str, amount: Optional[int], theme: Optional[str]) -> tuple:
+    if kind not in ("link", "p2p_code"):
+        raise ValueError(f"不明な在庫の種類です: {kind}")
+    return (kind, amount, theme if kind == "link" else None)
+
+class Inventory():
+    def __init__(self, client, ttl: float = 3600.0, concurrency: int = 2, interval: float = 1.0,
+                 state_path: str = None, passcode: str = None):
+        """
+        送金リンク / P2P コードを金額・テーマごとに作り置きしておき、take() ですぐに渡せるようにする
+
+        送金リンクは作った時点で残高から引かれます。ttl を過ぎたもの、目標数より多いもの、close() 時に残っているものは
+        link_cancel で取り消します（P2P コードは受け取り用なので捨てるだけです）。取り消しに失敗したリンクは
+        取り消し待ちとして残し、取り消せるか、受け取り済み・期限切れとわかるまで expire() のたびにやり直します。
+
+        Args:
+            client: PayPay / AsyncPayPay インスタンス
+            ttl: 作ってから取り消すまでの秒数
+            concurrency: 補充時に同時に作る数
+            interval: start() / run_async() で補充・期限切れを確認する間隔（秒）
+            state_path: 在庫を保存するファイル（再起動しても作ったリンクを見失わない。None なら保存しない）
+            passcode: 作る送金リンクに付けるパスワード
+        """
+        self.client = client
+        self.ttl = ttl
+        self.concurrency = concurrency
+        self.interval = interval
+        self.state_path = state_path
+        self.passcode = passcode
+        # (kind, amount, theme) → 目標数 / 在庫（古い順）
+        self.targets = {}
+        self._stock = {}
+        # 在庫から外したが、まだ取り消せていない送金リンク
+        self._cancels = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"hits": 0, "misses": 0, "created": 0, "cancelled": 0, "errors": 0}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, "rb") as f:
+            state = json.loads(f.read())
+        if state.get("v") != 1:
+            raise ValueError(f"対応していない状態ファイルのバージョンです: {state.get('v')}")
+        for values in state["items"]:
+            item = StockItem(*values)
+            self._stock.setdefault(_slot(item.kind, item.amount, item.theme), deque()).append(item)
+        self._cancels = [StockItem(*values) for values in state.get("cancels", [])]
+
+    def _save(self) -> None:
+        """_lock を取った状態で呼ぶ"""
+        if not self.state_path:
+            return
+        items = [list(item) for stock in self._stock.values() for item in stock]
+        cancels = [list(item) for item in self._cancels]
+        atomic_write(self.state_path, json.dumps({"v": 1, "items": items, "cancels": cancels},
+                                                 ensure_ascii=False).encode("utf-8"))
+
+    def add(self, amount: Optional[int], count: int, theme: str = "default-sendmoney", kind: str = "link") -> None:
+        """
+        作り置きする数を設定する（0 にすると、次の expire() で残りを取り消す。start() / run_async() なら次の周期）
+
+        Args:
+            amount: 金額（P2P コードは None で金額指定なし）
+            count: 作り置きする数
+            theme: 送金リンクのテーマ（"pochibukuro" ならぽち袋）
+            kind: "link" / "p2p_code"
+        """
+        slot = _slot(kind, amount, theme)
+        with self._lock:
+            self.targets[slot] = count
+            self._stock.setdefault(slot, deque())
+
+    def available(self) -> dict:
+        """(kind, amount, theme) ごとの在庫数"""
+        with self._lock:
+            return {slot: len(stock) for slot, stock in self._stock.items()}
+
+    def cancelling(self) -> list:
+        """在庫から外したが、まだ取り消せていない送金リンク"""
+        with self._lock:
+            return list(self._cancels)
+
+    def _pop(self, slot: tuple) -> Optional[StockItem]:
+        now = time.time()
+        with self._lock:
+            stock = self._stock.get(slot)
+            # ttl を過ぎたもの（先頭側）は取り消し待ちなので渡さない
+            expired = []
+            while stock and stock[0].created_at + self.ttl <= now:
+                expired.append(stock.popleft())
+            item = stock.popleft() if stock else None
+            if stock is not None:
+                stock.extendleft(reversed(expired))
+            if item is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            self._save()
+        return item
+
+    def take(self, amount: Optional[int], theme: str = "default-sendmoney", kind: str = "link",
+             create: bool = True) -> Optional[StockItem]:
+        """
+        在庫から 1 件取り出す（在庫がなければ create=True ならその場で作る。False なら None）
+
+        Args:
+            amount: 金額
+            theme: 送金リンクのテーマ
+            kind: "link" / "p2p_code"
+            create: 在庫切れのときにその場で作るか
+        """
+        slot = _slot(kind, amount, theme)
+        item = self._pop(slot)
+        if item is None and create:
+            item = self._create(slot)
+        return item
+
+    async def take_async(self, amount: Optional[int], theme: str = "default-sendmoney", kind: str = "link",
+                         create: bool = True) -> Optional[StockItem]:
+        """AsyncPayPay 用の take()"""
+        slot = _slot(kind, amount, theme)
+        item = self._pop(slot)
+        if item is None and create:
+            item = await self._create_async(slot)
+        return item
+
+    def _item(self, slot: tuple, result) -> StockItem:
+        kind, amount, theme = slot
+        if kind == "link":
+            return StockItem(kind, amount, theme, result.link, result.order_id, time.time())
+        return StockItem(kind, amount, theme, result.p2pcode, None, time.time())
+
+    def _create(self, slot: tuple) -> StockItem:
+        kind, amount, theme = slot
+        if kind == "link":
+            result = self.client.create_link(amount, self.passcode, theme=theme)
+        else:
+            result = self.client.create_p2pcode(amount)
+        return self._item(slot, result)
+
+    async def _create_async(self, slot: tuple) -> StockItem:
+        kind, amount, theme = slot
+        if kind == "link":
+            result = await self.client.create_link(amount, self.passcode, theme=theme)
+        else:
+            result = await self.client.create_p2pcode(amount)
+        return self._item(slot, result)
+
+    def _usable(self, slot: tuple, now: float) -> int:
+        """_lock を取った状態で呼ぶ。ttl を過ぎていない（take() で渡せる）在庫の数"""
+        return sum(1 for item in self._stock.get(slot, ()) if item.created_at + self.ttl > now)
+
+    def _deficit(self) -> list:
+        """足りない分の slot のリスト（ttl を過ぎて expire() 待ちのものは在庫に数えない）"""
+        now = time.time()
+        with self._lock:
+            return [slot for slot, target in self.targets.items()
+                    for _ in range(target - self._usable(slot, now))]
+
+    def _stocked(self, slot: tuple, item: Optional[StockItem], error: Optional[Exception]) -> None:
+        with self._lock:
+            if error is not None:
+                _debug("在庫の作成に失敗:", slot, repr(error))
+                self.stats["errors"] += 1
+                return
+            self._stock.setdefault(slot, deque()).append(item)
+            self.stats["created"] += 1
+            self._save()
+
+    def refill(self) -> int:
+        """目標数まで作り、作った数を返す"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        deficit = self._deficit()
+        if not deficit:
+            return 0
+
+        def create(slot):
+            try:
+                self._stocked(slot, self._create(slot), None)
+                return 1
+            except Exception as e:
+                self._stocked(slot, None, e)
+                return 0
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(deficit))) as pool:
+            return sum(pool.map(create, deficit))
+
+    async def refill_async(self) -> int:
+        """AsyncPayPay 用の refill()"""
+        import asyncio
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def create(slot):
+            async with semaphore:
+                try:
+                    self._stocked(slot, await self._create_async(slot), None)
+                    return 1
+                except Exception as e:
+                    self._stocked(slot, None, e)
+                    return 0
+
+        return sum(await asyncio.gather(*(create(slot) for slot in self._deficit())))
+
+    def _evict(self, everything: bool = False) -> tuple:
+        """
+        期限切れ・目標数を超えた分（everything=True なら全部）を在庫から外し、外した数と取り消し待ちのリンクを返す
+
+        送金リンクは取り消しが済むまで取り消し待ちとして保存しておく。
+        """
+        now = time.time()
+        evicted = 0
+        with self._lock:
+            for slot, stock in self._stock.items():
+                target = 0 if everything else self.targets.get(slot, 0)
+                while stock and (len(stock) > target or stock[0].created_at + self.ttl <= now):
+                    item = stock.popleft()
+                    evicted += 1
+                    if item.kind == "link":
+                        self._cancels.append(item)
+            if evicted:
+                self._save()
+            return evicted, list(self._cancels)
+
+    def _cancelled(self, item: StockItem, error: Optional[Exception]) -> None:
+        with self._lock:
+            if error is None:
+                self.stats["cancelled"] += 1
+            elif isinstance(error, PayPayError) and error.args == (LINK_NOT_PENDING,):
+                # 受け取り済み・期限切れなど。もう取り消す必要はない
+                _debug("取り消し済みの在庫:", item.value)
+            else:
+                # 通信エラー・レート制限など。取り消し待ちに残して次回やり直す
+                _debug("在庫の取り消しに失敗:", item.value, repr(error))
+                self.stats["errors"] += 1
+                return
+            if item in self._cancels:
+                self._cancels.remove(item)
+                self._save()
+
+    def expire(self, everything: bool = False) -> int:
+        """期限切れ・余分な在庫を外して取り消し待ちのリンクを取り消し、在庫から外した数を返す"""
+        evicted, cancels = self._evict(everything)
+        for item in cancels:
+            try:
+                self.client.link_cancel(item.value)
+                self._cancelled(item, None)
+            except Exception as e:
+                self._cancelled(item, e)
+        return evicted
+
+    async def expire_async(self, everything: bool = False) -> int:
+        """AsyncPayPay 用の expire()"""
+        evicted, cancels = self._evict(everything)
+        for item in cancels:
+            try:
+                await self.client.link_cancel(item.value)
+                self._cancelled(item, None)
+            except Exception as e:
+                self._cancelled(item, e)
+        return evicted
+
+    def start(self) -> None:
+        """バックグラウンドスレッドで補充と期限切れの取り消しを続ける（同期版の PayPay 用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="paypay-inventory", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.expire()
+                self.refill()
+            except Exception as e:
+                _debug("在庫の補充に失敗:", repr(e))
+            self._stop.wait(self.interval)
+
+    async def run_async(self) -> None:
+        """stop() が呼ばれるまで補充と期限切れの取り消しを続ける（AsyncPayPay 用。タスクとして起動する）"""
+        import asyncio
+
+        self._stop.clear()
+        while not self._stop.is_set():
+            try:
+                await self.expire_async()
+                await self.refill_async()
+            except Exception as e:
+                _debug("在庫の補充に失敗:", repr(e))
+            deadline = time.monotonic() + self.interval
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                await asyncio.sleep(min(0.5, deadline - time.monotonic()))
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self, cancel: bool = True) -> None:
+        """補充を止め、cancel=True なら残っている送金リンクをすべて取り消す（取り消せなかったものは cancelling() に残る）"""
+        self.stop()
+        if cancel:
+            self.expire(everything=True)
+
+    async def aclose(self, cancel: bool = True) -> None:
+        """AsyncPayPay 用の close()"""
+        self._stop.set()
+        if cancel:
+            await self.expire_async(everything=True)
@@ -0,0 +1,115 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+# 送金リンク（pay.paypay.ne.jp/<verificationCode>）と P2P コード（qr.paypay.ne.jp/<code>）
+# スキームの有無、<...> や Markdown のリンクで囲まれていても拾う（xpay.paypay.ne.jp などの別ホストは拾わない）
+_LINK_RE = re.compile(
+    r"(?<![0-9A-Za-z.-])(?:https?://)?(pay|qr)\.paypay\.ne\.jp/([0-9A-Za-z_-]{8,64})(?![0-9A-Za-z_-])"
+)
+# ほとんどのメッセージはリンクを含まないので、正規表現の前に部分文字列で判定する
+_MARKER = ".paypay.ne.jp/"
+
+_KINDS = {"pay": "link", "qr": "p2p_code"}
+
+class ExtractedLink(NamedTuple):
+    """テキストから見つかったリンク（kind は "link"（送金リンク）/ "p2p_code"）"""
+    kind: str
+    code: str
+    url: str
+
+def _to_link(match) -> ExtractedLink:
+    host, code = match.groups()
+    return ExtractedLink(_KINDS[host], code, f"https://{host}.paypay.ne.jp/{code}")
+
+def extract_links(text: str, kinds: tuple = ("link", "p2p_code")) -> list:
+    """
+    テキストに含まれる送金リンク / P2P コードを、出現順に重複なしで返す
+
+    Args:
+        text: メッセージなどの任意のテキスト
+        kinds: 返す種類
+    """
+    if not text or _MARKER not in text:
+        return []
+    links = []
+    seen = set()
+    for match in _LINK_RE.finditer(text):
+        link = _to_link(match)
+        if link.kind in kinds and link.code not in seen:
+            seen.add(link.code)
+            links.append(link)
+    return links
+
+def link_code(url: str) -> str:
+    """送金リンクの URL（またはそれを含むテキスト）から verificationCode を取り出す。リンクでなければそのまま返す"""
+    if _MARKER in url:
+        for match in _LINK_RE.finditer(url):
+            if match.group(1) == "pay":
+                return match.group(2)
+    # 抽出の対象外の形（短いコードなど）は、従来どおりプレフィックスだけ取り除く
+    return url.strip().replace("https://pay.paypay.ne.jp/", "")
+
+class LinkExtractor():
+    def __init__(self, window: float = 60.0, kinds: tuple = ("link", "p2p_code"), max_size: int = 100000):
+        """
+        メッセージからリンクを取り出し、window 秒以内に見たものは除いて返す（スレッドセーフ）
+
+        同じリンクが何度も貼られている間は、最後に見てから window 秒経つまで返しません。
+
+        Args:
+            window: 重複とみなす秒数
+            kinds: 返す種類（"link" / "p2p_code"）
+            max_size: 覚えておくリンク数の上限（超えたら古いものから忘れる）
+        """
+        self.window = window
+        self.kinds = kinds
+        self.max_size = max_size
+        # code → 最後に見た時刻（古い順）
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        threshold = now - self.window
+        while self._seen:
+            code, seen_at = next(iter(self._seen.items()))
+            if seen_at > threshold and len(self._seen) <= self.max_size:
+                break
+            del self._seen[code]
+
+    def feed(self, text: str, now: float = None) -> list:
+        """
+        テキストから新しいリンクだけを返す
+
+        Args:
+            text: メッセージなどの任意のテキスト
+            now: 現在時刻（省略時は time.monotonic()）
+        """
+        links = extract_links(text, self.kinds)
+        if not links:
+            return []
+        if now is None:
+            now = time.monotonic()
+        new = []
+        with self._lock:
+            for link in links:
+                seen_at = self._seen.get(link.code)
+                if seen_at is None or seen_at <= now - self.window:
+                    new.append(link)
+                self._seen[link.code] = now
+                self._seen.move_to_end(link.code)
+            self._expire(now)
+        return new
+
+    def forget(self, code: str = None) -> None:
+        """覚えているリンクを忘れる（code 省略時は全件）"""
+        with self._lock:
+            if code is None:
+                self._seen.clear()
+            else:
+                self._seen.pop(code, None)
+
+    def __len__(self) -> int:
+        return len(self._seen)
@@ -1,13 +1,31 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 from uuid import uuid4
-import pkce
 import random
-from typing import NamedTuple, Optional
+from typing import Optional
+from datetime import datetime, timezone
 import time
 import os
-
-# aws waf 突破ヘルパーを追加（このモジュールをリポジトリ内に置いてください）
-from .waf_helper import solve_aws_waf
+import json
+import base64
+import threading
+
+from .policy import RequestPolicy, RequestPolicies, _is_rate_limited, _is_retryable_result
+from .ratelimit import RateLimiter
+from .codec import get_codec
+from .metrics import RequestTimer, instrument_adapter
+from .tracing import NOOP_SPAN, SPAN_KIND_CLIENT
+from .singleflight import SingleFlight, _flight_key
+from .bulk import iter_many
+from .links import link_code
+from .results import (
+    DeviceHeaders, GetBalance, LinkInfo, CreateLink, SendMoney, P2PCode, Profile, P2PUser,
+    InitializeChatRoom, BarcodeInfo
+)
+
+# ログイン用の依存（pkce / waf_helper → awswaf → curl_cffi, cryptography）は重いので、
+# access_token だけで使う場合に読み込まなくて済むよう、ログイン処理の中で import する
 
 # 制御用環境変数
 SKIP_WAF = os.getenv("PAYPAY_SKIP_WAF", "0") == "1"
@@ -54,21 +72,13 @@ def generate_device_state():
         (-0.04, 0.09),
         (-0.03, 0.1)
     )
-    class DeviceHeaders(NamedTuple):
-        device_orientation: str
-        device_orientation_2: str
-        device_rotation: str
-        device_rotation_2: str
-        device_acceleration: str
-        device_acceleration_2: str
-
     return DeviceHeaders(
-        device_orientation,
-        device_orientation_2,
-        device_rotation,
-        device_rotation_2,
-        device_acceleration,
-        device_acceleration_2
+        device_orientation=device_orientation,
+        device_orientation_2=device_orientation_2,
+        device_rotation=device_rotation,
+        device_rotation_2=device_rotation_2,
+        device_acceleration=device_acceleration,
+        device_acceleration_2=device_acceleration_2
     )
 
 def update_header_device_state(headers: dict):
@@ -90,6 +100,13 @@ class PayPayLoginError(Exception):
 class PayPayNetWorkError(Exception):
     pass
 
+# クライアント側のレート制限で送信前に止めたときの PayPayError のメッセージ
+RATE_LIMITED = "レート制限に達しました"
+# 受け取り・辞退・キャンセル済みの送金リンクを操作しようとしたときの PayPayError のメッセージ
+LINK_NOT_PENDING = "すでに 受け取り / 辞退 / キャンセル されているリンクです"
+# 取引履歴のページが埋まっているのに次のページのカーソルがないときの PayPayError のメッセージ
+HISTORY_TRUNCATED = "取引履歴の次のページのカーソルが見つかりません（HISTORY_CURSOR_KEY を確認してください）"
+
 def _try_solve_waf(session, user_agent: str, proxy: Optional[dict], retries: int = 2, wait: float = 0.5) -> Optional[str]:
     """
     単純なリトライラッパー。成功すれば token を返す。
@@ -99,6 +116,9 @@ def _try_solve_waf(session, user_agent: str, proxy: Optional[dict], retries: int
         _debug("SKIP_WAF enabled, not attempting WAF solve.")
         return None
 
+    # aws waf 突破ヘルパー（このモジュールをリポジトリ内に置いてください）
+    from .waf_helper import solve_aws_waf
+
     last_exc = None
     for i in range(retries):
         try:
@@ -120,9 +140,399 @@ def _try_solve_waf(session, user_agent: str, proxy: Optional[dict], retries: int
     _debug("awswaf attempts exhausted; returning None")
     return None
 
+def _raise_for_result(data: dict, chat_room: bool = False):
+    """resultCode を確認し、エラーなら例外を送出"""
+    if data["header"]["resultCode"] == "S0001":
+        raise PayPayLoginError(data)
+
+    if chat_room and data["header"]["resultCode"] == "S5000":
+        raise PayPayError("チャットルームが見つかりませんでした")
+
+    if data["header"]["resultCode"] != "S0000":
+        raise PayPayError(data)
+
+def _strip_link(url: str) -> str:
+    return link_code(url)
+
+# 以下は PayPay / AsyncPayPay で共有するリクエスト組み立て・レスポンス解析処理
+
+WEB_API_HEADERS = {
+    "Accept": "application/json, text/plain, */*",
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36',
+    "Content-Type": "application/json"
+}
+
+def _token_expiry(token: str) -> Optional[float]:
+    """JWT のアクセストークンから有効期限（UNIX 秒）を読み取る（署名は検証しない）"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return None
+
+def _refresh_data(refresh_token: str) -> dict:
+    return {
+        "clientId": "pay2-mobile-app-client",
+        "refreshToken": refresh_token,
+        "tokenVersion": "v2"
+    }
+
+def _check_refresh(refresh: dict):
+    if refresh["header"]["resultCode"] == "S0001" or refresh["header"]["resultCode"] == "S1003":
+        raise PayPayLoginError(refresh)
+
+    if refresh["header"]["resultCode"] == "S0003":
+        raise PayPayLoginError(refresh)
+
+    if refresh["header"]["resultCode"] != "S0000":
+        raise PayPayError(refresh)
+
+def _history_params(size: int = 20, cashback: bool = False) -> dict:
+    params = {
+        "pageSize": str(size),
+        "orderTypes": "",
+        "paymentMethodTypes": "",
+        "signUpCompletedAt": "2021-01-02T10:16:24Z",
+        "isOverdraftOnly": "false",
+        "payPayLang": "ja"
+    }
+    if cashback:
+        params["orderTypes"] = "CASHBACK"
+    return params
+
+def _point_history_params(size: int = 20) -> dict:
+    return {
+        "pageSize": str(size),
+        "orderTypes": "CASHBACK",
+        "paymentMethodTypes": "",
+        "signUpCompletedAt": "2021-01-02T10:16:24Z",
+        "pointType": "REGULAR",
+        "isOverdraftOnly": "false",
+        "payPayLang": "ja"
+    }
+
+# alive() で getGlobalServiceStatus の後に送る、アプリの起動時と同じリクエスト（method, URL, JSON）
+_ALIVE_EXTRA_CALLS = (
+    ("POST", "https://app4.paypay.ne.jp/bff/v3/getHomeDisplayInfo?payPayLang=ja",
+     {"excludeMissionBannerInfoFlag": False, "includeBeginnerFlag": False}),
+    ("GET", "https://app4.paypay.ne.jp/bff/v1/getSearchBar?payPayLang=ja", None),
+)
+
+# getPaymentHistory のページングカーソル（レスポンスの payload に入り、次のリクエストでそのまま渡す）
+# 実際のレスポンスで確認したキーではなく想定。違う場合は変更してください
+# （ページが埋まっているのに見つからなければ、履歴が途中で切れないよう PayPayError(HISTORY_TRUNCATED) を投げる）
+HISTORY_CURSOR_KEY = "lastEvaluatedKey"
+
+def _history_page_params(size: int, cashback: bool, point: bool, cursor: Optional[str]) -> dict:
+    params = _point_history_params(size) if point else _history_params(size, cashback)
+    if cursor:
+        params[HISTORY_CURSOR_KEY] = cursor
+    return params
+
+def _history_items(history: dict) -> list:
+    return history["payload"].get("paymentInfoList") or []
+
+def _history_cursor(history: dict) -> Optional[str]:
+    return history["payload"].get(HISTORY_CURSOR_KEY) or None
+
+def _history_next(history: dict, page_size: int) -> Optional[str]:
+    """次のページのカーソル（最後のページなら None。続きがあるはずなのにカーソルがなければ PayPayError）"""
+    items = _history_items(history)
+    cursor = _history_cursor(history)
+    if cursor is None and len(items) >= page_size:
+        raise PayPayError(HISTORY_TRUNCATED)
+    return cursor if items else None
+
+def _parse_time(value) -> Optional[datetime]:
+    """datetime / UNIX 秒 / ISO 8601 文字列を timezone 付き datetime に変換"""
+    if value is None or isinstance(value, datetime):
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc)
+    value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def _history_reached(item: dict, until_order_id: Optional[str], until_time: Optional[datetime]) -> bool:
+    """履歴を新しい順に読んでいるとき、停止位置に到達したか"""
+    if until_order_id is not None and item.get("orderId") == until_order_id:
+        return True
+    if until_time is not None and item.get("dateTime"):
+        return _parse_time(item["dateTime"]) <= until_time
+    return False
+
+# get_balance(include=...) で指定できるセクション → getBalanceInfo のパラメータ
+BALANCE_SECTIONS = {
+    "pending": "includePending",
+    "pending_bonus_lite": "includePendingBonusLite",
+    "kyc": "includeKycInfo",
+    "securities": "includePayPaySecuritiesInfo",
+    "point_investment": "includePointInvestmentInfo",
+    "bank": "includePayPayBankInfo",
+    "gift_voucher": "includeGiftVoucherInfo",
+}
+DEFAULT_BALANCE_SECTIONS = ("pending", "kyc", "securities", "point_investment", "bank", "gift_voucher")
+
+def _balance_params(include: Optional[tuple] = None, no_cache: bool = True) -> dict:
+    if include is None:
+        include = DEFAULT_BALANCE_SECTIONS
+    unknown = set(include) - set(BALANCE_SECTIONS)
+    if unknown:
+        raise ValueError(f"不明な残高のセクションです: {', '.join(sorted(unknown))}")
+
+    params = {param: "true" if section in include else "false" for section, param in BALANCE_SECTIONS.items()}
+    params["noCache"] = "true" if no_cache else "false"
+    params["payPayLang"] = "ja"
+    return params
+
+def _parse_balance(balance: dict, keep_raw: bool = True) -> GetBalance:
+    return GetBalance(balance, keep_raw)
+
+def _link_info_params(url: str) -> dict:
+    return {
+        "verificationCode": url,
+        "payPayLang": "ja"
+    }
+
+def _parse_link_info(link_info: dict, keep_raw: bool = True) -> LinkInfo:
+    return LinkInfo(link_info, keep_raw)
+
+def _check_pending_link(link_info: dict):
+    _raise_for_result(link_info)
+
+    if link_info["payload"]["orderStatus"] != "PENDING":
+        raise PayPayError(LINK_NOT_PENDING)
+
+def _link_receive_payload(url: str, passcode: Optional[str], link_info: dict) -> dict:
+    _check_pending_link(link_info)
+
+    payload = {
+        "requestId": str(uuid4()),
+        "orderId": link_info["payload"]["pendingP2PInfo"]["orderId"],
+        "verificationCode": url,
+        "passcode": None,
+        "senderMessageId": link_info["payload"]["message"]["messageId"],
+        "senderChannelUrl": link_info["payload"]["message"]["chatRoomId"]
+    }
+
+    if link_info["payload"]["pendingP2PInfo"]["isSetPasscode"] and passcode == None:
+        raise PayPayError("このリンクにはパスワードが設定されています")
+
+    if link_info["payload"]["pendingP2PInfo"]["isSetPasscode"]:
+        payload["passcode"] = passcode
+
+    return payload
+
+def _link_reject_payload(url: str, link_info: dict) -> dict:
+    _check_pending_link(link_info)
+
+    return {
+        "requestId": str(uuid4()),
+        "orderId": link_info["payload"]["pendingP2PInfo"]["orderId"],
+        "verificationCode": url,
+        "senderMessageId": link_info["payload"]["message"]["messageId"],
+        "senderChannelUrl": link_info["payload"]["message"]["chatRoomId"]
+    }
+
+def _link_cancel_payload(url: str, link_info: dict) -> dict:
+    _check_pending_link(link_info)
+
+    return {
+        "orderId": link_info["payload"]["pendingP2PInfo"]["orderId"],
+        "requestId": str(uuid4()),
+        "verificationCode": url,
+    }
+
+def _create_link_payload(amount: int, passcode: Optional[str], pochibukuro: bool, theme: str,
+                         request_id: Optional[str] = None) -> dict:
+    payload = {
+        "requestId": request_id or str(uuid4()),
+        "amount": amount,
+        "socketConnection": "P2P",
+        "theme": theme,
+        "source": "sendmoney_home_sns"
+    }
+    if passcode:
+        payload["passcode"] = passcode
+    if pochibukuro:
+        payload["theme"] = "pochibukuro"
+    return payload
+
+def _parse_create_link(create: dict, keep_raw: bool = True) -> CreateLink:
+    return CreateLink(create, keep_raw)
+
+def _send_money_payload(amount: int, receiver_id: str, pochibukuro: bool, theme: str,
+                        request_id: Optional[str] = None) -> dict:
+    payload = {
+        "amount": amount,
+        "theme": theme,
+        "requestId": request_id or str(uuid4()),
+        "externalReceiverId": receiver_id,
+        "ackRiskError": False,
+        "source": "sendmoney_history_chat",
+        "socketConnection": "P2P"
+    }
+    if pochibukuro:
+        payload["theme"] = "pochibukuro"
+    return payload
+
+def _parse_send_money(send: dict, keep_raw: bool = True) -> SendMoney:
+    return SendMoney(send, keep_raw)
+
+def _send_message_payload(chat_room_id: str, message: str) -> dict:
+    return {
+        "channelUrl": chat_room_id,
+        "message": message,
+        "socketConnection": "P2P"
+    }
+
+def _p2pcode_payload(amount: Optional[int]) -> dict:
+    payload = {
+        "amount": None,
+        "sessionId": None
+    }
+    if amount:
+        payload["amount"] = amount
+        payload["sessionId"] = str(uuid4())
+    return payload
+
+def _parse_p2pcode(create_p2pcode: dict, keep_raw: bool = True) -> P2PCode:
+    return P2PCode(create_p2pcode, keep_raw)
+
+def _profile_params() -> dict:
+    return {
+        "includeExternalProfileSync": "true",
+        "completedOptionalTasks": "ENABLED_NEARBY"
+    }
+
+def _parse_profile(profile: dict, keep_raw: bool = True) -> Profile:
+    return Profile(profile, keep_raw)
+
+def _money_priority_payload(paypay_money: bool) -> dict:
+    if paypay_money:
+        return {"moneyPriority": "MONEY_FIRST"}
+    return {"moneyPriority": "MONEY_LITE_FIRST"}
+
+def _chat_rooms_params(size: int, last_message: bool) -> dict:
+    return {
+        "pageSize": str(size),
+        "customTypes": "P2P_CHAT,P2P_CHAT_INACTIVE,P2P_PUBLIC_GROUP_CHAT,P2P_LINK,P2P_OLD",
+        "requiresLastMessage": last_message,
+        "socketConnection": "P2P",
+        "payPayLang": "ja"
+    }
+
+def _chat_room_messages_params(chat_room_id: str, prev: int, next: int, include: bool,
+                               message_id: str = None) -> dict:
+    if not "sendbird_group_channel_" in chat_room_id:
+        chat_room_id = "sendbird_group_channel_" + chat_room_id
+
+    params = {
+        "chatRoomId": chat_room_id,
+        "include": include,
+        "prev": str(prev),
+        "next": str(next),
+        "payPayLang": "ja"
+    }
+    if message_id:
+        params["messageId"] = message_id
+    return params
+
+def _search_p2puser_payload(user_id: str, size: int, is_global: bool) -> dict:
+    payload = {
+        "searchTerm": user_id,
+        "pageToken": "",
+        "pageSize": size,
+        "isIngressSendMoney": False,
+        "searchTypes": "GLOBAL_SEARCH"
+    }
+    if not is_global:
+        payload["searchTypes"] = "FRIEND_AND_CANDIDATE_SEARCH"
+    return payload
+
+def _parse_p2puser(p2puser: dict, is_global: bool, order: int, keep_raw: bool = True) -> P2PUser:
+    if p2puser["header"]["resultCode"] == "S0001":
+        raise PayPayLoginError(p2puser)
+
+    if p2puser["header"]["resultCode"] != "S0000":
+        if _is_rate_limited(p2puser):
+            raise PayPayError("レート制限に達しました")
+
+        raise PayPayError(p2puser)
+
+    if p2puser["payload"]["searchResultEnum"] == "NO_USERS_FOUND":
+        raise PayPayError("ユーザーが見つかりませんでした")
+
+    if is_global:
+        name = p2puser["payload"]["globalSearchResult"]["displayName"]
+        icon = p2puser["payload"]["globalSearchResult"]["photoUrl"]
+        external_user_id = p2puser["payload"]["globalSearchResult"]["externalId"]
+    else:
+        name = p2puser["payload"]["friendsAndCandidatesSearchResults"]["friends"][order]["displayName"]
+        icon = p2puser["payload"]["friendsAndCandidatesSearchResults"]["friends"][order]["photoUrl"]
+        external_user_id = p2puser["payload"]["friendsAndCandidatesSearchResults"]["friends"][order]["externalId"]
+
+    return P2PUser(p2puser, keep_raw, name=name, icon=icon, external_user_id=external_user_id)
+
+def _initialize_chatroom_payload(external_user_id: str) -> dict:
+    return {
+        "returnChatRoom": True,
+        "shouldCheckMessageForFriendshipAppeal": True,
+        "externalUserId": external_user_id,
+        "socketConnection": "P2P"
+    }
+
+def _parse_initialize_chatroom(initialize: dict, keep_raw: bool = True) -> InitializeChatRoom:
+    return InitializeChatRoom(initialize, keep_raw)
+
+def _parse_barcode_info(barcode: dict, keep_raw: bool = True) -> BarcodeInfo:
+    return BarcodeInfo(barcode, keep_raw)
+
+def _request_not_sent(exc: Exception) -> bool:
+    """接続確立前の失敗か（サーバーにリクエストが届いていないことが確実か）"""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.ConnectionError) and exc.args:
+        return isinstance(getattr(exc.args[0], "reason", None), NewConnectionError)
+    return False
+
+class _RateLimitedAdapter(HTTPAdapter):
+    """送信前に RateLimiter の予算を消費する HTTPAdapter（ログインフローの通信も対象）"""
+    def __init__(self, rate_limiter: RateLimiter, **kwargs):
+        self.rate_limiter = rate_limiter
+        super().__init__(**kwargs)
+
+    def throttle(self, request) -> None:
+        """予算を消費する（足りなければ PayPayError。カセットの再生時にも呼ばれる）"""
+        started = time.perf_counter()
+        if not self.rate_limiter.acquire(request.url):
+            raise PayPayError(RATE_LIMITED)
+        # メトリクスの queue 時間に含める
+        request.queue_time = time.perf_counter() - started
+
+    def send(self, request, **kwargs):
+        self.throttle(request)
+        return super().send(request, **kwargs)
+
+def _read_snapshot(source) -> bytes:
+    """snapshot() のバイト列、またはファイルパスから中身を読む"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    with open(source, "rb") as f:
+        return f.read()
+
 class PayPay():
     def __init__(self, phone: str = None, password: str = None, device_uuid: str = None,
-                 client_uuid: str = str(uuid4()), access_token: str = None, proxy=None):
+                 client_uuid: str = str(uuid4()), access_token: str = None, proxy=None,
+                 link_info_ttl: float = 5.0, refresh_token: str = None, auto_refresh: bool = True,
+                 refresh_margin: float = 60.0, pool_connections: int = 4, pool_maxsize: int = 10,
+                 pool_block: bool = False, keep_alive: bool = True, warm_up: bool = False,
+                 policies: RequestPolicies = None, rate_limiter: RateLimiter = None, keep_raw: bool = True,
+                 json_codec="auto", metrics=None, tracer=None, cassette=None, single_flight: bool = False):
         """
         PayPay クライアント初期化
         
@@ -133,11 +543,51 @@ class PayPay():
             client_uuid: クライアントUUID
             access_token: アクセストークン（既に持っている場合）
             proxy: プロキシ設定
+            link_info_ttl: 送金リンク情報キャッシュの有効秒数（0 で無効）
+            refresh_token: リフレッシュトークン（既に持っている場合）
+            auto_refresh: 期限切れ前のトークン更新と、S0001 時の更新＋GET の再試行を自動で行う
+            refresh_margin: 有効期限の何秒前に更新するか
+            pool_connections: コネクションプールを保持するホスト数
+            pool_maxsize: 1 ホストあたりの最大接続数（同時に使うスレッド数に合わせる）
+            pool_block: 接続数が上限に達したとき、空くまで待つか（False なら一時接続を作る）
+            keep_alive: 接続を使い回すか（False なら毎回 Connection: close）
+            warm_up: 初期化時に app4 / www への TLS 接続を張っておく
+            policies: エンドポイントごとのタイムアウト・再試行設定（RequestPolicies）
+            rate_limiter: bff / p2p / portal ごとのクライアント側レート制限（RateLimiter）
+            keep_raw: 結果型に raw（レスポンス全体）を保持するか（False ならフィールドだけ残す）
+            json_codec: リクエスト / レスポンスの JSON コーデック（"auto" / "orjson" / "ujson" / "stdlib"）
+            metrics: 呼び出しごとの計測結果を受け取るオブザーバー（Metrics、または observe(record) を持つもの）
+            tracer: ログインフローの各ステップをスパンとして記録する Tracer
+            cassette: 通信を記録 / 再生する Cassette（オフラインでのベンチマーク・回帰テスト用）
+            single_flight: 同時に来た同じ GET（残高・プロフィールなど）を 1 回の通信にまとめ、結果を共有する（POST には適用しない）
         """
         if phone and "-" in phone:
             phone = phone.replace("-", "")
 
         self.session = requests.Session()
+        self.rate_limiter = rate_limiter
+        if rate_limiter:
+            adapter = _RateLimitedAdapter(rate_limiter, pool_connections=pool_connections,
+                                          pool_maxsize=pool_maxsize, pool_block=pool_block)
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        if metrics is not None:
+            instrument_adapter(adapter)
+        if cassette is not None:
+            adapter = cassette.adapter(adapter)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # link_check(web_api=True) 用。アプリのセッションの Cookie（aws-waf など）を www に送らないよう分ける
+        self._web_session = requests.Session()
+        self._web_session.mount("https://", adapter)
+        self._web_session.mount("http://", adapter)
+        self.metrics = metrics
+        self.tracer = tracer
+        self._flight = SingleFlight() if single_flight else None
+        self.pool_maxsize = pool_maxsize
+        self.keep_raw = keep_raw
+        self.codec = get_codec(json_codec)
+        self.policies = policies or RequestPolicies()
         self.proxy = None
         if isinstance(proxy, str):
             if not proxy.startswith("http"):
@@ -166,7 +616,7 @@ class PayPay():
             "Client-Type": "PAYPAYAPP",
             "Client-UUID": self.client_uuid,
             "Client-Version": self.version,
-            "Connection": "Keep-Alive",
+            "Connection": "Keep-Alive" if keep_alive else "close",
             "Content-Type": "application/x-www-form-urlencoded",
             "Device-Acceleration": device_state.device_acceleration,
             "Device-Acceleration-2": device_state.device_acceleration_2,
@@ -190,19 +640,169 @@ class PayPay():
             "User-Agent": f"PaypayApp/{self.version} Android10"
         }
 
+        self.auto_refresh = auto_refresh
+        self.refresh_margin = refresh_margin
+        self.token_expires_at = None
+        self._refresh_lock = threading.Lock()
+        self._refresh_stop = None
+
+        self.access_token = None
+        self.refresh_token = refresh_token
         if access_token:
-            self.access_token = access_token
-            self.headers["Authorization"] = f"Bearer {self.access_token}"
-            self.headers["content-type"] = "application/json"
-        else:
-            self.access_token = None
-            self.refresh_token = None
+            self._set_tokens(access_token)
+            self.headers = {**self.headers, "Content-Type": "application/json"}
 
         self._init_phone = phone
         self._init_password = password
 
+        # verificationCode -> (有効期限, getP2PLinkInfo のレスポンス)
+        self.link_info_ttl = link_info_ttl
+        self._link_info_cache = {}
+        self._link_info_lock = threading.Lock()
+
+        if warm_up:
+            self.warm_up()
+
+    def _set_tokens(self, access_token: str, refresh_token: str = None) -> None:
+        """
+        トークンと有効期限、Authorization ヘッダーを更新
+
+        送信中の他スレッドが同じ dict を読んでいるため、ヘッダーは書き換えずに差し替える。
+        """
+        headers = dict(self.headers)
+        headers["Authorization"] = f"Bearer {access_token}"
+        self.headers = headers
+        self.access_token = access_token
+        if refresh_token is not None:
+            self.refresh_token = refresh_token
+        self.token_expires_at = _token_expiry(access_token)
+
+    def warm_up(self, connections: int = 1) -> None:
+        """
+        app4.paypay.ne.jp / www.paypay.ne.jp への TLS 接続を先に張ってプールに入れておく
+
+        Args:
+            connections: 1 ホストあたりに開く接続数（pool_maxsize まで）
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        connections = max(1, min(connections, self.pool_maxsize))
+        urls = ["https://app4.paypay.ne.jp/", "https://www.paypay.ne.jp/"] * connections
+
+        def touch(url):
+            try:
+                self.session.head(url, proxies=self.proxy, timeout=10, allow_redirects=False)
+            except (requests.RequestException, PayPayError, PayPayNetWorkError) as e:
+                # 通信エラー・レート制限（block=False）・カセットの再生で記録がないときなど
+                _debug("warm up failed:", url, repr(e))
+
+        with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+            list(pool.map(touch, urls))
+
+    def _token_expiring(self) -> bool:
+        """アクセストークンが refresh_margin 以内に期限切れになるか"""
+        if not self.refresh_token or self.token_expires_at is None:
+            return False
+        return self.token_expires_at - self.refresh_margin <= time.time()
+
+    def _auto_refresh_delay(self) -> float:
+        """次に期限を確認するまでの秒数"""
+        if self.token_expires_at is None:
+            return 60.0
+        return max(self.token_expires_at - self.refresh_margin - time.time(), 1.0)
+
+    def _refresh_access_token(self, stale_token: str) -> None:
+        """
+        トークン更新を 1 回にまとめる
+
+        stale_token は呼び出し側が使っていたトークン。ロック取得までに他のスレッドが
+        更新済みなら、リフレッシュ API は呼ばない。
+        """
+        with self._refresh_lock:
+            if self.access_token != stale_token:
+                return
+            if not self.refresh_token:
+                raise PayPayLoginError("refresh_token がないためトークンを更新できません")
+            self.token_refresh(self.refresh_token)
+
+    def start_auto_refresh(self) -> None:
+        """バックグラウンドスレッドで有効期限前にトークンを更新し続ける"""
+        if self._refresh_stop is not None and not self._refresh_stop.is_set():
+            return
+        self._refresh_stop = threading.Event()
+        threading.Thread(target=self._auto_refresh_loop, args=(self._refresh_stop,),
+                         name="paypay-token-refresh", daemon=True).start()
+
+    def stop_auto_refresh(self) -> None:
+        if self._refresh_stop is not None:
+            self._refresh_stop.set()
+
+    def _auto_refresh_loop(self, stop: threading.Event) -> None:
+        while not stop.wait(self._auto_refresh_delay()):
+            token = self.access_token
+            if not self._token_expiring():
+                continue
+            try:
+                self._refresh_access_token(token)
+            except Exception as e:
+                _debug("バックグラウンドのトークン更新に失敗:", repr(e))
+
+    def _cached_link_info(self, code: str) -> Optional[dict]:
+        """キャッシュ済みの送金リンク情報を返す（期限切れなら None）"""
+        with self._link_info_lock:
+            cached = self._link_info_cache.get(code)
+            if not cached:
+                return None
+            if cached[0] < time.monotonic():
+                self._link_info_cache.pop(code, None)
+                return None
+            return cached[1]
+
+    def _store_link_info(self, code: str, link_info: dict) -> None:
+        """成功した送金リンク情報をキャッシュに保存"""
+        if self.link_info_ttl <= 0 or link_info["header"]["resultCode"] != "S0000":
+            return
+        now = time.monotonic()
+        with self._link_info_lock:
+            if len(self._link_info_cache) >= 256:
+                for key, (expires, _) in list(self._link_info_cache.items()):
+                    if expires < now:
+                        self._link_info_cache.pop(key, None)
+            self._link_info_cache[code] = (now + self.link_info_ttl, link_info)
+
+    def invalidate_link_info(self, url: str = None) -> None:
+        """送金リンク情報のキャッシュを破棄（url 省略時は全件）"""
+        code = None if url is None else _strip_link(url)
+        with self._link_info_lock:
+            if code is None:
+                self._link_info_cache.clear()
+            else:
+                self._link_info_cache.pop(code, None)
+
+    def _get_link_info(self, code: str, no_cache: bool = False) -> dict:
+        """getP2PLinkInfo をキャッシュ経由で取得（no_cache=True ならキャッシュを読まず、保存もしない）"""
+        if no_cache:
+            return self._request("GET", "https://app4.paypay.ne.jp/bff/v2/getP2PLinkInfo",
+                                 params=_link_info_params(code))
+        link_info = self._cached_link_info(code)
+        if link_info is None:
+            link_info = self._request("GET", "https://app4.paypay.ne.jp/bff/v2/getP2PLinkInfo",
+                                      params=_link_info_params(code))
+            self._store_link_info(code, link_info)
+        return link_info
+
+    def _span(self, name: str, url: str = None):
+        """tracer があればスパンを作る（なければ何もしないスパン）"""
+        if self.tracer is None:
+            return NOOP_SPAN
+        if url is None:
+            return self.tracer.span(name)
+        return self.tracer.span(name, kind=SPAN_KIND_CLIENT, **{"http.url": url})
+
     def _prepare_oauth_par(self):
         """PAR（Pushed Authorization Request）を取得"""
+        import pkce
+
         if not hasattr(self, "code_verifier") or not hasattr(self, "code_challenge"):
             self.code_verifier, self.code_challenge = pkce.generate_pkce_pair(43)
 
@@ -222,7 +822,7 @@ class PayPay():
             "uiLocales": "ja"
         }
         resp = self.session.post("https://app4.paypay.ne.jp/bff/v2/oauth2/par?payPayLang=ja",
-                                 headers=self.headers, data=payload, proxies=self.proxy)
+                                 headers=self.headers, data=payload, proxies=self.proxy, timeout=self.policies.default.timeout)
         try:
             return resp.json()
         except Exception:
@@ -235,7 +835,14 @@ class PayPay():
         このメソッドは以下の処理を実行します：
         1. device_uuid を指定した場合、既にペアリング済みと判断し、スキップします
         2. device_uuid がない場合、完全な OTP/SMS フローを実行
+
+        tracer を指定した場合、フロー全体を親スパン、各ステップを子スパンとして記録します。
         """
+        with self._span("prepare_login_flow_with_waf"):
+            return self._prepare_login_flow(phone, password, device_uuid)
+
+    def _prepare_login_flow(self, phone: str = None, password: str = None, device_uuid: str = None):
+        """prepare_login_flow_with_waf の本体"""
         phone = phone or self._init_phone
         password = password or self._init_password
         
@@ -251,7 +858,9 @@ class PayPay():
 
         # 1) PAR 取得
         _debug("Step 1: PAR 取得中...")
-        par = self._prepare_oauth_par()
+        with self._span("oauth2/par", "https://app4.paypay.ne.jp/bff/v2/oauth2/par") as span:
+            par = self._prepare_oauth_par()
+            span.record(result=par)
         if par["header"]["resultCode"] != "S0000":
             raise PayPayLoginError(par)
         _debug("Step 1: PAR 取得成功")
@@ -278,7 +887,8 @@ class PayPay():
 
         # 2) authorize 前 WAF 解決
         _debug("Step 2: authorize 前の WAF 解決を試みています...")
-        _try_solve_waf(self.session, web_headers.get("User-Agent"), self.proxy)
+        with self._span("waf (authorize)"):
+            _try_solve_waf(self.session, web_headers.get("User-Agent"), self.proxy)
 
         params = {
             "client_id": "pay2-mobile-app-client",
@@ -287,19 +897,24 @@ class PayPay():
 
         # 3) authorize 呼び出し
         _debug("Step 3: authorize エンドポイント呼び出し中...")
-        self.session.get("https://www.paypay.ne.jp/portal/api/v2/oauth2/authorize",
-                        headers=web_headers, params=params, proxies=self.proxy)
+        with self._span("oauth2/authorize", "https://www.paypay.ne.jp/portal/api/v2/oauth2/authorize") as span:
+            resp = self.session.get("https://www.paypay.ne.jp/portal/api/v2/oauth2/authorize",
+                                    headers=web_headers, params=params, proxies=self.proxy, timeout=self.policies.default.timeout)
+            span.record(resp)
         _debug("Step 3: authorize 完了")
 
         # 4) sign-in 前 WAF 再度解決
         _debug("Step 4: sign-in 前の WAF 解決を試みています...")
-        _try_solve_waf(self.session, web_headers.get("User-Agent"), self.proxy)
+        with self._span("waf (sign-in)"):
+            _try_solve_waf(self.session, web_headers.get("User-Agent"), self.proxy)
 
         # 5) sign-in ランディング
         _debug("Step 5: sign-in ランディングページにアクセス中...")
         sign_in_params = {"client_id": "pay2-mobile-app-client", "mode": "landing"}
-        self.session.get("https://www.paypay.ne.jp/portal/oauth2/sign-in",
-                        headers=web_headers, params=sign_in_params, proxies=self.proxy)
+        with self._span("oauth2/sign-in (landing)", "https://www.paypay.ne.jp/portal/oauth2/sign-in") as span:
+            resp = self.session.get("https://www.paypay.ne.jp/portal/oauth2/sign-in",
+                                    headers=web_headers, params=sign_in_params, proxies=self.proxy, timeout=self.policies.default.timeout)
+            span.record(resp)
         _debug("Step 5: sign-in ランディング完了")
 
         # 6) par/check
@@ -324,31 +939,36 @@ class PayPay():
             "User-Agent": "Mozilla/5.0 (Linux; Android 10; SCV38; wv) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132 Mobile Safari/537.36",
             "X-Requested-With": "jp.ne.paypay.android.app"
         }
-        try:
-            _debug("par/check: 通常呼び出しを試します")
-            par_check_resp = self.session.get("https://www.paypay.ne.jp/portal/api/v2/oauth2/par/check",
-                                              headers=api_headers, proxies=self.proxy, timeout=30)
+        with self._span("oauth2/par/check", "https://www.paypay.ne.jp/portal/api/v2/oauth2/par/check") as span:
             try:
-                par_check = par_check_resp.json()
-            except Exception:
+                _debug("par/check: 通常呼び出しを試します")
+                par_check_resp = self.session.get("https://www.paypay.ne.jp/portal/api/v2/oauth2/par/check",
+                                                  headers=api_headers, proxies=self.proxy, timeout=30)
+                span.record(par_check_resp)
+                try:
+                    par_check = par_check_resp.json()
+                except Exception:
+                    par_check = {"header": {"resultCode": "S9999"}}
+            except Exception as e:
                 par_check = {"header": {"resultCode": "S9999"}}
-        except Exception as e:
-            par_check = {"header": {"resultCode": "S9999"}}
+            span.record(result=par_check)
 
         if par_check.get("header", {}).get("resultCode") != "S0000":
             _debug("par/check failed (S9999 or other). Trying browserless fallback attempts...")
-            try:
-                from .waf_browserless_helper import attempt_par_check_without_browser
-            except Exception as e:
-                raise PayPayLoginError({"error": "waf_browserless_helper_missing", "exc": str(e)})   
-            try:
-                par_check = attempt_par_check_without_browser(self.session,
-                                                             par["payload"]["requestUri"],
-                                                             web_headers, api_headers,
-                                                             proxy=self.proxy,
-                                                             max_retries=3, wait=0.6)
-            except Exception as e:
-                raise PayPayLoginError({"error": "par_check_failed_after_fallback", "detail": str(e)})
+            with self._span("oauth2/par/check (fallback)") as span:
+                try:
+                    from .waf_browserless_helper import attempt_par_check_without_browser
+                except Exception as e:
+                    raise PayPayLoginError({"error": "waf_browserless_helper_missing", "exc": str(e)})   
+                try:
+                    par_check = attempt_par_check_without_browser(self.session,
+                                                                 par["payload"]["requestUri"],
+                                                                 web_headers, api_headers,
+                                                                 proxy=self.proxy,
+                                                                 max_retries=3, wait=0.6)
+                except Exception as e:
+                    raise PayPayLoginError({"error": "par_check_failed_after_fallback", "detail": str(e)})
+                span.record(result=par_check)
 
         _debug("Step 6: PAR チェック成功")
         # 7) パスワード認証
@@ -368,10 +988,13 @@ class PayPay():
             "password": password,
             "signInAttemptCount": 1
         }
-        signin = self.session.post(
-            "https://www.paypay.ne.jp/portal/api/v2/oauth2/sign-in/password",
-            headers=auth_headers, json=signin_payload, proxies=self.proxy
-        ).json()
+        with self._span("oauth2/sign-in/password", "https://www.paypay.ne.jp/portal/api/v2/oauth2/sign-in/password") as span:
+            resp = self.session.post(
+                "https://www.paypay.ne.jp/portal/api/v2/oauth2/sign-in/password",
+                headers=auth_headers, json=signin_payload, proxies=self.proxy, timeout=self.policies.default.timeout
+            )
+            signin = resp.json()
+            span.record(resp, signin)
         if signin["header"]["resultCode"] != "S0000":
             raise PayPayLoginError(signin)
         _debug("Step 7: パスワード認証成功")
@@ -394,18 +1017,19 @@ class PayPay():
                 "code": uri[0].replace("code=", ""),
                 "codeVerifier": self.code_verifier if hasattr(self, "code_verifier") else ""
             }
-            get_token = self.session.post(
-                "https://app4.paypay.ne.jp/bff/v2/oauth2/token",
-                headers=headers_token, data=confirm_data, params=self.params, proxies=self.proxy
-            ).json()
+            with self._span("oauth2/token", "https://app4.paypay.ne.jp/bff/v2/oauth2/token") as span:
+                resp = self.session.post(
+                    "https://app4.paypay.ne.jp/bff/v2/oauth2/token",
+                    headers=headers_token, data=confirm_data, params=self.params, proxies=self.proxy, timeout=self.policies.default.timeout
+                )
+                get_token = resp.json()
+                span.record(resp, get_token)
             if get_token["header"]["resultCode"] != "S0000":
                 raise PayPayLoginError(get_token)
             
-            self.access_token = get_token["payload"]["accessToken"]
-            self.refresh_token = get_token["payload"]["refreshToken"]
-            self.headers["Authorization"] = f"Bearer {self.access_token}"
-            self.headers["content-type"] = "application/json"
-            self.headers = update_header_device_state(self.headers)
+            self._set_tokens(get_token["payload"]["accessToken"], get_token["payload"]["refreshToken"])
+            # 送信中の他スレッドが読んでいる dict は書き換えず、コピーを更新して差し替える
+            self.headers = update_header_device_state({**self.headers, "Content-Type": "application/json"})
             _debug("Step 8: Device-UUID フロー完了 - ログイン成功")
             _debug("=== OTP/SMS フロー完了（Device-UUID使用） ===")
             return
@@ -414,10 +1038,13 @@ class PayPay():
 
         # 9) コード更新初期化
         _debug("Step 9: コード更新初期化中...")
-        code_update = self.session.post(
-            "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/update",
-            headers=auth_headers, json={}, proxies=self.proxy
-        ).json()
+        with self._span("code-grant/update (init)", "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/update") as span:
+            resp = self.session.post(
+                "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/update",
+                headers=auth_headers, json={}, proxies=self.proxy, timeout=self.policies.default.timeout
+            )
+            code_update = resp.json()
+            span.record(resp, code_update)
         if code_update["header"]["resultCode"] != "S0000":
             raise PayPayLoginError(code_update)
         _debug("Step 9: コード更新初期化完了")
@@ -439,10 +1066,13 @@ class PayPay():
                 }
             }
         }
-        nav_2fa = self.session.post(
-            "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/update",
-            headers=auth_headers, json=nav_2fa_payload, proxies=self.proxy
-        ).json()
+        with self._span("code-grant/update (2fa select flow)", "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/update") as span:
+            resp = self.session.post(
+                "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/update",
+                headers=auth_headers, json=nav_2fa_payload, proxies=self.proxy, timeout=self.policies.default.timeout
+            )
+            nav_2fa = resp.json()
+            span.record(resp, nav_2fa)
         if nav_2fa["header"]["resultCode"] != "S0000":
             raise PayPayLoginError(nav_2fa)
         _debug("Step 10: 2FA フロー選択完了")
@@ -451,10 +1081,13 @@ class PayPay():
         _debug("Step 11: OTL リクエスト開始中（SMS 送信をトリガー）...")
         auth_headers["Referer"] = "https://www.paypay.ne.jp/portal/oauth2/otl-request?client_id=pay2-mobile-app-client&mode=navigation-2fa"
         
-        otl_request = self.session.post(
-            "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/side-channel/next-action-polling",
-            headers=auth_headers, json={"waitUntil": "PT5S"}, proxies=self.proxy
-        ).json()
+        with self._span("side-channel/next-action-polling", "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/side-channel/next-action-polling") as span:
+            resp = self.session.post(
+                "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/side-channel/next-action-polling",
+                headers=auth_headers, json={"waitUntil": "PT5S"}, proxies=self.proxy, timeout=self.policies.default.timeout
+            )
+            otl_request = resp.json()
+            span.record(resp, otl_request)
         if otl_request["header"]["resultCode"] != "S0000":
             raise PayPayLoginError(otl_request)
         _debug("Step 11: OTL リクエスト開始成功 - SMS が送信されました！")
@@ -463,7 +1096,14 @@ class PayPay():
     def login(self, url: str):
         """
         OTL コードを使用してログイン完了
+
+        tracer を指定した場合、ログイン全体を親スパン、各ステップを子スパンとして記録します。
         """
+        with self._span("login"):
+            return self._login(url)
+
+    def _login(self, url: str):
+        """login の本体"""
         if "https://" in url:
             url = url.replace("https://www.paypay.ne.jp/portal/oauth2/l?id=", "")
 
@@ -496,10 +1136,13 @@ class PayPay():
         }
 
         _debug("Step 1: OTL コード検証中...")
-        confirm_url = self.session.post(
-            "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/sign-in/2fa/otl/verify",
-            headers=headers, json={"code": url}, proxies=self.proxy
-        ).json()
+        with self._span("sign-in/2fa/otl/verify", "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/sign-in/2fa/otl/verify") as span:
+            resp = self.session.post(
+                "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/sign-in/2fa/otl/verify",
+                headers=headers, json={"code": url}, proxies=self.proxy, timeout=self.policies.default.timeout
+            )
+            confirm_url = resp.json()
+            span.record(resp, confirm_url)
         if confirm_url["header"]["resultCode"] != "S0000":
             raise PayPayLoginError(confirm_url)
         _debug("Step 1: OTL コード検証成功")
@@ -514,10 +1157,13 @@ class PayPay():
                 }
             }
         }
-        get_uri = self.session.post(
-            "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/update",
-            headers=headers, json=payload, proxies=self.proxy
-        ).json()
+        with self._span("code-grant/update (complete otl)", "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/update") as span:
+            resp = self.session.post(
+                "https://www.paypay.ne.jp/portal/api/v2/oauth2/extension/code-grant/update",
+                headers=headers, json=payload, proxies=self.proxy, timeout=self.policies.default.timeout
+            )
+            get_uri = resp.json()
+            span.record(resp, get_uri)
         if get_uri["header"]["resultCode"] != "S0000":
             raise PayPayLoginError(get_uri)
         _debug("Step 2: OTL フロー完了")
@@ -539,235 +1185,290 @@ class PayPay():
             "codeVerifier": self.code_verifier if hasattr(self, "code_verifier") else ""
         }
 
-        get_token = self.session.post(
-            "https://app4.paypay.ne.jp/bff/v2/oauth2/token",
-            headers=headers_token, data=confirm_data, params=self.params, proxies=self.proxy
-        ).json()
+        with self._span("oauth2/token", "https://app4.paypay.ne.jp/bff/v2/oauth2/token") as span:
+            resp = self.session.post(
+                "https://app4.paypay.ne.jp/bff/v2/oauth2/token",
+                headers=headers_token, data=confirm_data, params=self.params, proxies=self.proxy, timeout=self.policies.default.timeout
+            )
+            get_token = resp.json()
+            span.record(resp, get_token)
         if get_token["header"]["resultCode"] != "S0000":
             raise PayPayLoginError(get_token)
         _debug("Step 3: トークン交換成功")
 
-        self.access_token = get_token["payload"]["accessToken"]
-        self.refresh_token = get_token["payload"]["refreshToken"]
-        self.headers["Authorization"] = f"Bearer {self.access_token}"
-        self.headers["content-type"] = "application/json"
-        self.headers = update_header_device_state(self.headers)
+        self._set_tokens(get_token["payload"]["accessToken"], get_token["payload"]["refreshToken"])
+        self.headers = update_header_device_state({**self.headers, "Content-Type": "application/json"})
 
         _debug("=== ログイン完了 ===")
         return get_token
 
-    def token_refresh(self, refresh_token: str) -> dict:
-        """トークンをリフレッシュ"""
+    def _request(self, method: str, url: str, params: dict = None, json: dict = None,
+                 data: dict = None, headers: dict = None) -> dict:
+        """
+        API を呼び出し、レスポンスの JSON を返す
+
+        single_flight が有効なら、実行中の同じ GET の結果を共有する（返る dict は共有なので書き換えないこと）。
+        """
+        if self._flight is not None and method == "GET" and headers is None:
+            return self._flight.do(_flight_key(url, params), lambda: self._call(method, url, params))
+        return self._call(method, url, params, json, data, headers)
+
+    def _call(self, method: str, url: str, params: dict = None, json: dict = None,
+              data: dict = None, headers: dict = None) -> dict:
+        """
+        _request の本体
+
+        auto_refresh が有効なら期限切れ間近のトークンを先に更新し、
+        GET が S0001 になった場合はトークンを 1 回だけ更新して再送する。
+        """
+        refreshable = self.auto_refresh and headers is None and "/oauth2/" not in url
+        # 期限の確認より前のトークンを渡す（確認後に他で更新済みなら、もう一度は更新しない）
+        token = self.access_token
+        if refreshable and self._token_expiring():
+            self._refresh_access_token(token)
+            token = self.access_token
+
+        result = self._send(method, url, params, json, data, headers)
+        if (refreshable and method == "GET" and self.refresh_token and isinstance(result, dict)
+                and result.get("header", {}).get("resultCode") == "S0001"):
+            _debug("S0001: トークンを更新して再試行します")
+            self._refresh_access_token(token)
+            result = self._send(method, url, params, json, data, headers)
+        return result
+
+    def _send(self, method: str, url: str, params: dict = None, json: dict = None,
+              data: dict = None, headers: dict = None, session: requests.Session = None) -> dict:
+        """HTTP リクエストを送り JSON をデコードする（タイムアウト・再試行は RequestPolicy に従う。session 省略時は self.session）"""
+        policy = self.policies.get(url)
+        idempotent = policy.is_idempotent(method)
+        if json is not None:
+            # Content-Type はヘッダー側で指定済み
+            data = self.codec.dumps(json)
+        # metrics 未指定なら計測はしない（以下の timer の分岐だけ）
+        timer = None if self.metrics is None else RequestTimer(self.metrics, method, url)
+        attempt = 0
+        while True:
+            if timer:
+                timer.start()
+            try:
+                resp = (session or self.session).request(method, url, headers=headers or self.headers, params=params,
+                                                         data=data, proxies=self.proxy, timeout=policy.timeout)
+            except requests.RequestException as e:
+                if attempt < policy.retries and (idempotent or _request_not_sent(e)):
+                    _debug(f"{method} {url} 再試行 {attempt + 1}/{policy.retries}:", repr(e))
+                    delay = policy.delay(attempt)
+                    if timer:
+                        timer.backoff(delay)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                if timer:
+                    timer.finish(error=type(e).__name__)
+                raise PayPayNetWorkError(str(e)) from e
+            except PayPayError:
+                # レート制限で送れなかった
+                if timer:
+                    timer.finish(error="rate_limited")
+                raise
+
+            if timer:
+                timer.received(resp)
+            try:
+                result = self.codec.loads(resp.content)
+            except Exception:
+                result = None
+            if timer:
+                timer.decoded()
+
+            if idempotent and attempt < policy.retries and _is_retryable_result(resp.status_code, result):
+                _debug(f"{method} {url} 再試行 {attempt + 1}/{policy.retries}: status={resp.status_code}")
+                delay = policy.delay(attempt)
+                if timer:
+                    timer.backoff(delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if result is None:
+                if timer:
+                    timer.finish(error="non_json")
+                raise PayPayNetWorkError("日本以外からは接続できません")
+            if timer:
+                timer.finish(result)
+            return result
+
+    def token_refresh(self, refresh_token: str = None) -> dict:
+        """トークンをリフレッシュ（refresh_token 省略時は保持しているものを使用）"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
         _debug("トークンリフレッシュ中...")
-        refdata = {
-            "clientId": "pay2-mobile-app-client",
-            "refreshToken": refresh_token,
-            "tokenVersion": "v2"
-        }
-        refresh = self.session.post("https://app4.paypay.ne.jp/bff/v2/oauth2/refresh",
-                                   headers=self.headers, data=refdata, proxies=self.proxy).json()
+        refresh = self._request("POST", "https://app4.paypay.ne.jp/bff/v2/oauth2/refresh",
+                                data=_refresh_data(refresh_token or self.refresh_token))
+        _check_refresh(refresh)
 
-        if refresh["header"]["resultCode"] == "S0001" or refresh["header"]["resultCode"] == "S1003":
-            raise PayPayLoginError(refresh)
+        self._set_tokens(refresh["payload"]["accessToken"], refresh["payload"]["refreshToken"])
 
-        if refresh["header"]["resultCode"] == "S0003":
-            raise PayPayLoginError(refresh)
+        return refresh
 
-        if refresh["header"]["resultCode"] != "S0000":
-            raise PayPayError(refresh)
+    def check_token(self) -> None:
+        """
+        アクセストークンが使えるか 1 回だけ確認（auto_refresh が有効なら期限切れ時に更新してから再確認）
 
-        self.access_token = refresh["payload"]["accessToken"]
-        self.refresh_token = refresh["payload"]["refreshToken"]
-        self.headers["Authorization"] = f"Bearer {refresh['payload']['accessToken']}"
+        使えなければ PayPayLoginError を送出します。
+        """
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
 
-        return refresh
+        status = self._request("GET", "https://app4.paypay.ne.jp/bff/v1/getGlobalServiceStatus?payPayLang=en")
+        _raise_for_result(status)
+
+    def snapshot(self, path: str = None, password: str = None) -> bytes:
+        """
+        ログイン状態（トークン・UUID・ヘッダー・Cookie）を保存
+
+        Args:
+            path: 保存先ファイル（指定時は一時ファイル経由で置き換えて書き込む）
+            password: 指定すると暗号化して保存（cryptography が必要）
+
+        Returns:
+            保存した内容（バイト列）
+        """
+        from .session_state import dump_state, encode_state, atomic_write
+
+        blob = encode_state(dump_state(self), password)
+        if path is not None:
+            atomic_write(path, blob)
+        return blob
+
+    @classmethod
+    def restore(cls, source, password: str = None, verify: bool = True, **kwargs):
+        """
+        snapshot() で保存した状態からクライアントを作り直す（ログイン不要）
+
+        Args:
+            source: snapshot() のファイルパス、またはバイト列
+            password: 暗号化して保存した場合のパスワード
+            verify: 復元後に check_token() でトークンを 1 回確認する
+            **kwargs: コンストラクタに渡す追加の引数（proxy, policies など）
+        """
+        from .session_state import decode_state, load_state
+
+        state = decode_state(_read_snapshot(source), password)
+        client = cls(device_uuid=state["device_uuid"], client_uuid=state["client_uuid"],
+                     access_token=state.get("access_token"), refresh_token=state.get("refresh_token"), **kwargs)
+        load_state(client, state)
+        if verify:
+            client.check_token()
+        return client
 
     def get_history(self, size: int = 20, cashback: bool = False) -> dict:
         """取引履歴を取得"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        params = {
-            "pageSize": str(size),
-            "orderTypes": "",
-            "paymentMethodTypes": "",
-            "signUpCompletedAt": "2021-01-02T10:16:24Z",
-            "isOverdraftOnly": "false",
-            "payPayLang": "ja"
-        }
-        if cashback:
-            params["orderTypes"] = "CASHBACK"
-
-        history = self.session.get("https://app4.paypay.ne.jp/bff/v3/getPaymentHistory",
-                                   params=params, headers=self.headers, proxies=self.proxy).json()
+        history = self._request("GET", "https://app4.paypay.ne.jp/bff/v3/getPaymentHistory",
+                                params=_history_params(size, cashback))
+        _raise_for_result(history)
 
-        if history["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(history)
+        return history
 
-        if history["header"]["resultCode"] != "S0000":
-            raise PayPayError(history)
+    def iter_history(self, page_size: int = 20, cashback: bool = False, point: bool = False,
+                     until_order_id: str = None, until_time=None, limit: int = None):
+        """
+        取引履歴を新しい順に 1 件ずつ返すジェネレータ
 
-        return history
+        必要な分だけページを取得し、サーバーのページングカーソルを辿ります。
+        カーソルは payload の lastEvaluatedKey（HISTORY_CURSOR_KEY）を次のリクエストのクエリにそのまま渡す想定で、
+        実際のレスポンスでは確認できていません。page_size 件そろったページにカーソルがなければ、
+        続きを取れないので PayPayError(HISTORY_TRUNCATED) を投げます（それまでの取引は返した後です）。
 
-    def get_balance(self):
-        """残高情報を取得"""
+        Args:
+            page_size: 1 ページあたりの件数
+            cashback: True ならキャッシュバックのみ
+            point: True ならポイント履歴（get_point_history と同じ条件）
+            until_order_id: この orderId に到達したら停止（その取引は返さない）
+            until_time: この時刻以前の取引に到達したら停止（datetime / UNIX 秒 / ISO 8601）
+            limit: 返す最大件数
+        """
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        params = {
-            "includePendingBonusLite": "false",
-            "includePending": "true",
-            "noCache": "true",
-            "includeKycInfo": "true",
-            "includePayPaySecuritiesInfo": "true",
-            "includePointInvestmentInfo": "true",
-            "includePayPayBankInfo": "true",
-            "includeGiftVoucherInfo": "true",
-            "payPayLang": "ja"
-        }
-        balance = self.session.get("https://app4.paypay.ne.jp/bff/v1/getBalanceInfo",
-                                  headers=self.headers, params=params, proxies=self.proxy).json()
+        until_time = _parse_time(until_time)
+        cursor = None
+        count = 0
+        while limit is None or count < limit:
+            history = self._request("GET", "https://app4.paypay.ne.jp/bff/v3/getPaymentHistory",
+                                    params=_history_page_params(page_size, cashback, point, cursor))
+            _raise_for_result(history)
+
+            for item in _history_items(history):
+                if limit is not None and count >= limit:
+                    return
+                if _history_reached(item, until_order_id, until_time):
+                    return
+                yield item
+                count += 1
+
+            if limit is not None and count >= limit:
+                return
+            cursor = _history_next(history, page_size)
+            if not cursor:
+                return
+
+    def get_balance(self, include: tuple = None, no_cache: bool = True):
+        """
+        残高情報を取得
 
-        if balance["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(balance)
+        Args:
+            include: 取得するセクション（BALANCE_SECTIONS のキー）。None なら従来どおりすべて、() なら残高だけ
+            no_cache: サーバー側のキャッシュを使わない
+        """
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
 
-        if balance["header"]["resultCode"] != "S0000":
-            raise PayPayError(balance)
+        balance = self._request("GET", "https://app4.paypay.ne.jp/bff/v1/getBalanceInfo",
+                                params=_balance_params(include, no_cache))
+        _raise_for_result(balance)
 
-        try:
-            money = balance["payload"]["walletDetail"]["emoneyBalanceInfo"]["balance"]
-        except:
-            money = None
-
-        class GetBalance(NamedTuple):
-            money: int
-            money_light: int
-            all_balance: int
-            useable_balance: int
-            points: int
-            raw: dict
-
-        money_light = balance["payload"]["walletDetail"]["prepaidBalanceInfo"]["balance"]
-        all_balance = balance["payload"]["walletSummary"]["allTotalBalanceInfo"]["balance"]
-        useable_balance = balance["payload"]["walletSummary"]["usableBalanceInfoWithoutCashback"]["balance"]
-        points = balance["payload"]["walletDetail"]["cashBackBalanceInfo"]["balance"]
-
-        return GetBalance(money, money_light, all_balance, useable_balance, points, balance)
-
-    def link_check(self, url: str, web_api: bool = False):
-        """送金リンク情報を確認"""
-        if "https://" in url:
-            url = url.replace("https://pay.paypay.ne.jp/", "")
+        return _parse_balance(balance, self.keep_raw)
+
+    def link_check(self, url: str, web_api: bool = False, no_cache: bool = False):
+        """送金リンク情報を確認（no_cache=True なら送金リンク情報のキャッシュを使わずに取得する）"""
+        url = _strip_link(url)
 
         if web_api:
-            headers = {
-                "Accept": "application/json, text/plain, */*",
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36',
-                "Content-Type": "application/json"
-            }
-            link_info = requests.get(f"https://www.paypay.ne.jp/app/v2/p2p-api/getP2PLinkInfo?verificationCode={url}",
-                                    headers=headers, proxies=self.proxy).json()
+            # ログイン不要の Web API。アプリのセッションの Cookie は送らない
+            link_info = self._send("GET", "https://www.paypay.ne.jp/app/v2/p2p-api/getP2PLinkInfo",
+                                   params={"verificationCode": url}, headers=WEB_API_HEADERS, session=self._web_session)
 
         else:
             if not self.access_token:
                 raise PayPayLoginError("まずはログインしてください")
 
-            params = {
-                "verificationCode": url,
-                "payPayLang": "ja"
-            }
-            link_info = self.session.get("https://app4.paypay.ne.jp/bff/v2/getP2PLinkInfo",
-                                        headers=self.headers, params=params, proxies=self.proxy).json()
-
-        if link_info["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(link_info)
-
-        if link_info["header"]["resultCode"] != "S0000":
-            raise PayPayError(link_info)
-
-        class LinkInfo(NamedTuple):
-            sender_name: str
-            sender_external_user_id: str
-            sender_icon: str
-            order_id: str
-            chat_room_id: str
-            amount: int
-            status: str
-            money_light: int
-            money: int
-            has_password: bool
-            raw: dict
-
-        sender_name = link_info["payload"]["sender"]["displayName"]
-        sender_external_user_id = link_info["payload"]["sender"]["externalId"]
-        sender_icon = link_info["payload"]["sender"]["photoUrl"]
-        order_id = link_info["payload"]["pendingP2PInfo"]["orderId"]
-        chat_room_id = link_info["payload"]["message"]["chatRoomId"]
-        amount = link_info["payload"]["pendingP2PInfo"]["amount"]
-        status = link_info["payload"]["message"]["data"]["status"]
-        money_light = link_info["payload"]["message"]["data"]["subWalletSplit"]["senderPrepaidAmount"]
-        money = link_info["payload"]["message"]["data"]["subWalletSplit"]["senderEmoneyAmount"]
-        has_password = link_info["payload"]["pendingP2PInfo"]["isSetPasscode"]
-
-        return LinkInfo(sender_name, sender_external_user_id, sender_icon, order_id, chat_room_id, amount, status, money_light, money, has_password, link_info)
+            link_info = self._get_link_info(url, no_cache)
+
+        _raise_for_result(link_info)
+
+        return _parse_link_info(link_info, self.keep_raw)
 
     def link_receive(self, url: str, passcode: str = None, link_info: dict = None) -> dict:
         """送金リンクを受け取る"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        if "https://" in url:
-            url = url.replace("https://pay.paypay.ne.jp/", "")
-
+        url = _strip_link(url)
         if not link_info:
-            params = {
-                "verificationCode": url,
-                "payPayLang": "ja"
-            }
-            link_info = self.session.get("https://app4.paypay.ne.jp/bff/v2/getP2PLinkInfo",
-                                        headers=self.headers, params=params, proxies=self.proxy).json()
-
-        payload = {
-            "requestId": str(uuid4()),
-            "orderId": link_info["payload"]["pendingP2PInfo"]["orderId"],
-            "verificationCode": url,
-            "passcode": None,
-            "senderMessageId": link_info["payload"]["message"]["messageId"],
-            "senderChannelUrl": link_info["payload"]["message"]["chatRoomId"]
-        }
-
-        if link_info["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(link_info)
-
-        if link_info["header"]["resultCode"] != "S0000":
-            raise PayPayError(link_info)
-
-        if link_info["payload"]["orderStatus"] != "PENDING":
-            raise PayPayError("すでに 受け取り / 辞退 / キャンセル されているリンクです")
-
-        if link_info["payload"]["pendingP2PInfo"]["isSetPasscode"] and passcode == None:
-            raise PayPayError("このリンクにはパスワードが設定されています")
-
-        if link_info["payload"]["pendingP2PInfo"]["isSetPasscode"]:
-            payload["passcode"] = passcode
+            link_info = self._get_link_info(url)
 
-        receive = self.session.post("https://app4.paypay.ne.jp/bff/v2/acceptP2PSendMoneyLink",
-                                   headers=self.headers, json=payload,
-                                   params={"payPayLang": "ja", "appContext": "P2PMoneyTransferDetailScreen"},
-                                   proxies=self.proxy)
+        payload = _link_receive_payload(url, passcode, link_info)
         try:
-            receive = receive.json()
-        except:
-            raise PayPayNetWorkError("日本以外からは接続できません")
-
-        if receive["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(receive)
-
-        if receive["header"]["resultCode"] != "S0000":
-            raise PayPayError(receive)
+            receive = self._request("POST", "https://app4.paypay.ne.jp/bff/v2/acceptP2PSendMoneyLink",
+                                    json=payload,
+                                    params={"payPayLang": "ja", "appContext": "P2PMoneyTransferDetailScreen"})
+        finally:
+            self.invalidate_link_info(url)
+        _raise_for_result(receive)
 
         return receive
 
@@ -776,41 +1477,17 @@ class PayPay():
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        if "https://" in url:
-            url = url.replace("https://pay.paypay.ne.jp/", "")
-
+        url = _strip_link(url)
         if not link_info:
-            params = {
-                "verificationCode": url,
-                "payPayLang": "ja"
-            }
-            link_info = self.session.get("https://app4.paypay.ne.jp/bff/v2/getP2PLinkInfo",
-                                        headers=self.headers, params=params, proxies=self.proxy).json()
-
-        payload = {
-            "requestId": str(uuid4()),
-            "orderId": link_info["payload"]["pendingP2PInfo"]["orderId"],
-            "verificationCode": url,
-            "senderMessageId": link_info["payload"]["message"]["messageId"],
-            "senderChannelUrl": link_info["payload"]["message"]["chatRoomId"]
-        }
-        if link_info["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(link_info)
-
-        if link_info["header"]["resultCode"] != "S0000":
-            raise PayPayError(link_info)
-
-        if link_info["payload"]["orderStatus"] != "PENDING":
-            raise PayPayError("すでに 受け取り / 辞退 / キャンセル されているリンクです")
-
-        reject = self.session.post("https://app4.paypay.ne.jp/bff/v2/rejectP2PSendMoneyLink",
-                                  headers=self.headers, json=payload, params=self.params, proxies=self.proxy).json()
-
-        if reject["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(reject)
+            link_info = self._get_link_info(url)
 
-        if reject["header"]["resultCode"] != "S0000":
-            raise PayPayError(reject)
+        payload = _link_reject_payload(url, link_info)
+        try:
+            reject = self._request("POST", "https://app4.paypay.ne.jp/bff/v2/rejectP2PSendMoneyLink",
+                                   json=payload, params=self.params)
+        finally:
+            self.invalidate_link_info(url)
+        _raise_for_result(reject)
 
         return reject
 
@@ -819,140 +1496,91 @@ class PayPay():
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        if "https://" in url:
-            url = url.replace("https://pay.paypay.ne.jp/", "")
+        url = _strip_link(url)
         if not link_info:
-            params = {
-                "verificationCode": url,
-                "payPayLang": "ja"
-            }
-            link_info = self.session.get("https://app4.paypay.ne.jp/bff/v2/getP2PLinkInfo",
-                                        headers=self.headers, params=params, proxies=self.proxy).json()
-
-        payload = {
-            "orderId": link_info["payload"]["pendingP2PInfo"]["orderId"],
-            "requestId": str(uuid4()),
-            "verificationCode": url,
-        }
-        if link_info["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(link_info)
-
-        if link_info["header"]["resultCode"] != "S0000":
-            raise PayPayError(link_info)
+            link_info = self._get_link_info(url)
 
-        if link_info["payload"]["orderStatus"] != "PENDING":
-            raise PayPayError("すでに 受け取り / 辞退 / キャンセル されているリンクです")
-
-        cancel = self.session.post("https://app4.paypay.ne.jp/p2p/v1/cancelP2PSendMoneyLink",
-                                  headers=self.headers, json=payload, params=self.params, proxies=self.proxy).json()
-
-        if cancel["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(cancel)
-
-        if cancel["header"]["resultCode"] != "S0000":
-            raise PayPayError(cancel)
+        payload = _link_cancel_payload(url, link_info)
+        try:
+            cancel = self._request("POST", "https://app4.paypay.ne.jp/p2p/v1/cancelP2PSendMoneyLink",
+                                   json=payload, params=self.params)
+        finally:
+            self.invalidate_link_info(url)
+        _raise_for_result(cancel)
 
         return cancel
 
-    def create_link(self, amount: int, passcode: str = None, pochibukuro: bool = False, theme: str = "default-sendmoney"):
-        """送金リンクを作成"""
-        if not self.access_token:
-            raise PayPayLoginError("まずはログインしてください")
+    def iter_link_check_many(self, urls, concurrency: int = 8, rate=None, web_api: bool = False):
+        """
+        複数の送金リンクを並列に確認し、終わったものから LinkResult を返すジェネレータ
 
-        payload = {
-            "requestId": str(uuid4()),
-            "amount": amount,
-            "socketConnection": "P2P",
-            "theme": theme,
-            "source": "sendmoney_home_sns"
-        }
-        if passcode:
-            payload["passcode"] = passcode
-        if pochibukuro:
-            payload["theme"] = "pochibukuro"
-        create = self.session.post("https://app4.paypay.ne.jp/bff/v2/executeP2PSendMoneyLink",
-                                  headers=self.headers, json=payload, params=self.params, proxies=self.proxy)
-        try:
-            create = create.json()
-        except:
-            raise PayPayNetWorkError("日本以外からは接続できません")
+        同じリンク（verificationCode）は 1 回だけ確認し、結果をそれぞれの入力に返します。
+        入力の位置は LinkResult.index に入ります。
 
-        if create["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(create)
+        Args:
+            urls: 送金リンク（URL または verificationCode）
+            concurrency: 同時に処理するリンク数の上限（pool_maxsize 以下にしてください）
+            rate: 1 秒あたりに処理を始めるリンク数の上限（数値、または複数回で共有する TokenBucket）
+            web_api: link_check に渡す web_api
+        """
+        return iter_many(lambda code: self.link_check(code, web_api), urls, _strip_link, concurrency, rate)
 
-        if create["header"]["resultCode"] != "S0000":
-            raise PayPayError(create)
+    def link_check_many(self, urls, concurrency: int = 8, rate=None, web_api: bool = False) -> list:
+        """複数の送金リンクを並列に確認し、入力順の LinkResult のリストを返す（引数は iter_link_check_many と同じ）"""
+        return sorted(self.iter_link_check_many(urls, concurrency, rate, web_api), key=lambda result: result.index)
 
-        class CreateLink(NamedTuple):
-            link: str
-            chat_room_id: str
-            order_id: str
-            raw: dict
+    def iter_link_receive_many(self, urls, passcode: str = None, concurrency: int = 8, rate=None):
+        """
+        複数の送金リンクを並列に受け取り、終わったものから LinkResult を返すジェネレータ
 
-        link = create["payload"]["link"]
-        chat_room_id = create["payload"]["chatRoomId"]
-        order_id = create["payload"]["orderId"]
+        同じリンクは 1 回だけ受け取ります（重複分にも同じ結果が返ります）。
 
-        return CreateLink(link, chat_room_id, order_id, create)
+        Args:
+            urls: 送金リンク（URL または verificationCode）
+            passcode: パスワード付きのリンクに使うパスワード
+            concurrency: 同時に処理するリンク数の上限（pool_maxsize 以下にしてください）
+            rate: 1 秒あたりに処理を始めるリンク数の上限（数値、または複数回で共有する TokenBucket）
+        """
+        return iter_many(lambda code: self.link_receive(code, passcode), urls, _strip_link, concurrency, rate)
+
+    def link_receive_many(self, urls, passcode: str = None, concurrency: int = 8, rate=None) -> list:
+        """複数の送金リンクを並列に受け取り、入力順の LinkResult のリストを返す（引数は iter_link_receive_many と同じ）"""
+        return sorted(self.iter_link_receive_many(urls, passcode, concurrency, rate), key=lambda result: result.index)
 
-    def send_money(self, amount: int, receiver_id: str, pochibukuro: bool = False, theme: str = "default-sendmoney"):
-        """ユーザーに直接送金"""
+    def create_link(self, amount: int, passcode: str = None, pochibukuro: bool = False, theme: str = "default-sendmoney",
+                    request_id: str = None):
+        """送金リンクを作成（request_id を省略すると毎回新しく生成）"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        payload = {
-            "amount": amount,
-            "theme": theme,
-            "requestId": str(uuid4()),
-            "externalReceiverId": receiver_id,
-            "ackRiskError": False,
-            "source": "sendmoney_history_chat",
-            "socketConnection": "P2P"
-        }
-        if pochibukuro:
-            payload["theme"] = "pochibukuro"
+        create = self._request("POST", "https://app4.paypay.ne.jp/bff/v2/executeP2PSendMoneyLink",
+                               json=_create_link_payload(amount, passcode, pochibukuro, theme, request_id),
+                               params=self.params)
+        _raise_for_result(create)
 
-        send = self.session.post(f"https://app4.paypay.ne.jp/p2p/v3/executeP2PSendMoney",
-                                headers=self.headers, json=payload, params=self.params, proxies=self.proxy)
-        try:
-            send = send.json()
-        except:
-            raise PayPayNetWorkError("日本以外からは接続できません")
-
-        if send["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(send)
+        return _parse_create_link(create, self.keep_raw)
 
-        if send["header"]["resultCode"] != "S0000":
-            raise PayPayError(send)
-
-        class SendMoney(NamedTuple):
-            chat_room_id: str
-            order_id: str
-            raw: dict
+    def send_money(self, amount: int, receiver_id: str, pochibukuro: bool = False, theme: str = "default-sendmoney",
+                   request_id: str = None):
+        """ユーザーに直接送金（request_id を省略すると毎回新しく生成）"""
+        if not self.access_token:
+            raise PayPayLoginError("まずはログインしてください")
 
-        chat_room_id = send["payload"]["chatRoomId"]
-        order_id = send["payload"]["orderId"]
+        send = self._request("POST", "https://app4.paypay.ne.jp/p2p/v3/executeP2PSendMoney",
+                             json=_send_money_payload(amount, receiver_id, pochibukuro, theme, request_id),
+                             params=self.params)
+        _raise_for_result(send)
 
-        return SendMoney(chat_room_id, order_id, send)
+        return _parse_send_money(send, self.keep_raw)
 
     def send_message(self, chat_room_id: str, message: str) -> dict:
         """チャットルームにメッセージを送信"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        payload = {
-            "channelUrl": chat_room_id,
-            "message": message,
-            "socketConnection": "P2P"
-        }
-        send = self.session.post("https://app4.paypay.ne.jp/p2p/v1/sendP2PMessage",
-                                headers=self.headers, json=payload, params=self.params, proxies=self.proxy).json()
-
-        if send["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(send)
-
-        if send["header"]["resultCode"] != "S0000":
-            raise PayPayError(send)
+        send = self._request("POST", "https://app4.paypay.ne.jp/p2p/v1/sendP2PMessage",
+                             json=_send_message_payload(chat_room_id, message), params=self.params)
+        _raise_for_result(send)
 
         return send
 
@@ -961,79 +1589,31 @@ class PayPay():
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        payload = {
-            "amount": None,
-            "sessionId": None
-        }
-        if amount:
-            payload["amount"] = amount
-            payload["sessionId"] = str(uuid4())
-
-        create_p2pcode = self.session.post("https://app4.paypay.ne.jp/bff/v1/createP2PCode",
-                                          headers=self.headers, json=payload, params=self.params, proxies=self.proxy).json()
-
-        if create_p2pcode["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(create_p2pcode)
-
-        if create_p2pcode["header"]["resultCode"] != "S0000":
-            raise PayPayError(create_p2pcode)
+        create_p2pcode = self._request("POST", "https://app4.paypay.ne.jp/bff/v1/createP2PCode",
+                                       json=_p2pcode_payload(amount), params=self.params)
+        _raise_for_result(create_p2pcode)
 
-        class P2PCode(NamedTuple):
-            p2pcode: str
-            raw: dict
-
-        p2pcode = create_p2pcode["payload"]["p2pCode"]
-
-        return P2PCode(p2pcode, create_p2pcode)
+        return _parse_p2pcode(create_p2pcode, self.keep_raw)
 
     def get_profile(self):
         """プロフィール情報を取得"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        profile = self.session.get("https://app4.paypay.ne.jp/bff/v2/getProfileDisplayInfo",
-                                  headers=self.headers,
-                                  params={"includeExternalProfileSync": "true",
-                                         "completedOptionalTasks": "ENABLED_NEARBY"},
-                                  proxies=self.proxy).json()
-
-        if profile["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(profile)
-
-        if profile["header"]["resultCode"] != "S0000":
-            raise PayPayError(profile)
+        profile = self._request("GET", "https://app4.paypay.ne.jp/bff/v2/getProfileDisplayInfo",
+                                params=_profile_params())
+        _raise_for_result(profile)
 
-        class Profile(NamedTuple):
-            name: str
-            external_user_id: str
-            icon: str
-            raw: dict
-
-        name = profile["payload"]["userProfile"]["nickName"]
-        external_user_id = profile["payload"]["userProfile"]["externalUserId"]
-        icon = profile["payload"]["userProfile"]["avatarImageUrl"]
-
-        return Profile(name, external_user_id, icon, profile)
+        return _parse_profile(profile, self.keep_raw)
 
     def set_money_priority(self, paypay_money: bool = False) -> dict:
         """マネーの優先順位を設定"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        if paypay_money:
-            setting = {"moneyPriority": "MONEY_FIRST"}
-        else:
-            setting = {"moneyPriority": "MONEY_LITE_FIRST"}
-
-        smp = self.session.post("https://app4.paypay.ne.jp/p2p/v1/setMoneyPriority",
-                               headers=self.headers, json=setting,
-                               params={"payPayLang": "ja"}, proxies=self.proxy).json()
-
-        if smp["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(smp)
-
-        if smp["header"]["resultCode"] != "S0000":
-            raise PayPayError(smp)
+        smp = self._request("POST", "https://app4.paypay.ne.jp/p2p/v1/setMoneyPriority",
+                            json=_money_priority_payload(paypay_money), params={"payPayLang": "ja"})
+        _raise_for_result(smp)
 
         return smp
 
@@ -1042,53 +1622,21 @@ class PayPay():
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        params = {
-            "pageSize": str(size),
-            "customTypes": "P2P_CHAT,P2P_CHAT_INACTIVE,P2P_PUBLIC_GROUP_CHAT,P2P_LINK,P2P_OLD",
-            "requiresLastMessage": last_message,
-            "socketConnection": "P2P",
-            "payPayLang": "ja"
-        }
-        getchat = self.session.get("https://app4.paypay.ne.jp/p2p/v1/getP2PChatRoomListLite",
-                                  headers=self.headers, params=params, proxies=self.proxy).json()
-
-        if getchat["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(getchat)
-
-        if getchat["header"]["resultCode"] == "S5000":
-            raise PayPayError("チャットルームが見つかりませんでした")
-
-        if getchat["header"]["resultCode"] != "S0000":
-            raise PayPayError(getchat)
+        getchat = self._request("GET", "https://app4.paypay.ne.jp/p2p/v1/getP2PChatRoomListLite",
+                                params=_chat_rooms_params(size, last_message))
+        _raise_for_result(getchat, chat_room=True)
 
         return getchat
 
-    def get_chat_room_messages(self, chat_room_id: str, prev: int = 15, next: int = 0, include: bool = False) -> dict:
-        """チャットルームのメッセージを取得"""
+    def get_chat_room_messages(self, chat_room_id: str, prev: int = 15, next: int = 0, include: bool = False,
+                               message_id: str = None) -> dict:
+        """チャットルームのメッセージを取得（message_id を指定するとそのメッセージの前後 prev / next 件）"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        if not "sendbird_group_channel_" in chat_room_id:
-            chat_room_id = "sendbird_group_channel_" + chat_room_id
-
-        params = {
-            "chatRoomId": chat_room_id,
-            "include": include,
-            "prev": str(prev),
-            "next": str(next),
-            "payPayLang": "ja"
-        }
-        getchat = self.session.get("https://app4.paypay.ne.jp/bff/v1/getP2PMessageList",
-                                  headers=self.headers, params=params, proxies=self.proxy).json()
-
-        if getchat["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(getchat)
-
-        if getchat["header"]["resultCode"] == "S5000":
-            raise PayPayError("チャットルームが見つかりませんでした")
-
-        if getchat["header"]["resultCode"] != "S0000":
-            raise PayPayError(getchat)
+        getchat = self._request("GET", "https://app4.paypay.ne.jp/bff/v1/getP2PMessageList",
+                                params=_chat_room_messages_params(chat_room_id, prev, next, include, message_id))
+        _raise_for_result(getchat, chat_room=True)
 
         return getchat
 
@@ -1097,23 +1645,9 @@ class PayPay():
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        params = {
-            "pageSize": "20",
-            "orderTypes": "CASHBACK",
-            "paymentMethodTypes": "",
-            "signUpCompletedAt": "2021-01-02T10:16:24Z",
-            "pointType": "REGULAR",
-            "isOverdraftOnly": "false",
-            "payPayLang": "ja"
-        }
-        phistory = self.session.get("https://app4.paypay.ne.jp/bff/v3/getPaymentHistory",
-                                   headers=self.headers, params=params, proxies=self.proxy).json()
-
-        if phistory["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(phistory)
-
-        if phistory["header"]["resultCode"] != "S0000":
-            raise PayPayError(phistory)
+        phistory = self._request("GET", "https://app4.paypay.ne.jp/bff/v3/getPaymentHistory",
+                                 params=_point_history_params())
+        _raise_for_result(phistory)
 
         return phistory
 
@@ -1122,127 +1656,44 @@ class PayPay():
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        payload = {
-            "searchTerm": user_id,
-            "pageToken": "",
-            "pageSize": size,
-            "isIngressSendMoney": False,
-            "searchTypes": "GLOBAL_SEARCH"
-        }
-        if not is_global:
-            payload["searchTypes"] = "FRIEND_AND_CANDIDATE_SEARCH"
-
-        p2puser = self.session.post("https://app4.paypay.ne.jp/p2p/v3/searchP2PUser",
-                                   headers=self.headers, json=payload, params=self.params, proxies=self.proxy).json()
-        if p2puser["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(p2puser)
-
-        if p2puser["header"]["resultCode"] != "S0000":
-            if "error" in p2puser and "displayErrorResponse" in p2puser["error"]:
-                if p2puser["error"]["displayErrorResponse"]["description"] == "しばらく時間をおいて、再度お試しください":
-                    raise PayPayError("レート制限に達しました")
-
-            raise PayPayError(p2puser)
-
-        if p2puser["payload"]["searchResultEnum"] == "NO_USERS_FOUND":
-            raise PayPayError("ユーザーが見つかりませんでした")
-
-        class P2PUser(NamedTuple):
-            name: str
-            icon: str
-            external_user_id: str
-            raw: dict
-
-        if is_global:
-            name = p2puser["payload"]["globalSearchResult"]["displayName"]
-            icon = p2puser["payload"]["globalSearchResult"]["photoUrl"]
-            external_user_id = p2puser["payload"]["globalSearchResult"]["externalId"]
-        else:
-            name = p2puser["payload"]["friendsAndCandidatesSearchResults"]["friends"][order]["displayName"]
-            icon = p2puser["payload"]["friendsAndCandidatesSearchResults"]["friends"][order]["photoUrl"]
-            external_user_id = p2puser["payload"]["friendsAndCandidatesSearchResults"]["friends"][order]["externalId"]
+        p2puser = self._request("POST", "https://app4.paypay.ne.jp/p2p/v3/searchP2PUser",
+                                json=_search_p2puser_payload(user_id, size, is_global), params=self.params)
 
-        return P2PUser(name, icon, external_user_id, p2puser)
+        return _parse_p2puser(p2puser, is_global, order, self.keep_raw)
 
     def initialize_chatroom(self, external_user_id: str):
         """チャットルームを初期化"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        payload = {
-            "returnChatRoom": True,
-            "shouldCheckMessageForFriendshipAppeal": True,
-            "externalUserId": external_user_id,
-            "socketConnection": "P2P"
-        }
-        initialize = self.session.post("https://app4.paypay.ne.jp/p2p/v1/initialiseOneToOneAndLinkChatRoom",
-                                      headers=self.headers, json=payload, params=self.params, proxies=self.proxy).json()
-        if initialize["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(initialize)
-
-        if initialize["header"]["resultCode"] == "S5000":
-            raise PayPayError("チャットルームが見つかりませんでした")
-
-        if initialize["header"]["resultCode"] != "S0000":
-            raise PayPayError(initialize)
-
-        class InitializeChatRoom(NamedTuple):
-            chatroom_id: str
-            raw: dict
+        initialize = self._request("POST", "https://app4.paypay.ne.jp/p2p/v1/initialiseOneToOneAndLinkChatRoom",
+                                   json=_initialize_chatroom_payload(external_user_id), params=self.params)
+        _raise_for_result(initialize, chat_room=True)
 
-        chatroom_id = initialize["payload"]["chatRoom"]["chatRoomId"]
-
-        return InitializeChatRoom(chatroom_id, initialize)
+        return _parse_initialize_chatroom(initialize, self.keep_raw)
 
     def get_barcode_info(self, url: str):
         """バーコード情報を取得"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        params = {
-            "code": url,
-            "payPayLang": "ja"
-        }
-        barcode = self.session.get("https://app4.paypay.ne.jp/bff/v2/getBarcodeInfo",
-                                  headers=self.headers, params=params, proxies=self.proxy).json()
-
-        if barcode["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(barcode)
-
-        if barcode["header"]["resultCode"] != "S0000":
-            raise PayPayError(barcode)
-
-        class BarcodeInfo(NamedTuple):
-            amount: int
-            user_name: str
-            external_user_id: str
-            user_icon: str
-            raw: dict
-
-        return BarcodeInfo(
-            amount=barcode["payload"]["userCodeInfo"]["amount"],
-            user_name=barcode["payload"]["userCodeInfo"]["userInfo"]["displayName"],
-            external_user_id=barcode["payload"]["userCodeInfo"]["userInfo"]["externalUserId"],
-            user_icon=barcode["payload"]["userCodeInfo"]["userInfo"]["avatarImageUrl"],
-            raw=barcode
-        )
+        barcode = self._request("GET", "https://app4.paypay.ne.jp/bff/v2/getBarcodeInfo",
+                                params={"code": url, "payPayLang": "ja"})
+        _raise_for_result(barcode)
+
+        return _parse_barcode_info(barcode, self.keep_raw)
 
     def alive(self) -> None:
         """アプリのアクティブ状態を維持"""
         if not self.access_token:
             raise PayPayLoginError("まずはログインしてください")
 
-        alive = self.session.get("https://app4.paypay.ne.jp/bff/v1/getGlobalServiceStatus?payPayLang=en",
-                                headers=self.headers, proxies=self.proxy).json()
-        if alive["header"]["resultCode"] == "S0001":
-            raise PayPayLoginError(alive)
-
-        if alive["header"]["resultCode"] != "S0000":
-            raise PayPayError(alive)
+        alive = self._request("GET", "https://app4.paypay.ne.jp/bff/v1/getGlobalServiceStatus?payPayLang=en")
+        _raise_for_result(alive)
 
-        self.session.post("https://app4.paypay.ne.jp/bff/v3/getHomeDisplayInfo?payPayLang=ja",
-                         headers=self.headers,
-                         json={"excludeMissionBannerInfoFlag": False, "includeBeginnerFlag": False},
-                         proxies=self.proxy)
-        self.session.get("https://app4.paypay.ne.jp/bff/v1/getSearchBar?payPayLang=ja",
-                        headers=self.headers, proxies=self.proxy)
+        # 結果は使わず、失敗しても無視する（metrics・再試行・レート制限は他の呼び出しと同じく適用される）
+        for method, url, json in _ALIVE_EXTRA_CALLS:
+            try:
+                self._send(method, url, json=json)
+            except (PayPayError, PayPayNetWorkError) as e:
+                _debug("alive の補助リクエストに失敗:", url, repr(e))
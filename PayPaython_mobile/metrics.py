@@ -0,0 +1,340 @@
+import bisect
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import pool_classes_by_scheme
+
+from .policy import _endpoint
+
+class RequestRecord(NamedTuple):
+    """1 回の API 呼び出し（再試行を含む）の計測結果。時間はすべて秒"""
+    method: str
+    endpoint: str
+    status: Optional[int]
+    result_code: Optional[str]
+    bytes_out: int
+    bytes_in: int
+    queue: float
+    connect: float
+    server: float
+    decode: float
+    attempts: int
+    error: Optional[str]
+
+    @property
+    def total(self) -> float:
+        return self.queue + self.connect + self.server + self.decode
+
+# 同期版: 接続確立にかかった時間をスレッドごとに積算する（RequestTimer.start() で 0 に戻す）
+_connect_time = threading.local()
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_time.value = getattr(_connect_time, "value", 0.0) + time.perf_counter() - started
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_time.value = getattr(_connect_time, "value", 0.0) + time.perf_counter() - started
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+_TIMED_POOL_CLASSES = {
+    "http": _TimedHTTPConnectionPool,
+    "https": _TimedHTTPSConnectionPool,
+}
+
+def _instrument_manager(manager) -> None:
+    # SOCKS など、独自の接続プールを使うものはそのまま
+    if manager.pool_classes_by_scheme is pool_classes_by_scheme:
+        manager.pool_classes_by_scheme = _TIMED_POOL_CLASSES
+
+def instrument_adapter(adapter) -> None:
+    """requests の HTTPAdapter が作る接続（プロキシ経由を含む）で、接続確立の時間を計るようにする"""
+    _instrument_manager(adapter.poolmanager)
+    for manager in adapter.proxy_manager.values():
+        _instrument_manager(manager)
+    proxy_manager_for = adapter.proxy_manager_for
+
+    def instrumented_proxy_manager_for(proxy, **proxy_kwargs):
+        manager = proxy_manager_for(proxy, **proxy_kwargs)
+        _instrument_manager(manager)
+        return manager
+
+    adapter.proxy_manager_for = instrumented_proxy_manager_for
+
+def _result_code(result) -> Optional[str]:
+    if isinstance(result, dict):
+        header = result.get("header")
+        if isinstance(header, dict):
+            return header.get("resultCode")
+    return None
+
+class RequestTimer():
+    """
+    _send() 1 回分の計測（metrics を指定したときだけ作られる）
+
+    queue: レート制限の待ち・コネクションプールの待ち・再試行前の待ち
+    connect: TCP / TLS の接続確立
+    server: 送信からレスポンス本文の受信まで
+    decode: JSON のデコード
+    """
+    __slots__ = ("observer", "method", "endpoint", "status", "bytes_out", "bytes_in",
+                 "queue", "connect", "server", "decode", "attempts", "events", "_mark")
+
+    def __init__(self, observer, method: str, url: str):
+        self.observer = observer
+        self.method = method
+        self.endpoint = _endpoint(url)
+        self.status = None
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.queue = 0.0
+        self.connect = 0.0
+        self.server = 0.0
+        self.decode = 0.0
+        self.attempts = 1
+        self.events = None
+        self._mark = 0.0
+
+    def start(self) -> None:
+        """送信の直前に呼ぶ"""
+        _connect_time.value = 0.0
+        self.events = None
+        self._mark = time.perf_counter()
+
+    async def trace(self, event: str, info: dict) -> None:
+        """httpx（httpcore）の trace 拡張から呼ばれる"""
+        if self.events is None:
+            self.events = {}
+        self.events.setdefault(event, time.perf_counter())
+
+    def _received(self, status: int, bytes_out: int, bytes_in: int, queue: float, connect: float) -> None:
+        now = time.perf_counter()
+        self.status = status
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+        self.queue += queue
+        self.connect += connect
+        self.server += max(now - self._mark - queue - connect, 0.0)
+        self._mark = now
+
+    def received(self, resp) -> None:
+        """requests のレスポンスを受け取った直後に呼ぶ"""
+        body = resp.request.body
+        self._received(resp.status_code, len(body) if body else 0, len(resp.content),
+                       getattr(resp.request, "queue_time", 0.0), getattr(_connect_time, "value", 0.0))
+
+    def received_async(self, resp) -> None:
+        """httpx のレスポンスを受け取った直後に呼ぶ（trace イベントから内訳を出す）"""
+        events = self.events or {}
+        queue = connect = 0.0
+        sent = events.get("http11.send_request_headers.started") or events.get("http2.send_request_headers.started")
+        first = events.get("connection.connect_tcp.started") or sent
+        if first is not None:
+            queue = first - self._mark
+        for step in ("connection.connect_tcp", "connection.start_tls"):
+            if step + ".complete" in events:
+                connect += events[step + ".complete"] - events[step + ".started"]
+        self._received(resp.status_code, len(resp.request.content), len(resp.content), queue, connect)
+
+    def decoded(self) -> None:
+        """JSON をデコードした直後に呼ぶ"""
+        now = time.perf_counter()
+        self.decode += now - self._mark
+        self._mark = now
+
+    def backoff(self, delay: float) -> None:
+        """再試行する前に呼ぶ"""
+        self.queue += delay
+        self.attempts += 1
+
+    def finish(self, result=None, error: str = None) -> None:
+        self.observer.observe(RequestRecord(
+            self.method, self.endpoint, self.status, _result_code(result), self.bytes_out, self.bytes_in,
+            self.queue, self.connect, self.server, self.decode, self.attempts, error
+        ))
+
+# Prometheus の既定に近いバケット（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _EndpointStats():
+    __slots__ = ("buckets", "count", "total", "phases", "bytes_out", "bytes_in", "results", "errors")
+
+    def __init__(self, n_buckets: int):
+        self.buckets = [0] * (n_buckets + 1)
+        self.count = 0
+        self.total = 0.0
+        self.phases = {"queue": 0.0, "connect": 0.0, "server": 0.0, "decode": 0.0}
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.results = {}
+        self.errors = {}
+
+class Metrics():
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        エンドポイントごとのレイテンシのヒストグラムとエラー数を集計するオブザーバー
+
+        PayPay(metrics=Metrics()) のように渡します。observe(record) を持つ任意のオブジェクトも渡せます。
+
+        Args:
+            buckets: ヒストグラムの上限値（秒、昇順）
+        """
+        self.bucket_bounds = tuple(buckets)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def observe(self, record: RequestRecord) -> None:
+        total = record.total
+        with self._lock:
+            stats = self._stats.get(record.endpoint)
+            if stats is None:
+                stats = self._stats[record.endpoint] = _EndpointStats(len(self.bucket_bounds))
+            stats.buckets[bisect.bisect_left(self.bucket_bounds, total)] += 1
+            stats.count += 1
+            stats.total += total
+            stats.phases["queue"] += record.queue
+            stats.phases["connect"] += record.connect
+            stats.phases["server"] += record.server
+            stats.phases["decode"] += record.decode
+            stats.bytes_out += record.bytes_out
+            stats.bytes_in += record.bytes_in
+            key = (record.status, record.result_code)
+            stats.results[key] = stats.results.get(key, 0) + 1
+            kind = _error_kind(record)
+            if kind is not None:
+                stats.errors[kind] = stats.errors.get(kind, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+
+    def _quantile(self, stats: _EndpointStats, q: float) -> float:
+        """ヒストグラムから分位点を推定（バケット内は線形補間）"""
+        rank = q * stats.count
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(stats.buckets):
+            upper = self.bucket_bounds[i] if i < len(self.bucket_bounds) else lower
+            if count and seen + count >= rank:
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return lower
+
+    def summary(self) -> dict:
+        """エンドポイントごとの件数・平均・p50 / p90 / p99・内訳・エラー数"""
+        with self._lock:
+            summary = {}
+            for endpoint, stats in self._stats.items():
+                summary[endpoint] = {
+                    "count": stats.count,
+                    "mean": stats.total / stats.count,
+                    "p50": self._quantile(stats, 0.5),
+                    "p90": self._quantile(stats, 0.9),
+                    "p99": self._quantile(stats, 0.99),
+                    "phases": {phase: value / stats.count for phase, value in stats.phases.items()},
+                    "bytes_out": stats.bytes_out,
+                    "bytes_in": stats.bytes_in,
+                    "errors": dict(stats.errors),
+                }
+            return summary
+
+    def to_prometheus(self, prefix: str = "paypay") -> str:
+        """Prometheus のテキスト形式で出力"""
+        lines = [
+            f"# HELP {prefix}_request_duration_seconds API 呼び出しにかかった時間",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            stats_items = sorted(self._stats.items())
+            for endpoint, stats in stats_items:
+                label = f'endpoint="{_escape(endpoint)}"'
+                cumulative = 0
+                for bound, count in zip(self.bucket_bounds, stats.buckets):
+                    cumulative += count
+                    lines.append(f'{prefix}_request_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{label},le="+Inf"}} {stats.count}')
+                lines.append(f"{prefix}_request_duration_seconds_sum{{{label}}} {stats.total}")
+                lines.append(f"{prefix}_request_duration_seconds_count{{{label}}} {stats.count}")
+
+            lines.append(f"# HELP {prefix}_request_phase_seconds_total 内訳（queue / connect / server / decode）ごとの合計時間")
+            lines.append(f"# TYPE {prefix}_request_phase_seconds_total counter")
+            for endpoint, stats in stats_items:
+                for phase, value in stats.phases.items():
+                    lines.append(f'{prefix}_request_phase_seconds_total{{endpoint="{_escape(endpoint)}",phase="{phase}"}} {value}')
+
+            lines.append(f"# HELP {prefix}_requests_total HTTP ステータスと resultCode ごとの呼び出し数")
+            lines.append(f"# TYPE {prefix}_requests_total counter")
+            for endpoint, stats in stats_items:
+                for (status, result_code), count in stats.results.items():
+                    lines.append(f'{prefix}_requests_total{{endpoint="{_escape(endpoint)}",status="{status or ""}",'
+                                 f'result_code="{_escape(result_code or "")}"}} {count}')
+
+            lines.append(f"# HELP {prefix}_request_errors_total 種類ごとのエラー数")
+            lines.append(f"# TYPE {prefix}_request_errors_total counter")
+            for endpoint, stats in stats_items:
+                for kind, count in stats.errors.items():
+                    lines.append(f'{prefix}_request_errors_total{{endpoint="{_escape(endpoint)}",kind="{_escape(kind)}"}} {count}')
+
+            lines.append(f"# HELP {prefix}_request_bytes_total 送受信したバイト数（direction は out / in）")
+            lines.append(f"# TYPE {prefix}_request_bytes_total counter")
+            for endpoint, stats in stats_items:
+                lines.append(f'{prefix}_request_bytes_total{{endpoint="{_escape(endpoint)}",direction="out"}} {stats.bytes_out}')
+                lines.append(f'{prefix}_request_bytes_total{{endpoint="{_escape(endpoint)}",direction="in"}} {stats.bytes_in}')
+        return "\n".join(lines) + "\n"
+
+    def serve_prometheus(self, port: int = 9464, addr: str = "127.0.0.1"):
+        """
+        /metrics を返す HTTP サーバーをデーモンスレッドで起動
+
+        Returns:
+            サーバー（止めるときは shutdown()）
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((addr, port), Handler)
+        threading.Thread(target=server.serve_forever, name="paypay-metrics", daemon=True).start()
+        return server
+
+def _error_kind(record: RequestRecord) -> Optional[str]:
+    """エラーの種類（例外名 / http_<status> / resultCode）。成功なら None"""
+    if record.error is not None:
+        return record.error
+    if record.status is not None and record.status >= 400:
+        return f"http_{record.status}"
+    if record.result_code is not None and record.result_code != "S0000":
+        return record.result_code
+    return None
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,308 @@
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import BaseAdapter
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+from .main import HISTORY_CURSOR_KEY
+
+# 置き換える本番ホスト
+PAYPAY_API = "https://app4.paypay.ne.jp"
+
+def _ok(payload: dict = None) -> dict:
+    return {"header": {"resultCode": "S0000", "resultMessage": "Success"}, "payload": payload or {}}
+
+def _balance(server, query, body) -> dict:
+    return _ok({
+        "walletSummary": {
+            "allTotalBalanceInfo": {"balance": 12345, "currency": "JPY"},
+            "usableBalanceInfoWithoutCashback": {"balance": 12000, "currency": "JPY"},
+        },
+        "walletDetail": {
+            "emoneyBalanceInfo": {"balance": 10000, "currency": "JPY"},
+            "prepaidBalanceInfo": {"balance": 2000, "currency": "JPY"},
+            "cashBackBalanceInfo": {"balance": 345, "currency": "JPY"},
+        },
+    })
+
+def _history(server, query, body) -> dict:
+    size = int(query.get("pageSize", ["20"])[0])
+    start = int(query.get(HISTORY_CURSOR_KEY, ["0"])[0])
+    base = datetime(2024, 10, 1, tzinfo=timezone.utc)
+    items = []
+    for i in range(start, min(start + size, server.history_size)):
+        items.append({
+            "orderId": f"{90000000000000000000 - i:020d}",
+            "orderType": "P2P_RECEIVE" if i % 3 == 0 else "PAYMENT",
+            "orderStatus": "COMPLETED",
+            "description": f"mock {i}",
+            "amount": 100 + i,
+            "dateTime": (base - timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+    next_key = start + size
+    return _ok({"paymentInfoList": items,
+                HISTORY_CURSOR_KEY: str(next_key) if next_key < server.history_size else None})
+
+def _link_info(server, query, body) -> dict:
+    code = query.get("verificationCode", ["mock"])[0]
+    return _ok({
+        "orderStatus": "PENDING",
+        "sender": {"displayName": "mock sender", "externalId": "mock-sender", "photoUrl": ""},
+        "pendingP2PInfo": {"orderId": f"link-{code}", "amount": 100, "isSetPasscode": False},
+        "message": {"messageId": f"m-{code}", "chatRoomId": "sendbird_group_channel_mock",
+                    "data": {"status": "PENDING",
+                             "subWalletSplit": {"senderPrepaidAmount": 0, "senderEmoneyAmount": 100}}},
+    })
+
+def _order(server, query, body) -> dict:
+    return _ok({"orderId": f"order-{server.next_id()}", "chatRoomId": "sendbird_group_channel_mock",
+                "link": f"https://pay.paypay.ne.jp/mock{server.next_id()}"})
+
+def _refresh(server, query, body) -> dict:
+    return _ok({"accessToken": "mock.access.token", "refreshToken": "mock-refresh-token"})
+
+def _search_user(server, query, body) -> dict:
+    user = {"displayName": "mock user", "photoUrl": "", "externalId": "mock-user"}
+    return _ok({"searchResultEnum": "FOUND", "globalSearchResult": user,
+                "friendsAndCandidatesSearchResults": {"friends": [user]}})
+
+def _messages(server, query, body) -> dict:
+    return _ok({"messageList": [{"messageId": f"m{i}", "createdAt": i} for i in range(15)]})
+
+# エンドポイント（先頭の / を除いたパス）→ レスポンスを作る関数
+ROUTES = {
+    "bff/v1/getBalanceInfo": _balance,
+    "bff/v3/getPaymentHistory": _history,
+    "bff/v2/getP2PLinkInfo": _link_info,
+    "bff/v2/acceptP2PSendMoneyLink": lambda s, q, b: _ok(),
+    "bff/v2/rejectP2PSendMoneyLink": lambda s, q, b: _ok(),
+    "p2p/v1/cancelP2PSendMoneyLink": lambda s, q, b: _ok(),
+    "bff/v2/executeP2PSendMoneyLink": _order,
+    "p2p/v3/executeP2PSendMoney": _order,
+    "p2p/v1/sendP2PMessage": lambda s, q, b: _ok(),
+    "bff/v1/createP2PCode": lambda s, q, b: _ok({"p2pCode": "https://qr.paypay.ne.jp/mock"}),
+    "bff/v2/getProfileDisplayInfo": lambda s, q, b: _ok({"userProfile": {"nickName": "mock", "externalUserId": "mock-user", "avatarImageUrl": ""}}),
+    "p2p/v1/setMoneyPriority": lambda s, q, b: _ok(),
+    "p2p/v1/getP2PChatRoomListLite": lambda s, q, b: _ok({"chatRooms": []}),
+    "bff/v1/getP2PMessageList": _messages,
+    "p2p/v3/searchP2PUser": _search_user,
+    "p2p/v1/initialiseOneToOneAndLinkChatRoom": lambda s, q, b: _ok({"chatRoom": {"chatRoomId": "sendbird_group_channel_mock"}}),
+    "bff/v2/getBarcodeInfo": lambda s, q, b: _ok({"userCodeInfo": {"amount": 100, "userInfo": {"displayName": "mock", "externalUserId": "mock-user", "avatarImageUrl": ""}}}),
+    "bff/v1/getGlobalServiceStatus": lambda s, q, b: _ok(),
+    "bff/v3/getHomeDisplayInfo": lambda s, q, b: _ok(),
+    "bff/v1/getSearchBar": lambda s, q, b: _ok(),
+    "bff/v2/oauth2/refresh": _refresh,
+}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # ヘッダーと本文を 1 回で送る（Nagle + 遅延 ACK で 40ms 待たされないように）
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        server = self.server.mock
+        parts = urlsplit(self.path)
+        endpoint = parts.path.lstrip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        server._hit(endpoint)
+
+        delay = server._delay(endpoint)
+        if delay:
+            time.sleep(delay)
+
+        route = ROUTES.get(endpoint)
+        if route is None:
+            return self._send(404, {"header": {"resultCode": "S9999", "resultMessage": "Not Found"}})
+        if server.error_rate and server._random() < server.error_rate:
+            return self._send(server.error_status, {"header": {"resultCode": "S9999", "resultMessage": "Injected error"}})
+
+        result = route(server, parse_qs(parts.query), body)
+        code = server.result_codes.get(endpoint)
+        if code is None and server.fault_rate and server._random() < server.fault_rate:
+            code = server.fault_code
+        if code is not None and code != "S0000":
+            result = {"header": {"resultCode": code, "resultMessage": "Injected result code"}, "payload": {}}
+        self._send(200, result)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def _send(self, status: int, data: dict):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+class MockPayPayServer():
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 latencies: dict = None, error_rate: float = 0.0, error_status: int = 503,
+                 fault_rate: float = 0.0, fault_code: str = "S9999", result_codes: dict = None,
+                 history_size: int = 200, seed: int = None):
+        """
+        app4.paypay.ne.jp の bff/* ・ p2p/* を真似るローカルサーバー（負荷試験・ベンチマーク用）
+
+        with MockPayPayServer(latency=0.05) as server:
+            client = PayPay(access_token="x")
+            server.attach(client)
+
+        Args:
+            host: 待ち受けるアドレス
+            port: 待ち受けるポート（0 なら空いているポート）
+            latency: 応答までの待ち時間（秒）
+            jitter: latency に加える 0〜jitter 秒のばらつき
+            latencies: エンドポイントごとの latency（例: {"bff/v3/getPaymentHistory": 0.2}）
+            error_rate: HTTP エラー（error_status）を返す割合
+            error_status: 注入する HTTP ステータス
+            fault_rate: HTTP 200 で resultCode だけ fault_code にする割合
+            fault_code: 注入する resultCode
+            result_codes: 常に返す resultCode（例: {"bff/v2/acceptP2PSendMoneyLink": "S0001"}）
+            history_size: getPaymentHistory で返す取引の総数
+            seed: エラー注入・ばらつきの乱数シード
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.latencies = latencies or {}
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fault_rate = fault_rate
+        self.fault_code = fault_code
+        self.result_codes = result_codes or {}
+        self.history_size = history_size
+        self.hits = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counter = 0
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockPayPayServer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name="paypay-mock", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _delay(self, endpoint: str) -> float:
+        delay = self.latencies.get(endpoint, self.latency)
+        if self.jitter:
+            delay += self._random() * self.jitter
+        return delay
+
+    def _hit(self, endpoint: str) -> None:
+        with self._lock:
+            self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+
+    def next_id(self) -> int:
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def attach(self, client) -> None:
+        """
+        クライアントの app4.paypay.ne.jp 宛ての通信をこのサーバーに向ける
+
+        PayPay はセッションのアダプターを、AsyncPayPay は httpx のトランスポートを包むので、
+        接続数の上限・rate_limiter・cassette はそのまま使われます。
+        """
+        inner = client.session.get_adapter(PAYPAY_API + "/")
+        client.session.mount(PAYPAY_API, _RedirectAdapter(self.url, inner))
+        if hasattr(client, "client"):
+            # 元の AsyncClient はトランスポートを共有しているので閉じない（接続はトランスポートが持つ）
+            client.transport = _RedirectTransport(self.url, client.transport)
+            client.client = httpx.AsyncClient(transport=client.transport, timeout=None)
+
+class _RedirectAdapter(BaseAdapter):
+    """本番ホスト宛ての URL をモックサーバーに書き換えて inner に渡す"""
+    def __init__(self, base_url: str, inner):
+        super().__init__()
+        self.base_url = base_url
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        request.url = self.base_url + request.url[len(PAYPAY_API):]
+        kwargs["proxies"] = None
+        return self.inner.send(request, **kwargs)
+
+    def close(self):
+        self.inner.close()
+
+if httpx is not None:
+    class _RedirectTransport(httpx.AsyncBaseTransport):
+        """_RedirectAdapter の httpx 版"""
+        def __init__(self, base_url: str, inner):
+            self.base_url = httpx.URL(base_url)
+            self.inner = inner
+
+        async def handle_async_request(self, request):
+            request.url = request.url.copy_with(scheme=self.base_url.scheme, host=self.base_url.host,
+                                                port=self.base_url.port)
+            return await self.inner.handle_async_request(request)
+
+        async def aclose(self):
+            await self.inner.aclose()
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="PayPay API のモックサーバー")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="応答までの待ち時間（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fault-rate", type=float, default=0.0)
+    parser.add_argument("--fault-code", default="S9999")
+    args = parser.parse_args()
+
+    server = MockPayPayServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                              error_rate=args.error_rate, fault_rate=args.fault_rate, fault_code=args.fault_code)
+    print(f"listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+if __name__ == "__main__":
+    main()
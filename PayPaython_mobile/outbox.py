@@ -0,0 +1,502 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+from uuid import uuid4
+
+from .main import HISTORY_TRUNCATED, PayPayError, PayPayLoginError, PayPayNetWorkError, RATE_LIMITED, _parse_time, _debug
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    key        TEXT PRIMARY KEY,
+    kind       TEXT NOT NULL,
+    args       TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    next_at    REAL NOT NULL,
+    started_at REAL,
+    order_id   TEXT,
+    result     TEXT,
+    error      TEXT,
+    manual     INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_ready ON outbox (status, next_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_order_id ON outbox (order_id);
+"""
+
+# pending: 未送信（送っても安全） / inflight: 送信中 / unknown: 送れたかわからない（履歴で確認してから再送）
+# done: 完了 / failed: API がエラーを返した、または max_attempts に達した
+# unknown のうち、履歴を送信時刻まで遡れず照合できなかったものは manual にして、resolve() されるまで触らない
+PENDING = "pending"
+INFLIGHT = "inflight"
+UNKNOWN = "unknown"
+DONE = "done"
+FAILED = "failed"
+
+class OutboxEntry(NamedTuple):
+    """Outbox の 1 件（result は完了時のレスポンス、または照合で見つかった履歴）"""
+    key: str
+    kind: str
+    args: dict
+    status: str
+    attempts: int
+    order_id: Optional[str]
+    result: Optional[dict]
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+    manual: bool
+
+def _to_entry(row) -> OutboxEntry:
+    return OutboxEntry(row["key"], row["kind"], json.loads(row["args"]), row["status"], row["attempts"],
+                       row["order_id"], json.loads(row["result"]) if row["result"] else None, row["error"],
+                       row["created_at"], row["updated_at"], bool(row["manual"]))
+
+def _sent_p2p(item: dict) -> bool:
+    """送金・送金リンクの取引か（支払い・入金・ポイントなどは別の取引）"""
+    order_type = item.get("orderType") or ""
+    return order_type.startswith("P2P_") and order_type != "P2P_RECEIVE" and item.get("amountPrefix") != "+"
+
+def _same_receiver(entry, item: dict) -> bool:
+    """履歴の相手がエントリの送金先と矛盾しないか（送金リンクは相手が決まっていない）"""
+    if entry.kind != "send_money":
+        return True
+    receiver_id = item.get("externalUserId")
+    if receiver_id is not None and receiver_id != entry.args["receiver_id"]:
+        return False
+    receiver_name = entry.args.get("receiver_name")
+    return receiver_name is None or item.get("description") == receiver_name
+
+def _not_sent(error: Exception) -> bool:
+    """送信前に手元で止まった（お金が動いていないことが確実な）失敗か"""
+    if isinstance(error, PayPayLoginError):
+        # ログインしていない・トークンが拒否された・更新できなかった
+        return True
+    return isinstance(error, PayPayError) and error.args == (RATE_LIMITED,)
+
+def _result_dict(result) -> dict:
+    if result.raw is not None:
+        return result.raw
+    return {name: getattr(result, name) for name in result._fields}
+
+class Outbox():
+    def __init__(self, client, path: str = "paypay_outbox.sqlite3", workers: int = 4, max_attempts: int = 5,
+                 settle: float = 10.0, retry_delay: float = 5.0, skew: float = 120.0, history_limit: int = 200):
+        """
+        send_money / create_link を SQLite に記録してから実行する送信箱
+
+        各エントリには冪等キー（requestId としても送る）を付け、送信前に inflight として記録します。
+        タイムアウトなどで送れたかわからないときは、settle 秒待ってから getPaymentHistory で照合し、
+        送信時刻より前の取引まで遡っても見つからなかった場合だけ再送します。そこまで遡れなかった
+        （history_limit 件を読み切った・履歴が途中で切れた）ものは unknown のまま手動確認待ち（manual）にし、
+        resolve() で送れたかどうかを決めるまで再送しません。プロセスが落ちても、次の起動時に同じ手順で再開します。
+        1 つのファイルは 1 プロセスからだけ使ってください。
+
+        Args:
+            client: PayPay / AsyncPayPay インスタンス
+            path: SQLite ファイルのパス
+            workers: 同時に実行するエントリ数（PayPay の pool_maxsize 以下にしてください）
+            max_attempts: 送信を試みる最大回数
+            settle: 送れたかわからないとき、履歴に反映されるのを待つ秒数
+            retry_delay: 送信前に失敗した（トークン切れ・レート制限など）ときに再試行するまでの秒数
+            skew: 照合時に、送信時刻より何秒前までの履歴を候補にするか（端末とサーバーの時刻のずれ）
+            history_limit: 照合時に読む履歴の最大件数（送信時刻まで遡れなければ手動確認待ちになる）
+        """
+        self.client = client
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.settle = settle
+        self.retry_delay = retry_delay
+        self.skew = skew
+        self.history_limit = history_limit
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._stop = None
+        with self._lock, self._db:
+            self._db.executescript(_SCHEMA)
+            # 前回のプロセスが送信中に終了したもの
+            now = time.time()
+            self._db.execute("UPDATE outbox SET status = ?, next_at = ?, updated_at = ? WHERE status = ?",
+                             (UNKNOWN, now, now, INFLIGHT))
+
+    def close(self) -> None:
+        self.stop()
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _enqueue(self, kind: str, args: dict, key: Optional[str]) -> str:
+        key = key or str(uuid4())
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO outbox (key, kind, args, status, next_at, created_at, updated_at) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (key, kind, json.dumps(args, ensure_ascii=False), PENDING, now, now, now))
+        return key
+
+    def send_money(self, amount: int, receiver_id: str, pochibukuro: bool = False,
+                   theme: str = "default-sendmoney", key: str = None, receiver_name: str = None) -> str:
+        """
+        送金を追加して冪等キーを返す（同じ key で追加済みなら何もしない）
+
+        Args:
+            amount: 金額
+            receiver_id: 送金先の外部ユーザー ID
+            pochibukuro: ぽち袋にするか
+            theme: テーマ
+            key: 冪等キー（省略時は生成。UUID 形式にしてください）
+            receiver_name: 送金先の表示名（履歴の description）。指定すると照合時に相手も確認する
+        """
+        return self._enqueue("send_money", {"amount": amount, "receiver_id": receiver_id, "pochibukuro": pochibukuro,
+                                            "theme": theme, "receiver_name": receiver_name}, key)
+
+    def create_link(self, amount: int, passcode: str = None, pochibukuro: bool = False,
+                    theme: str = "default-sendmoney", key: str = None) -> str:
+        """
+        送金リンクの作成を追加して冪等キーを返す（passcode は SQLite に平文で保存されます）
+
+        Args:
+            amount: 金額
+            passcode: リンクのパスワード
+            pochibukuro: ぽち袋にするか
+            theme: テーマ
+            key: 冪等キー（省略時は生成。UUID 形式にしてください）
+        """
+        return self._enqueue("create_link", {"amount": amount, "passcode": passcode,
+                                             "pochibukuro": pochibukuro, "theme": theme}, key)
+
+    def get(self, key: str) -> Optional[OutboxEntry]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM outbox WHERE key = ?", (key,)).fetchone()
+        return _to_entry(row) if row else None
+
+    def entries(self, status: str = None) -> list:
+        """エントリを追加順に返す"""
+        with self._lock:
+            if status is None:
+                rows = self._db.execute("SELECT * FROM outbox ORDER BY created_at").fetchall()
+            else:
+                rows = self._db.execute("SELECT * FROM outbox WHERE status = ? ORDER BY created_at", (status,)).fetchall()
+        return [_to_entry(row) for row in rows]
+
+    def counts(self) -> dict:
+        """状態ごとの件数"""
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def unresolved(self) -> list:
+        """照合できず手動確認待ちになっているエントリ"""
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM outbox WHERE status = ? AND manual = 1 ORDER BY created_at",
+                                    (UNKNOWN,)).fetchall()
+        return [_to_entry(row) for row in rows]
+
+    def resolve(self, key: str, sent: bool, order_id: str = None) -> None:
+        """
+        手動確認待ちのエントリを、確認した結果で片付ける
+
+        Args:
+            key: 冪等キー
+            sent: 送れていたか（True なら done、False なら pending に戻して再送する）
+            order_id: 送れていた場合の取引の orderId
+        """
+        now = time.time()
+        with self._lock, self._db:
+            if sent:
+                self._db.execute("UPDATE outbox SET status = ?, manual = 0, order_id = ?, error = NULL, updated_at = ? "
+                                 "WHERE key = ? AND manual = 1", (DONE, order_id, now, key))
+            else:
+                self._db.execute("UPDATE outbox SET status = ?, manual = 0, next_at = ?, error = NULL, updated_at = ? "
+                                 "WHERE key = ? AND manual = 1", (PENDING, now, now, key))
+
+    def retry(self, key: str) -> None:
+        """failed のエントリをもう一度送れるようにする（試行回数も戻す）"""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("UPDATE outbox SET status = ?, attempts = 0, next_at = ?, error = NULL, updated_at = ? "
+                             "WHERE key = ? AND status = ?", (PENDING, now, now, key, FAILED))
+
+    def _update(self, key: str, status: str, **values) -> None:
+        values["status"] = status
+        values["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in values)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE outbox SET {columns} WHERE key = ?", (*values.values(), key))
+
+    def _claim(self, limit: int) -> list:
+        """実行できるエントリを inflight にして返す（照合が必要なものは started_at を残す）"""
+        now = time.time()
+        with self._lock, self._db:
+            rows = self._db.execute("SELECT * FROM outbox WHERE status IN (?, ?) AND manual = 0 AND next_at <= ? "
+                                    "ORDER BY created_at LIMIT ?", (PENDING, UNKNOWN, now, limit)).fetchall()
+            self._db.executemany("UPDATE outbox SET status = ?, updated_at = ? WHERE key = ?",
+                                 [(INFLIGHT, now, row["key"]) for row in rows])
+        return [(row["status"], row["started_at"], _to_entry(row)) for row in rows]
+
+    def _next_wakeup(self) -> Optional[float]:
+        """まだ終わっていないエントリがあれば、次に確認する時刻"""
+        with self._lock:
+            ready, waiting = self._db.execute(
+                "SELECT MIN(CASE WHEN status != ? THEN next_at END), COUNT(*) FROM outbox "
+                "WHERE status IN (?, ?, ?) AND manual = 0",
+                (INFLIGHT, PENDING, UNKNOWN, INFLIGHT)).fetchone()
+        if not waiting:
+            return None
+        # 他のスレッドが送信中のものだけなら、少し待って確認し直す
+        return max(ready if ready is not None else 0.0, time.time() + 0.05)
+
+    def _sleep_for(self, deadline: Optional[float]) -> Optional[float]:
+        """次に確認するまで待つ秒数（もう待たないなら None）"""
+        wakeup = self._next_wakeup()
+        if wakeup is None or (deadline is not None and time.monotonic() >= deadline):
+            return None
+        wait = wakeup - time.time()
+        if deadline is not None:
+            wait = min(wait, deadline - time.monotonic())
+        return min(max(wait, 0.0), 1.0)
+
+    def _claimed(self, order_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM outbox WHERE order_id = ?", (order_id,)).fetchone() is not None
+
+    def _covers(self, item: dict, started_at: float) -> bool:
+        """送信時刻（から skew 秒）より前の取引か。ここまで遡れば、それより新しい取引はすべて見たことになる"""
+        when = _parse_time(item.get("dateTime"))
+        return when is not None and when.timestamp() < started_at - self.skew
+
+    def _match(self, entry: OutboxEntry, item: dict) -> bool:
+        if item.get("amount") != entry.args["amount"] or not _sent_p2p(item) or not _same_receiver(entry, item):
+            return False
+        return not self._claimed(item.get("orderId"))
+
+    def _scan(self, entry: OutboxEntry, item: dict, started_at: float, state: dict) -> bool:
+        """照合を続けるか（state に見つけた取引と、送信時刻まで遡れたかを入れる）"""
+        if self._covers(item, started_at):
+            state["covered"] = True
+            return False
+        if self._match(entry, item):
+            state["found"] = item
+            return False
+        return True
+
+    def _unresolved(self, entry: OutboxEntry, reason: str) -> None:
+        _debug("照合できないため手動確認待ち:", entry.key, reason)
+        self._update(entry.key, UNKNOWN, manual=1, error=reason)
+
+    def _reconcile_failed(self, entry: OutboxEntry, error: Exception) -> None:
+        if isinstance(error, PayPayError) and error.args == (HISTORY_TRUNCATED,):
+            # 待っても続きは取れない
+            self._unresolved(entry, repr(error))
+        else:
+            # 照合できないうちは再送しない
+            self._update(entry.key, UNKNOWN, next_at=time.time() + self.settle, error=repr(error))
+
+    def _after_scan(self, entry: OutboxEntry, state: dict) -> bool:
+        """照合で片付いた（送信しない）なら True"""
+        if self._reconciled(entry, state["found"]):
+            return True
+        if not state["covered"]:
+            self._unresolved(entry, f"履歴を送信時刻まで遡れませんでした（{self.history_limit} 件まで確認）")
+            return True
+        return False
+
+    def _before_send(self, entry: OutboxEntry) -> bool:
+        """送信してよければ試行回数を増やして記録する"""
+        if entry.attempts >= self.max_attempts:
+            self._update(entry.key, FAILED, error=entry.error or "max_attempts")
+            return False
+        self._update(entry.key, INFLIGHT, attempts=entry.attempts + 1, started_at=time.time())
+        return True
+
+    def _after_send(self, entry: OutboxEntry, result=None, error: Exception = None) -> None:
+        result_order_id = None if result is None else result.order_id
+        if error is None:
+            result = json.dumps(_result_dict(result), ensure_ascii=False)
+            try:
+                self._update(entry.key, DONE, order_id=result_order_id, result=result, error=None)
+            except sqlite3.IntegrityError:
+                self._take_over(entry, result_order_id, result)
+        elif _not_sent(error):
+            # トークン切れ・手元のレート制限など、送信される前に止まった
+            self._update(entry.key, PENDING, next_at=time.time() + self.retry_delay, error=repr(error))
+        elif isinstance(error, PayPayError) and error.args and isinstance(error.args[0], dict) \
+                and isinstance(error.args[0].get("header"), dict):
+            # API がエラーを返した（お金は動いていない）
+            self._update(entry.key, FAILED, error=json.dumps(error.args[0], ensure_ascii=False))
+        else:
+            # タイムアウト・想定外のレスポンスなど、届いたかどうかわからない
+            self._update(entry.key, UNKNOWN, next_at=time.time() + self.settle, error=repr(error))
+
+    def _take_over(self, entry: OutboxEntry, order_id: str, result: str) -> None:
+        """
+        送信したエントリの orderId を、別のエントリが履歴の照合で先に取っていた
+
+        照合した側は実際には送っていなかったので、照合をやり直させる（送信した側が done になる）。
+        """
+        now = time.time()
+        with self._lock, self._db:
+            claimed = self._db.execute("SELECT key, result FROM outbox WHERE order_id = ?", (order_id,)).fetchone()
+            if claimed is not None and json.loads(claimed["result"] or "{}").get("history") is not None:
+                _debug("照合を取り消し:", claimed["key"], order_id)
+                self._db.execute("UPDATE outbox SET status = ?, order_id = NULL, result = NULL, next_at = ?, "
+                                 "updated_at = ? WHERE key = ?", (UNKNOWN, now, now, claimed["key"]))
+                self._db.execute("UPDATE outbox SET status = ?, order_id = ?, result = ?, error = NULL, updated_at = ? "
+                                 "WHERE key = ?", (DONE, order_id, result, now, entry.key))
+            else:
+                # 照合ではなく送信で取ったもの同士（起こらないはず）。送信済みなので done のまま記録する
+                _debug("送信済みの取引と orderId が重複:", entry.key, order_id)
+                self._db.execute("UPDATE outbox SET status = ?, result = ?, error = NULL, updated_at = ? WHERE key = ?",
+                                 (DONE, result, now, entry.key))
+
+    def _reconciled(self, entry: OutboxEntry, item: Optional[dict]) -> bool:
+        if item is None:
+            return False
+        _debug("履歴で送信済みを確認:", entry.key, item.get("orderId"))
+        try:
+            self._update(entry.key, DONE, order_id=item.get("orderId"),
+                         result=json.dumps({"history": item}, ensure_ascii=False), error=None)
+        except sqlite3.IntegrityError:
+            # 同時に照合した別のエントリが先にこの取引を取った
+            self._update(entry.key, UNKNOWN, next_at=time.time())
+        return True
+
+    def _call(self, entry: OutboxEntry):
+        args = entry.args
+        if entry.kind == "send_money":
+            return self.client.send_money(args["amount"], args["receiver_id"], args["pochibukuro"], args["theme"],
+                                          request_id=entry.key)
+        return self.client.create_link(args["amount"], args["passcode"], args["pochibukuro"], args["theme"],
+                                       request_id=entry.key)
+
+    def _process(self, status: str, started_at: Optional[float], entry: OutboxEntry) -> None:
+        try:
+            if status == UNKNOWN and started_at is not None:
+                state = {"found": None, "covered": False}
+                for item in self.client.iter_history(limit=self.history_limit):
+                    if not self._scan(entry, item, started_at, state):
+                        break
+                if self._after_scan(entry, state):
+                    return
+        except Exception as e:
+            self._reconcile_failed(entry, e)
+            return
+
+        if not self._before_send(entry):
+            return
+        try:
+            result = self._call(entry)
+        except Exception as e:
+            self._after_send(entry, error=e)
+        else:
+            self._after_send(entry, result)
+
+    async def _process_async(self, status: str, started_at: Optional[float], entry: OutboxEntry) -> None:
+        try:
+            if status == UNKNOWN and started_at is not None:
+                state = {"found": None, "covered": False}
+                async for item in self.client.iter_history(limit=self.history_limit):
+                    if not self._scan(entry, item, started_at, state):
+                        break
+                if self._after_scan(entry, state):
+                    return
+        except Exception as e:
+            self._reconcile_failed(entry, e)
+            return
+
+        if not self._before_send(entry):
+            return
+        try:
+            result = await self._call(entry)
+        except Exception as e:
+            self._after_send(entry, error=e)
+        else:
+            self._after_send(entry, result)
+
+    def drain(self, timeout: float = None) -> dict:
+        """
+        終わっていないエントリがなくなるまで最大 workers 件ずつ並列に実行し、状態ごとの件数を返す
+
+        Args:
+            timeout: 新しく始めるのをやめるまでの秒数（None なら無制限。照合待ちのものがあると settle 秒以上かかります）
+        """
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                stopped = self._stop is not None and self._stop.is_set()
+                if not stopped and (deadline is None or time.monotonic() < deadline):
+                    for args in self._claim(self.workers - len(running)):
+                        running.add(pool.submit(self._process, *args))
+                if running:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                    continue
+                sleep = None if stopped else self._sleep_for(deadline)
+                if sleep is None:
+                    break
+                time.sleep(sleep)
+        return self.counts()
+
+    async def drain_async(self, timeout: float = None) -> dict:
+        """AsyncPayPay 用の drain()"""
+        import asyncio
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        running = set()
+        while True:
+            if deadline is None or time.monotonic() < deadline:
+                for args in self._claim(self.workers - len(running)):
+                    running.add(asyncio.ensure_future(self._process_async(*args)))
+            if running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+                continue
+            sleep = self._sleep_for(deadline)
+            if sleep is None:
+                break
+            await asyncio.sleep(sleep)
+        return self.counts()
+
+    def start(self, interval: float = 1.0) -> None:
+        """バックグラウンドスレッドで、追加されたエントリを実行し続ける（同期版の PayPay 用）"""
+        if self._stop is not None and not self._stop.is_set():
+            return
+        self._stop = threading.Event()
+        threading.Thread(target=self._run, args=(self._stop, interval), name="paypay-outbox", daemon=True).start()
+
+    def stop(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+
+    def _run(self, stop: threading.Event, interval: float) -> None:
+        while not stop.is_set():
+            try:
+                self.drain(timeout=interval)
+            except Exception as e:
+                _debug("outbox の実行に失敗:", repr(e))
+            stop.wait(interval)
+
+    def wait(self, key: str, timeout: float = None) -> Optional[OutboxEntry]:
+        """エントリが done / failed / 手動確認待ちになるまで待って返す（timeout を過ぎたらその時点の状態）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            entry = self.get(key)
+            if entry is None or entry.status in (DONE, FAILED) or entry.manual:
+                return entry
+            if deadline is not None and time.monotonic() >= deadline:
+                return entry
+            time.sleep(0.05)
@@ -0,0 +1,83 @@
+import random
+import urllib.parse
+from typing import NamedTuple, Optional
+
+# サーバー側の一時的なエラーとして扱う HTTP ステータス
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# お金が動くエンドポイント。接続前に失敗したとき以外は再送しない
+MONEY_ENDPOINTS = (
+    "p2p/v3/executeP2PSendMoney",
+    "bff/v2/executeP2PSendMoneyLink",
+    "bff/v2/acceptP2PSendMoneyLink",
+)
+
+class RequestPolicy(NamedTuple):
+    """
+    1 エンドポイント分のタイムアウトと再試行の設定
+
+    idempotent が True のリクエストは、ネットワークエラー / 5xx / レート制限で再試行する。
+    False のリクエストは、サーバーに届いていないことが確実な接続エラーのときだけ再試行する。
+    None なら GET を冪等、それ以外を非冪等とみなす。
+    retries は既定で 0（再試行しない）なので、再試行するには RequestPolicy(retries=2) のように指定する。
+    """
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    retries: int = 0
+    backoff: float = 0.3
+    max_backoff: float = 5.0
+    idempotent: Optional[bool] = None
+
+    @property
+    def timeout(self) -> tuple:
+        return (self.connect_timeout, self.read_timeout)
+
+    def is_idempotent(self, method: str) -> bool:
+        if self.idempotent is None:
+            return method.upper() == "GET"
+        return self.idempotent
+
+    def delay(self, attempt: int) -> float:
+        """attempt 回目（0 始まり）の再試行までの待ち時間（equal jitter 付き指数バックオフ）"""
+        cap = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+def _endpoint(url: str) -> str:
+    """URL から "bff/v1/getBalanceInfo" の形のエンドポイント名を取り出す"""
+    return urllib.parse.urlsplit(url).path.lstrip("/")
+
+class RequestPolicies():
+    def __init__(self, default: RequestPolicy = None, overrides: dict = None):
+        """
+        エンドポイントごとの RequestPolicy
+
+        Args:
+            default: 個別設定のないエンドポイントに使うポリシー
+            overrides: {"bff/v1/getBalanceInfo": RequestPolicy(...), ...}
+        """
+        self.default = default or RequestPolicy()
+        self.overrides = {}
+        for endpoint in MONEY_ENDPOINTS:
+            self.overrides[endpoint] = self.default._replace(idempotent=False)
+        # 検索は POST だが状態を変えないので、レート制限時も再試行してよい
+        self.overrides["p2p/v3/searchP2PUser"] = self.default._replace(idempotent=True)
+        self.overrides.update(overrides or {})
+
+    def get(self, url: str) -> RequestPolicy:
+        return self.overrides.get(_endpoint(url), self.default)
+
+    def set(self, endpoint: str, policy: RequestPolicy) -> None:
+        self.overrides[endpoint] = policy
+
+def _is_rate_limited(result) -> bool:
+    """「しばらく時間をおいて、再度お試しください」のレート制限レスポンスか"""
+    try:
+        return result["error"]["displayErrorResponse"]["description"] == "しばらく時間をおいて、再度お試しください"
+    except (KeyError, TypeError):
+        return False
+
+def _is_retryable_result(status_code: int, result) -> bool:
+    """HTTP ステータスとレスポンスから、再試行してよい一時的な失敗かを判定"""
+    if status_code in RETRYABLE_STATUS:
+        return True
+    return _is_rate_limited(result)
@@ -0,0 +1,139 @@
+import threading
+import time
+from typing import Optional
+
+from .policy import _endpoint
+
+# エンドポイント群ごとの既定の予算: (1 秒あたりの補充数, バースト上限)
+DEFAULT_BUDGETS = {
+    "bff": (10.0, 20),
+    "p2p": (5.0, 10),
+    "portal": (2.0, 5),
+}
+
+def _family(url: str) -> Optional[str]:
+    """URL からエンドポイント群（bff / p2p / portal）を判定。対象外なら None"""
+    endpoint = _endpoint(url)
+    if endpoint.startswith("bff/"):
+        return "bff"
+    if endpoint.startswith("p2p/"):
+        return "p2p"
+    if endpoint.startswith("portal/api/"):
+        return "portal"
+    return None
+
+class TokenBucket():
+    def __init__(self, rate: float, capacity: int):
+        """
+        トークンバケット（スレッドセーフ）
+
+        Args:
+            rate: 1 秒あたりに補充するトークン数（0 より大きい値）
+            capacity: 貯められるトークンの上限（バースト数。1 以上）
+        """
+        if not rate > 0:
+            raise ValueError(f"rate は 0 より大きくしてください: {rate}")
+        if not capacity >= 1:
+            raise ValueError(f"capacity は 1 以上にしてください: {capacity}")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self, n: int) -> float:
+        """取得できれば消費して 0 を、できなければ不足分が貯まるまでの秒数を返す"""
+        # 満たせない要求は待っても取得できない
+        if not 0 < n <= self.capacity:
+            raise ValueError(f"n は 1 以上 capacity（{self.capacity}）以下にしてください: {n}")
+        if not self.rate > 0:
+            raise ValueError(f"rate は 0 より大きくしてください: {self.rate}")
+        with self._lock:
+            self._refill()
+            if self._tokens >= n:
+                self._tokens -= n
+                return 0.0
+            return (n - self._tokens) / self.rate
+
+    @property
+    def remaining(self) -> float:
+        """現在使えるトークン数"""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def try_acquire(self, n: int = 1) -> bool:
+        """待たずに取得を試みる"""
+        return self._take(n) == 0.0
+
+    def acquire(self, n: int = 1, timeout: float = None) -> bool:
+        """取得できるまで待つ。timeout 秒以内に取得できなければ False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take(n)
+            if wait == 0.0:
+                return True
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+    async def acquire_async(self, n: int = 1, timeout: float = None) -> bool:
+        """acquire() の asyncio 版"""
+        import asyncio
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take(n)
+            if wait == 0.0:
+                return True
+            if deadline is not None:
+                if time.monotonic() + wait > deadline:
+                    return False
+            await asyncio.sleep(wait)
+
+class RateLimiter():
+    def __init__(self, budgets: dict = None, block: bool = True, timeout: float = None):
+        """
+        bff/* ・ p2p/* ・ portal/api/* ごとのクライアント側レート制限
+
+        Args:
+            budgets: {"bff": (1 秒あたりの回数, バースト上限), ...}（省略したものは既定値）
+            block: 予算切れのとき待つか（False ならすぐに PayPayError）
+            timeout: block=True のときに待つ最大秒数（None なら無制限）
+        """
+        merged = dict(DEFAULT_BUDGETS)
+        merged.update(budgets or {})
+        self.buckets = {family: TokenBucket(rate, capacity) for family, (rate, capacity) in merged.items()}
+        self.block = block
+        self.timeout = timeout
+
+    def bucket(self, url: str) -> Optional[TokenBucket]:
+        return self.buckets.get(_family(url))
+
+    def acquire(self, url: str, block: bool = None, timeout: float = None) -> bool:
+        """url のエンドポイント群の予算を 1 つ消費する。取得できなければ False"""
+        bucket = self.bucket(url)
+        if bucket is None:
+            return True
+        if not (self.block if block is None else block):
+            return bucket.try_acquire()
+        return bucket.acquire(timeout=self.timeout if timeout is None else timeout)
+
+    async def acquire_async(self, url: str, block: bool = None, timeout: float = None) -> bool:
+        """acquire() の asyncio 版"""
+        bucket = self.bucket(url)
+        if bucket is None:
+            return True
+        if not (self.block if block is None else block):
+            return bucket.try_acquire()
+        return await bucket.acquire_async(timeout=self.timeout if timeout is None else timeout)
+
+    def remaining(self) -> dict:
+        """エンドポイント群ごとの残り予算"""
+        return {family: bucket.remaining for family, bucket in self.buckets.items()}
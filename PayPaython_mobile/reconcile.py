@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+from typing import NamedTuple, Optional
+
+from .main import PayPayError, PayPayNetWorkError, _strip_link, _debug
+from .policy import _is_rate_limited
+from .ratelimit import TokenBucket
+from .results import LinkInfo
+from .session_state import atomic_write
+
+class LinkStatusChange(NamedTuple):
+    """orderStatus が前回から変わった送金リンク（old_status は前回の状態。初めて見たリンクは None。info は link_check の結果）"""
+    url: str
+    code: str
+    old_status: Optional[str]
+    new_status: str
+    info: LinkInfo
+
+def _congested(error: Exception) -> bool:
+    """レート制限・タイムアウトなど、間隔を広げるべき失敗か"""
+    if isinstance(error, PayPayNetWorkError):
+        return True
+    return isinstance(error, PayPayError) and bool(error.args) and _is_rate_limited(error.args[0])
+
+class _Pacer():
+    """成功が続けば少しずつ速く、レート制限されたら半分に落とす（AIMD）"""
+    def __init__(self, rate: float, min_rate: float, max_rate: float, step: float, burst: int):
+        self.bucket = TokenBucket(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def success(self) -> None:
+        with self._lock:
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.step)
+
+    def congested(self) -> None:
+        with self._lock:
+            self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+            _debug("送金リンクの確認を減速:", f"{self.bucket.rate:.2f} req/s")
+
+class LinkReconciler():
+    def __init__(self, client, state_path: str = None, concurrency: int = 8, rate: float = 5.0,
+                 min_rate: float = 0.5, max_rate: float = 20.0, step: float = 0.1, max_attempts: int = 3,
+                 only_pending: bool = True, report_new: bool = True):
+        """
+        作成済みの送金リンクの orderStatus を getP2PLinkInfo でまとめて確認し、変わったものだけを返す
+
+        送金リンク情報のキャッシュは使わず（link_check(no_cache=True)）、毎回最新の状態を取得します。
+
+        同時実行数を concurrency に抑え、1 秒あたりの確認数を成功が続けば step ずつ上げ（max_rate まで）、
+        レート制限やタイムアウトが起きたら半分に下げます（min_rate まで）。
+
+        Args:
+            client: PayPay / AsyncPayPay インスタンス
+            state_path: 前回の状態を保存するファイル（None ならこのインスタンスの中だけで覚える）
+            concurrency: 同時に確認するリンク数の上限（PayPay の pool_maxsize 以下にしてください）
+            rate: 最初の 1 秒あたりの確認数
+            min_rate: 1 秒あたりの確認数の下限
+            max_rate: 1 秒あたりの確認数の上限
+            step: 1 回成功するごとに上げる確認数
+            max_attempts: 1 つのリンクを確認する最大回数（レート制限・タイムアウト時に再試行）
+            only_pending: 前回 PENDING 以外（受け取り済みなど）だったリンクは確認しない
+            report_new: 前回の状態がないリンクも結果に含める
+        """
+        self.client = client
+        self.state_path = state_path
+        self.concurrency = concurrency
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self.rate = rate
+        self.max_attempts = max_attempts
+        self.only_pending = only_pending
+        self.report_new = report_new
+        # verificationCode → 前回の orderStatus
+        self.statuses = {}
+        # 直近の sweep で確認できなかったリンク → 例外
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, "rb") as f:
+            state = json.loads(f.read())
+        if state.get("v") != 1:
+            raise ValueError(f"対応していない状態ファイルのバージョンです: {state.get('v')}")
+        self.statuses = state["statuses"]
+
+    def _save(self) -> None:
+        if not self.state_path:
+            return
+        with self._lock:
+            blob = json.dumps({"v": 1, "statuses": self.statuses}, separators=(",", ":")).encode("utf-8")
+        atomic_write(self.state_path, blob)
+
+    def forget(self, url: str) -> None:
+        """リンクの状態を忘れる（もう追跡しないリンク）"""
+        with self._lock:
+            self.statuses.pop(_strip_link(url), None)
+
+    def _targets(self, links) -> dict:
+        """確認するリンク（code → URL）。links が dict なら値を前回の状態として使う"""
+        targets = {}
+        with self._lock:
+            for url in links:
+                code = _strip_link(url)
+                if isinstance(links, dict) and links[url] is not None:
+                    self.statuses[code] = links[url]
+                status = self.statuses.get(code)
+                if self.only_pending and status is not None and status != "PENDING":
+                    continue
+                targets.setdefault(code, url)
+        return targets
+
+    def _pacer(self) -> _Pacer:
+        return _Pacer(self.rate, self.min_rate, self.max_rate, self.step, max(1, self.concurrency))
+
+    def _record(self, code: str, url: str, info: LinkInfo, changes: list) -> None:
+        new_status = info.order_status
+        with self._lock:
+            old_status = self.statuses.get(code)
+            self.statuses[code] = new_status
+            if old_status != new_status and (old_status is not None or self.report_new):
+                changes.append(LinkStatusChange(url, code, old_status, new_status, info))
+
+    def _finish(self, pacer: _Pacer, targets: dict, changes: list) -> list:
+        # 次回はこの sweep の最後の速度から始める
+        self.rate = pacer.rate
+        self._save()
+        order = {code: i for i, code in enumerate(targets)}
+        changes.sort(key=lambda change: order[change.code])
+        return changes
+
+    def sweep(self, links) -> list:
+        """
+        リンクの状態を確認し、前回から orderStatus が変わったものを入力順に返す（確認できなかったものは errors に入る）
+
+        Args:
+            links: 送金リンク（URL または verificationCode）。{リンク: 既知の orderStatus} の dict も可
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        targets = self._targets(links)
+        pacer = self._pacer()
+        changes = []
+        self.errors = {}
+
+        def check(item):
+            code, url = item
+            for attempt in range(self.max_attempts):
+                pacer.bucket.acquire()
+                try:
+                    info = self.client.link_check(code, no_cache=True)
+                except Exception as e:
+                    if _congested(e) and attempt + 1 < self.max_attempts:
+                        pacer.congested()
+                        continue
+                    with self._lock:
+                        self.errors[code] = e
+                    return
+                pacer.success()
+                self._record(code, url, info, changes)
+                return
+
+        try:
+            if targets:
+                with ThreadPoolExecutor(max_workers=min(self.concurrency, len(targets))) as pool:
+                    list(pool.map(check, targets.items()))
+        finally:
+            self._finish(pacer, targets, changes)
+        return changes
+
+    async def sweep_async(self, links) -> list:
+        """AsyncPayPay 用の sweep()"""
+        import asyncio
+
+        targets = self._targets(links)
+        pacer = self._pacer()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        changes = []
+        self.errors = {}
+
+        async def check(code, url):
+            async with semaphore:
+                for attempt in range(self.max_attempts):
+                    await pacer.bucket.acquire_async()
+                    try:
+                        info = await self.client.link_check(code, no_cache=True)
+                    except Exception as e:
+                        if _congested(e) and attempt + 1 < self.max_attempts:
+                            pacer.congested()
+                            continue
+                        self.errors[code] = e
+                        return
+                    pacer.success()
+                    self._record(code, url, info, changes)
+                    return
+
+        try:
+            await asyncio.gather(*(check(code, url) for code, url in targets.items()))
+        finally:
+            self._finish(pacer, targets, changes)
+        return changes
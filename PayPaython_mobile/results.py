@@ -0,0 +1,179 @@
+from typing import Optional
+
+_MISSING = object()
+
+def _dig(raw: dict, path: tuple, default=_MISSING):
+    value = raw
+    try:
+        for key in path:
+            value = value[key]
+    except (KeyError, IndexError, TypeError):
+        if default is _MISSING:
+            raise
+        return default
+    return value
+
+class _Result():
+    """
+    API の結果型の基底クラス
+
+    各フィールドは __slots__ に置き、初めて参照されたときに raw から取り出してキャッシュする。
+    keep_raw=False なら生成時に全フィールドを取り出し、raw は保持しない（raw にないフィールドは None）。
+    NamedTuple だった頃と同じく、アンパック・インデックス参照・_asdict() が使え（最後の要素は raw）、
+    tuple とも要素ごとに比較できる。同じ型同士の == / hash はフィールドの値で比較し、pickle も可能。
+    """
+    __slots__ = ("raw",)
+    _fields = ()
+    # フィールド名 -> raw 内のキーのパス
+    _paths = {}
+    # 取り出せなかったときの既定値（ここにないフィールドは例外を送出）
+    _defaults = {}
+    # アンパック時などに raw を最後の要素として含めるか
+    _with_raw = True
+
+    def __init__(self, raw: Optional[dict] = None, keep_raw: bool = True, **values):
+        self.raw = raw
+        for name, value in values.items():
+            setattr(self, name, value)
+        if not keep_raw:
+            for name in self._fields:
+                try:
+                    getattr(self, name)
+                except (KeyError, IndexError, TypeError):
+                    # 後から raw を参照できないので、含まれていないセクションは None にしておく
+                    setattr(self, name, None)
+            self.raw = None
+
+    def __getattr__(self, name):
+        path = self._paths.get(name)
+        if path is None or name == "raw":
+            raise AttributeError(name)
+        value = _dig(self.raw, path, self._defaults.get(name, _MISSING))
+        setattr(self, name, value)
+        return value
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def _tuple(self) -> tuple:
+        if self._with_raw:
+            return self._values() + (self.raw,)
+        return self._values()
+
+    def _asdict(self) -> dict:
+        values = dict(zip(self._fields, self._values()))
+        if self._with_raw:
+            values["raw"] = self.raw
+        return values
+
+    def __iter__(self):
+        return iter(self._tuple())
+
+    def __len__(self) -> int:
+        return len(self._fields) + self._with_raw
+
+    def __getitem__(self, index):
+        return self._tuple()[index]
+
+    def __eq__(self, other):
+        if isinstance(other, tuple):
+            return self._tuple() == other
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        # raw を含まない型は、等しい tuple と同じ hash になる
+        return hash(self._values())
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in zip(self._fields, self._values()))
+        return f"{type(self).__name__}({fields})"
+
+class DeviceHeaders(_Result):
+    __slots__ = ("device_orientation", "device_orientation_2", "device_rotation", "device_rotation_2",
+                 "device_acceleration", "device_acceleration_2")
+    _fields = __slots__
+    _with_raw = False
+
+class GetBalance(_Result):
+    __slots__ = ("money", "money_light", "all_balance", "useable_balance", "points")
+    _fields = __slots__
+    _paths = {
+        "money": ("payload", "walletDetail", "emoneyBalanceInfo", "balance"),
+        "money_light": ("payload", "walletDetail", "prepaidBalanceInfo", "balance"),
+        "all_balance": ("payload", "walletSummary", "allTotalBalanceInfo", "balance"),
+        "useable_balance": ("payload", "walletSummary", "usableBalanceInfoWithoutCashback", "balance"),
+        "points": ("payload", "walletDetail", "cashBackBalanceInfo", "balance"),
+    }
+    # get_balance(include=...) で外したセクションは含まれないことがある
+    _defaults = {"money": None, "money_light": None, "all_balance": None, "useable_balance": None, "points": None}
+
+class LinkInfo(_Result):
+    __slots__ = ("sender_name", "sender_external_user_id", "sender_icon", "order_id", "chat_room_id",
+                 "amount", "status", "money_light", "money", "has_password", "order_status")
+    _fields = __slots__
+    _paths = {
+        "sender_name": ("payload", "sender", "displayName"),
+        "sender_external_user_id": ("payload", "sender", "externalId"),
+        "sender_icon": ("payload", "sender", "photoUrl"),
+        "order_id": ("payload", "pendingP2PInfo", "orderId"),
+        "chat_room_id": ("payload", "message", "chatRoomId"),
+        "amount": ("payload", "pendingP2PInfo", "amount"),
+        "status": ("payload", "message", "data", "status"),
+        "money_light": ("payload", "message", "data", "subWalletSplit", "senderPrepaidAmount"),
+        "money": ("payload", "message", "data", "subWalletSplit", "senderEmoneyAmount"),
+        "has_password": ("payload", "pendingP2PInfo", "isSetPasscode"),
+        "order_status": ("payload", "orderStatus"),
+    }
+
+class CreateLink(_Result):
+    __slots__ = ("link", "chat_room_id", "order_id")
+    _fields = __slots__
+    _paths = {
+        "link": ("payload", "link"),
+        "chat_room_id": ("payload", "chatRoomId"),
+        "order_id": ("payload", "orderId"),
+    }
+
+class SendMoney(_Result):
+    __slots__ = ("chat_room_id", "order_id")
+    _fields = __slots__
+    _paths = {
+        "chat_room_id": ("payload", "chatRoomId"),
+        "order_id": ("payload", "orderId"),
+    }
+
+class P2PCode(_Result):
+    __slots__ = ("p2pcode",)
+    _fields = __slots__
+    _paths = {"p2pcode": ("payload", "p2pCode")}
+
+class Profile(_Result):
+    __slots__ = ("name", "external_user_id", "icon")
+    _fields = __slots__
+    _paths = {
+        "name": ("payload", "userProfile", "nickName"),
+        "external_user_id": ("payload", "userProfile", "externalUserId"),
+        "icon": ("payload", "userProfile", "avatarImageUrl"),
+    }
+
+class P2PUser(_Result):
+    # 検索の種類によって参照先が変わるため、生成時に値を渡す
+    __slots__ = ("name", "icon", "external_user_id")
+    _fields = __slots__
+
+class InitializeChatRoom(_Result):
+    __slots__ = ("chatroom_id",)
+    _fields = __slots__
+    _paths = {"chatroom_id": ("payload", "chatRoom", "chatRoomId")}
+
+class BarcodeInfo(_Result):
+    __slots__ = ("amount", "user_name", "external_user_id", "user_icon")
+    _fields = __slots__
+    _paths = {
+        "amount": ("payload", "userCodeInfo", "amount"),
+        "user_name": ("payload", "userCodeInfo", "userInfo", "displayName"),
+        "external_user_id": ("payload", "userCodeInfo", "userInfo", "externalUserId"),
+        "user_icon": ("payload", "userCodeInfo", "userInfo", "avatarImageUrl"),
+    }
@@ -0,0 +1,106 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+# スナップショット形式のバージョン（互換性のない変更をしたら上げる）
+STATE_VERSION = 1
+
+def dump_state(client) -> dict:
+    """ログイン後のクライアントの状態を dict にする"""
+    cookies = []
+    for cookie in client.session.cookies:
+        cookies.append({
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "expires": cookie.expires,
+            "secure": cookie.secure
+        })
+    state = {
+        "v": STATE_VERSION,
+        "saved_at": int(time.time()),
+        "access_token": client.access_token,
+        "refresh_token": client.refresh_token,
+        "device_uuid": client.device_uuid,
+        "client_uuid": client.client_uuid,
+        # Authorization は access_token から作り直すので保存しない
+        "headers": {k: v for k, v in client.headers.items() if k != "Authorization"},
+        "cookies": cookies
+    }
+    if "cookie" in client.session.headers:
+        state["session_cookie_header"] = client.session.headers["cookie"]
+    return state
+
+def load_state(client, state: dict) -> None:
+    """dump_state() の内容をクライアントに反映する"""
+    if state.get("v") != STATE_VERSION:
+        raise ValueError(f"対応していないスナップショットのバージョンです: {state.get('v')}")
+
+    client.device_uuid = state["device_uuid"]
+    client._device_uuid = state["device_uuid"]
+    client.client_uuid = state["client_uuid"]
+    client.headers = dict(state["headers"])
+    client.refresh_token = state.get("refresh_token")
+    if state.get("access_token"):
+        client._set_tokens(state["access_token"])
+    for cookie in state.get("cookies", []):
+        client.session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"],
+                                   path=cookie["path"], expires=cookie["expires"], secure=cookie["secure"])
+    if state.get("session_cookie_header"):
+        client.session.headers["cookie"] = state["session_cookie_header"]
+
+def _fernet(password: str, salt: bytes):
+    try:
+        from cryptography.fernet import Fernet
+    except Exception as e:
+        raise RuntimeError("スナップショットの暗号化には cryptography が必要です（pip install cryptography）") from e
+    key = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=2 ** 14, r=8, p=1, dklen=32)
+    return Fernet(base64.urlsafe_b64encode(key))
+
+def encode_state(state: dict, password: str = None) -> bytes:
+    """状態をバイト列にする（password を指定すると scrypt + Fernet で暗号化）"""
+    body = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if password is None:
+        return body
+    salt = os.urandom(16)
+    envelope = {
+        "v": STATE_VERSION,
+        "enc": "scrypt-fernet",
+        "salt": base64.b64encode(salt).decode("ascii"),
+        "data": _fernet(password, salt).encrypt(body).decode("ascii")
+    }
+    return json.dumps(envelope, separators=(",", ":")).encode("utf-8")
+
+def decode_state(blob: bytes, password: str = None) -> dict:
+    """encode_state() の逆。暗号化されていれば password で復号する"""
+    data = json.loads(blob)
+    if "enc" not in data:
+        return data
+    if data["enc"] != "scrypt-fernet":
+        raise ValueError(f"対応していない暗号化方式です: {data['enc']}")
+    if password is None:
+        raise ValueError("暗号化されたスナップショットです。password を指定してください")
+    salt = base64.b64decode(data["salt"])
+    return json.loads(_fernet(password, salt).decrypt(data["data"].encode("ascii")))
+
+def atomic_write(path: str, blob: bytes) -> None:
+    """同じディレクトリの一時ファイルに書いてから置き換える（途中で落ちても壊れたファイルを残さない）"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".paypay-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
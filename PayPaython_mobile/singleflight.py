@@ -0,0 +1,95 @@
+import threading
+
+def _flight_key(url: str, params: dict = None) -> tuple:
+    """同じリクエストかどうかを判定するキー（URL とクエリパラメータ）"""
+    if not params:
+        return (url, ())
+    return (url, tuple(sorted((key, str(value)) for key, value in params.items())))
+
+class _Call():
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight():
+    def __init__(self):
+        """
+        同じキーの呼び出しが同時に来たら、最初の 1 回だけ実行して結果を共有する（スレッドセーフ）
+
+        結果はキャッシュしません。実行中の呼び出しが終わった後に来たものは、もう一度実行します。
+        """
+        self._lock = threading.Lock()
+        self._calls = {}
+        # 他の呼び出しの結果を受け取った回数
+        self.shared = 0
+
+    def do(self, key, fn):
+        """
+        fn() を実行して結果を返す（同じ key で実行中ならその結果を待つ。例外も共有する）
+
+        Args:
+            key: 呼び出しを区別するキー
+            fn: 引数なしの関数
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+class AsyncSingleFlight():
+    def __init__(self):
+        """
+        SingleFlight の asyncio 版
+
+        実行はタスクとして 1 つだけ行うので、最初の呼び出し元がキャンセルされても、待っている他の呼び出しには影響しません。
+        """
+        self._calls = {}
+        self.shared = 0
+
+    async def do(self, key, fn):
+        """
+        await fn() の結果を返す（同じ key で実行中ならその結果を待つ。例外も共有する）
+
+        Args:
+            key: 呼び出しを区別するキー
+            fn: 引数なしでコルーチンを返す関数
+        """
+        import asyncio
+
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # 呼び出し元が全員キャンセルされても「例外が取得されなかった」警告を出さない
+            task.exception()
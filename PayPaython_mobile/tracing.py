@@ -0,0 +1,215 @@
+import contextvars
+import json
+import os
+import threading
+import time
+
+# 実行中のスパン（スレッド / asyncio タスクごと。asyncio.to_thread にも引き継がれる）
+_current_span = contextvars.ContextVar("paypay_current_span", default=None)
+
+# OTLP の Span.Kind / Status.code
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+class Span():
+    """トレースの 1 区間（ログインの 1 ステップなど）"""
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "kind", "attributes",
+                 "start_ns", "end_ns", "status", "message", "children", "_token")
+
+    def __init__(self, tracer, name: str, parent, kind: int, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.status = STATUS_OK
+        self.message = None
+        # 親スパンが終わるまで子スパンをためておき、まとめて書き出す
+        self.children = []
+        self._token = None
+
+    @property
+    def duration(self) -> float:
+        """経過秒数"""
+        return (self.end_ns - self.start_ns) / 1e9
+
+    @property
+    def result_code(self):
+        return self.attributes.get("paypay.result_code")
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def record(self, resp=None, result=None) -> None:
+        """HTTP ステータスと header.resultCode を記録"""
+        if resp is not None:
+            self.attributes["http.status_code"] = resp.status_code
+        if isinstance(result, dict):
+            code = result.get("header", {}).get("resultCode")
+            if code is not None:
+                self.attributes["paypay.result_code"] = code
+                if code != "S0000":
+                    self.status = STATUS_ERROR
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.status = STATUS_ERROR
+            self.message = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self)
+        return False
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.message:
+            span["status"]["message"] = self.message
+        return span
+
+class _NoopSpan():
+    """tracer 未指定のときのスパン（何もしない）"""
+    __slots__ = ()
+
+    def set(self, key: str, value) -> None:
+        pass
+
+    def record(self, resp=None, result=None) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+class Tracer():
+    def __init__(self, exporter=None, service_name: str = "PayPaython_mobile"):
+        """
+        ログインフローなどのスパンを作り、ルートスパンが終わるごとに exporter へ渡す
+
+        PayPay(tracer=Tracer(FileExporter("login-traces.jsonl"))) のように渡します。
+
+        Args:
+            exporter: export(spans) を持つオブジェクト（FileExporter / OTLPHttpExporter / InMemoryExporter）
+            service_name: OTLP の resource に入れる service.name
+        """
+        self.exporter = exporter
+        self.service_name = service_name
+
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes) -> Span:
+        """現在のスパンの子としてスパンを作る（with で使う）"""
+        return Span(self, name, _current_span.get(), kind, attributes)
+
+    def _finish(self, span: Span) -> None:
+        parent = _current_span.get()
+        if parent is not None and parent.span_id == span.parent_id:
+            parent.children.append(span)
+            parent.children.extend(span.children)
+            span.children = []
+            return
+        spans = [span] + span.children
+        span.children = []
+        if self.exporter is not None:
+            self.exporter.export(spans)
+
+    def to_otlp(self, spans: list) -> dict:
+        """スパンを OTLP/JSON（ExportTraceServiceRequest）にする"""
+        from . import __version__
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "PayPaython_mobile", "version": __version__},
+                    "spans": [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+
+class InMemoryExporter():
+    """書き出したスパンをメモリに保持する（手元での確認用）"""
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans: list) -> None:
+        self.spans.extend(spans)
+
+class FileExporter():
+    def __init__(self, path: str):
+        """
+        1 フローごとに OTLP/JSON を 1 行追記する（OpenTelemetry Collector の file exporter と同じ形式）
+
+        Args:
+            path: 書き出し先のファイル
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: list) -> None:
+        line = json.dumps(spans[0].tracer.to_otlp(spans), ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+class OTLPHttpExporter():
+    def __init__(self, endpoint: str = "http://localhost:4318/v1/traces", headers: dict = None, timeout: float = 5.0):
+        """
+        OTLP/HTTP（JSON）でコレクターに送る
+
+        送信に失敗してもログイン処理は止めず、last_error に例外を残します。
+
+        Args:
+            endpoint: コレクターの /v1/traces の URL
+            headers: 追加のヘッダー（認証など）
+            timeout: 送信のタイムアウト秒数
+        """
+        self.endpoint = endpoint
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.last_error = None
+
+    def export(self, spans: list) -> None:
+        import urllib.request
+
+        body = json.dumps(spans[0].tracer.to_otlp(spans), ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(self.endpoint, data=body, method="POST",
+                                         headers={"Content-Type": "application/json", **self.headers})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                resp.read()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
@@ -0,0 +1,336 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from .main import _parse_time, _debug
+from .session_state import atomic_write
+
+# orderType → イベントの種類（ここにないものは amountPrefix で判断）
+EVENT_KINDS = {
+    "P2P_RECEIVE": "received",
+    "P2P_SEND": "sent",
+    "PAYMENT": "sent",
+    "CASHBACK": "cashback",
+}
+
+class PaymentEvent(NamedTuple):
+    """PaymentWatcher が通知する取引（kind は "received" / "sent" / "cashback"）"""
+    kind: str
+    order_id: str
+    amount: Optional[int]
+    counterparty: Optional[str]
+    time: Optional[datetime]
+    order_type: Optional[str]
+    order_status: Optional[str]
+    raw: dict
+
+def _to_event(item: dict) -> PaymentEvent:
+    kind = EVENT_KINDS.get(item.get("orderType"))
+    if kind is None:
+        kind = "received" if item.get("amountPrefix") == "+" else "sent"
+    return PaymentEvent(kind, item.get("orderId"), item.get("amount"), item.get("description"),
+                        _parse_time(item.get("dateTime")), item.get("orderType"), item.get("orderStatus"), item)
+
+class PaymentWatcher():
+    def __init__(self, client, state_path: str = None, kinds: tuple = ("received", "sent", "cashback"),
+                 min_interval: float = 2.0, max_interval: float = 60.0, backoff: float = 1.5,
+                 page_size: int = 20, max_seen: int = 2000, emit_existing: bool = False):
+        """
+        getPaymentHistory を監視し、新しい取引をイベントとして 1 回ずつ通知する
+
+        取引があった直後は min_interval で、何もなければ backoff 倍ずつ max_interval まで間隔を広げて取得します。
+        履歴は新しい順に読み、通知済みの取引に到達した時点でページ取得を止めます。
+
+        Args:
+            client: PayPay / AsyncPayPay インスタンス
+            state_path: 通知済みの orderId を保存するファイル（再起動しても二重に通知しない。None なら保存しない）
+            kinds: 通知する種類
+            min_interval: 最短の取得間隔（秒）
+            max_interval: 最長の取得間隔（秒）
+            backoff: 新しい取引がなかったときに間隔を何倍にするか
+            page_size: 1 ページあたりの件数
+            max_seen: 保存しておく通知済み orderId の数
+            emit_existing: 状態がない初回に、既存の取引も通知するか（False なら既存分は通知済みとして扱う）
+        """
+        self.client = client
+        self.state_path = state_path
+        self.kinds = set(kinds)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.page_size = page_size
+        self.max_seen = max_seen
+        self.emit_existing = emit_existing
+        self.interval = min_interval
+        # 新しい順
+        self._seen = []
+        self._seen_set = set()
+        # 直近の fetch で取得した未通知の取引（古い順）。先頭から順に、ack 済みか通知しないものだけを通知済みにする
+        self._pending = []
+        self._skipped = set()
+        self._acked = set()
+        self._initialized = False
+        self._stop = threading.Event()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, "rb") as f:
+            state = json.loads(f.read())
+        if state.get("v") != 1:
+            raise ValueError(f"対応していない状態ファイルのバージョンです: {state.get('v')}")
+        self._seen = state["seen"][:self.max_seen]
+        self._seen_set = set(self._seen)
+        self._initialized = True
+
+    def _save(self) -> None:
+        if not self.state_path:
+            return
+        atomic_write(self.state_path, json.dumps({"v": 1, "seen": self._seen},
+                                                 separators=(",", ":")).encode("utf-8"))
+
+    def _mark(self, order_ids: list) -> None:
+        """通知済みにする（order_ids は古い順）"""
+        new = [order_id for order_id in order_ids if order_id not in self._seen_set]
+        if not new:
+            return
+        self._seen[:0] = reversed(new)
+        self._seen_set.update(new)
+        for order_id in self._seen[self.max_seen:]:
+            self._seen_set.discard(order_id)
+        del self._seen[self.max_seen:]
+        self._save()
+
+    def _history_kwargs(self) -> dict:
+        kwargs = {"page_size": self.page_size, "until_order_id": self._seen[0] if self._seen else None}
+        if not self._initialized and not self.emit_existing:
+            # 初回は最新の 1 ページだけ読んで、そこを起点にする
+            kwargs["limit"] = self.page_size
+        return kwargs
+
+    def _collect(self, item: dict, items: list) -> bool:
+        """未通知の取引を items に追加。通知済みに到達したら False"""
+        if item.get("orderId") in self._seen_set:
+            return False
+        items.append(item)
+        return True
+
+    def _new_events(self, items: list) -> list:
+        """取得した取引（新しい順）を、通知するイベント（古い順）にする"""
+        items.reverse()
+        if not self._initialized:
+            self._initialized = True
+            if not self.emit_existing:
+                self._mark([item.get("orderId") for item in items])
+                return []
+        events = [_to_event(item) for item in items]
+        self._pending = [event.order_id for event in events]
+        self._skipped = {event.order_id for event in events if event.kind not in self.kinds}
+        self._release()
+        return [event for event in events if event.kind in self.kinds and event.order_id not in self._acked]
+
+    def _release(self) -> None:
+        """_pending の先頭から、ack 済みか通知しない取引を通知済みにする（未 ack のイベントより新しいものは残す）"""
+        done = 0
+        for order_id in self._pending:
+            if order_id not in self._acked and order_id not in self._skipped:
+                break
+            done += 1
+        if not done:
+            return
+        released = self._pending[:done]
+        del self._pending[:done]
+        self._acked.difference_update(released)
+        self._skipped.difference_update(released)
+        self._mark(released)
+
+    def _adapt(self, events: list) -> None:
+        if events:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def fetch(self) -> list:
+        """
+        未通知の取引を取得してイベント（古い順）で返す
+
+        返したイベントは ack() するまで通知済みになりません。
+        """
+        items = []
+        for item in self.client.iter_history(**self._history_kwargs()):
+            if not self._collect(item, items):
+                break
+        return self._new_events(items)
+
+    async def fetch_async(self) -> list:
+        """AsyncPayPay 用の fetch()"""
+        items = []
+        async for item in self.client.iter_history(**self._history_kwargs()):
+            if not self._collect(item, items):
+                break
+        return self._new_events(items)
+
+    def ack(self, *events: PaymentEvent) -> None:
+        """
+        イベントを通知済みにして保存する
+
+        まだ ack していない、より古いイベントがあるうちは保留し、それらが ack されたときにまとめて通知済みにします。
+        """
+        pending = set(self._pending)
+        self._acked.update(event.order_id for event in events if event.order_id in pending)
+        self._mark([event.order_id for event in events if event.order_id not in pending])
+        self._release()
+
+    def poll(self) -> list:
+        """1 回取得し、新しいイベント（古い順）を通知済みにして返す"""
+        events = self.fetch()
+        self.ack(*events)
+        self._adapt(events)
+        return events
+
+    async def poll_async(self) -> list:
+        """AsyncPayPay 用の poll()"""
+        events = await self.fetch_async()
+        self.ack(*events)
+        self._adapt(events)
+        return events
+
+    def stop(self) -> None:
+        """run() / run_async() を止める"""
+        self._stop.set()
+
+    def run(self, handler) -> None:
+        """
+        stop() が呼ばれるまで監視し、イベントごとに handler(event) を呼ぶ
+
+        handler が正常に戻ったイベントだけを通知済みにします（例外を送出したら、そのイベントから次回やり直し）。
+        """
+        self._stop.clear()
+        while not self._stop.is_set():
+            try:
+                events = self.fetch()
+            except Exception as e:
+                _debug("履歴の取得に失敗:", repr(e))
+                events = []
+            for event in events:
+                try:
+                    handler(event)
+                except Exception as e:
+                    _debug("イベントの処理に失敗:", event.order_id, repr(e))
+                    break
+                self.ack(event)
+            self._adapt(events)
+            self._stop.wait(self.interval)
+
+    async def run_async(self, handler) -> None:
+        """
+        run() の asyncio 版（handler はコルーチン関数でもよい）
+        """
+        import asyncio
+
+        self._stop.clear()
+        while not self._stop.is_set():
+            try:
+                events = await self.fetch_async()
+            except Exception as e:
+                _debug("履歴の取得に失敗:", repr(e))
+                events = []
+            for event in events:
+                try:
+                    result = handler(event)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception as e:
+                    _debug("イベントの処理に失敗:", event.order_id, repr(e))
+                    break
+                self.ack(event)
+            self._adapt(events)
+            deadline = time.monotonic() + self.interval
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                await asyncio.sleep(min(0.5, deadline - time.monotonic()))
+
+class BalanceWatcher():
+    def __init__(self, client, fields: tuple = ("all_balance",), include: tuple = (), interval: float = 10.0,
+                 no_cache: bool = True):
+        """
+        残高を定期的に取得し、指定したフィールドが変わったときだけ結果を返す
+
+        include=() なら残高以外のセクションを要求しないので、レスポンスが小さくなります。
+        変化のないときは GetBalance の中身を読まないので、呼び出し側の処理も発生しません。
+
+        Args:
+            client: PayPay / AsyncPayPay インスタンス
+            fields: 比較する GetBalance のフィールド
+            include: get_balance に渡すセクション
+            interval: watch() での取得間隔（秒）
+            no_cache: get_balance に渡す no_cache
+        """
+        self.client = client
+        self.fields = tuple(fields)
+        self.include = include
+        self.interval = interval
+        self.no_cache = no_cache
+        self.fingerprint = None
+        self._stop = threading.Event()
+
+    def _fingerprint(self, balance) -> tuple:
+        values = []
+        for name in self.fields:
+            try:
+                values.append(getattr(balance, name))
+            except (KeyError, IndexError, TypeError):
+                values.append(None)
+        return tuple(values)
+
+    def _changed(self, balance):
+        fingerprint = self._fingerprint(balance)
+        if fingerprint == self.fingerprint:
+            return None
+        self.fingerprint = fingerprint
+        return balance
+
+    def check(self):
+        """1 回取得し、前回から変わっていれば GetBalance を、変わっていなければ None を返す（初回は必ず返す）"""
+        return self._changed(self.client.get_balance(include=self.include, no_cache=self.no_cache))
+
+    async def check_async(self):
+        """AsyncPayPay 用の check()"""
+        return self._changed(await self.client.get_balance(include=self.include, no_cache=self.no_cache))
+
+    def stop(self) -> None:
+        """watch() / watch_async() を止める"""
+        self._stop.set()
+
+    def watch(self):
+        """stop() が呼ばれるまで interval 秒ごとに取得し、変わったときだけ GetBalance を返すジェネレータ"""
+        self._stop.clear()
+        while not self._stop.is_set():
+            try:
+                balance = self.check()
+            except Exception as e:
+                _debug("残高の取得に失敗:", repr(e))
+                balance = None
+            if balance is not None:
+                yield balance
+            self._stop.wait(self.interval)
+
+    async def watch_async(self):
+        """watch() の asyncio 版"""
+        import asyncio
+
+        self._stop.clear()
+        while not self._stop.is_set():
+            try:
+                balance = await self.check_async()
+            except Exception as e:
+                _debug("残高の取得に失敗:", repr(e))
+                balance = None
+            if balance is not None:
+                yield balance
+            deadline = time.monotonic() + self.interval
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                await asyncio.sleep(min(0.5, deadline - time.monotonic()))
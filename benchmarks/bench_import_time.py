@@ -0,0 +1,65 @@
+"""
+import 時間のベンチマーク（トークンだけで使うクライアントの起動コスト）
+
+新しいプロセスで `import PayPaython_mobile; PayPay(access_token=...)` を繰り返し実行し、
+-X importtime の累積時間の中央値を表示します。ログイン用の重い依存が読み込まれていたら失敗します。
+
+    python benchmarks/bench_import_time.py [--runs 10] [--max-ms 200]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# access_token だけで使う場合に読み込まれてはいけないモジュール
+FORBIDDEN = ("pkce", "awswaf", "curl_cffi", "cryptography", "pyscrypt", "httpx", "sqlite3")
+
+SNIPPET = (
+    "import sys\n"
+    "import PayPaython_mobile\n"
+    "PayPaython_mobile.PayPay(access_token='x')\n"
+    f"print(','.join(m for m in {FORBIDDEN!r} if m in sys.modules))\n"
+)
+
+def run_once():
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", SNIPPET],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    total = None
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == "PayPaython_mobile":
+            total = int(parts[1]) / 1000
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return total, loaded
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None, help="中央値がこれを超えたら失敗")
+    args = parser.parse_args()
+
+    # 1 回目は .pyc の生成を含むので捨てる
+    run_once()
+    times = []
+    loaded = []
+    for _ in range(args.runs):
+        total, loaded = run_once()
+        times.append(total)
+
+    median = statistics.median(times)
+    print(f"import PayPaython_mobile: median {median:.1f} ms / min {min(times):.1f} ms / max {max(times):.1f} ms ({args.runs} runs)")
+
+    failed = False
+    if loaded:
+        print("NG: ログイン用の依存が読み込まれています:", ", ".join(loaded))
+        failed = True
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"NG: 中央値が {args.max_ms:.1f} ms を超えています")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+JSON コーデックのマイクロベンチマーク
+
+getPaymentHistory / getBalanceInfo の形のレスポンスを各コーデックで decode / encode し、
+1 回あたりの時間を比較します。
+
+    python benchmarks/bench_json_codec.py [payload.json ...]
+
+引数を省略すると benchmarks/fixtures/ の合成したレスポンス（実際に記録したものではなく、
+フィールド名・件数をそれらしく作ったもの）を使います。実際に記録して伏せ字にしたレスポンスを渡すと、
+より実態に近い結果になります。
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PayPaython_mobile.codec import StdlibCodec, OrjsonCodec, UjsonCodec, orjson, ujson
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+def available_codecs():
+    codecs = [StdlibCodec()]
+    if orjson is not None:
+        codecs.append(OrjsonCodec())
+    if ujson is not None:
+        codecs.append(UjsonCodec())
+    return codecs
+
+def bench(codec, body: bytes, number: int):
+    obj = codec.loads(body)
+    decode = min(timeit.repeat(lambda: codec.loads(body), number=number, repeat=5)) / number
+    encode = min(timeit.repeat(lambda: codec.dumps(obj), number=number, repeat=5)) / number
+    return decode, encode
+
+def main():
+    paths = [Path(p) for p in sys.argv[1:]] or sorted(FIXTURES.glob("*.json"))
+    codecs = available_codecs()
+    print(f"{'payload':<34}{'bytes':>8}  {'codec':<8}{'decode µs':>11}{'encode µs':>11}{'speedup':>9}")
+    for path in paths:
+        body = path.read_bytes()
+        number = max(10, 2_000_000 // len(body))
+        baseline = None
+        for codec in codecs:
+            decode, encode = bench(codec, body, number)
+            if baseline is None:
+                baseline = decode
+            print(f"{path.name:<34}{len(body):>8}  {codec.name:<8}{decode * 1e6:>11.1f}{encode * 1e6:>11.1f}"
+                  f"{baseline / decode:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
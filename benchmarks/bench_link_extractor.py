@@ -0,0 +1,90 @@
+"""
+リンク抽出のベンチマーク（合成したチャットメッセージのコーパス）
+
+リンクを含まない雑談、送金リンク / P2P コードを含むもの（<...>・Markdown・スキームなし・同じリンクの再掲）
+を混ぜたメッセージを作り、extract_links と LinkExtractor.feed の messages/s と MB/s を表示します。
+比較として、空白で区切って str.replace で取り出す素朴な実装も計測します。
+
+    python benchmarks/bench_link_extractor.py [--messages 200000] [--link-ratio 0.05] [--repeat 3] [--seed 0]
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PayPaython_mobile.links import LinkExtractor, extract_links
+
+WORDS = ["おはよう", "今日", "イベント", "参加", "ありがとう", "草", "それな", "了解です", "hello", "gg",
+         "nice", "https://discord.com/channels/1/2", "https://example.com/page?q=paypay", "www", "lol",
+         "PayPay", "送金", "受け取りました", "よろしく", ":thumbsup:"]
+
+LINK_FORMS = [
+    "https://pay.paypay.ne.jp/{code}",
+    "<https://pay.paypay.ne.jp/{code}>",
+    "[ここ](https://pay.paypay.ne.jp/{code})",
+    "pay.paypay.ne.jp/{code}",
+    "https://qr.paypay.ne.jp/p2p01_{code}",
+]
+
+def make_corpus(n: int, link_ratio: float, seed: int) -> list:
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits
+    codes = ["".join(rng.choices(alphabet, k=16)) for _ in range(max(1, int(n * link_ratio / 2)))]
+    messages = []
+    for _ in range(n):
+        words = rng.choices(WORDS, k=rng.randint(2, 30))
+        if rng.random() < link_ratio:
+            # 半分くらいは既出のリンクの再掲
+            words.insert(rng.randrange(len(words) + 1), rng.choice(LINK_FORMS).format(code=rng.choice(codes)))
+        messages.append(" ".join(words))
+    return messages
+
+def naive(text: str) -> list:
+    codes = []
+    for word in text.split():
+        if "https://pay.paypay.ne.jp/" in word:
+            codes.append(word.replace("https://pay.paypay.ne.jp/", ""))
+    return codes
+
+def measure(name: str, make, corpus: list, size: int, repeat: int) -> None:
+    """make() が返す fn(i, message) をコーパス全体に適用し、最速の回を表示する"""
+    best = None
+    found = 0
+    for _ in range(repeat):
+        fn = make()
+        started = time.perf_counter()
+        found = 0
+        for i, message in enumerate(corpus):
+            found += len(fn(i, message))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<22}{len(corpus) / best:>14,.0f}{size / best / 1e6:>10.1f}{best * 1e9 / len(corpus):>12.0f}{found:>10}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--link-ratio", type=float, default=0.05, help="リンクを含むメッセージの割合")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.messages, args.link_ratio, args.seed)
+    size = sum(len(message.encode("utf-8")) for message in corpus)
+    print(f"{len(corpus):,} messages / {size / 1e6:.1f} MB / link ratio {args.link_ratio}")
+    print(f"{'':<22}{'messages/s':>14}{'MB/s':>10}{'ns/msg':>12}{'found':>10}")
+    measure("naive split+replace", lambda: lambda i, message: naive(message), corpus, size, args.repeat)
+    measure("extract_links", lambda: lambda i, message: extract_links(message), corpus, size, args.repeat)
+
+    def feeder():
+        # 1 メッセージ 1ms 間隔で届いたものとして、60 秒窓で重複を除く
+        extractor = LinkExtractor(window=60.0)
+        return lambda i, message: extractor.feed(message, now=i * 0.001)
+
+    measure("LinkExtractor.feed", feeder, corpus, size, args.repeat)
+
+if __name__ == "__main__":
+    main()
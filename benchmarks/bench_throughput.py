@@ -0,0 +1,118 @@
+"""
+スループット / レイテンシのベンチマーク（ローカルのモックサーバー相手）
+
+MockPayPayServer を起動し、link_receive / get_balance / get_history / send_message を
+同期版（スレッド）と AsyncPayPay（asyncio）で並列に実行して、req/s と p50 / p99 を表示します。
+ピーク時のワーカー数を決める目安に使います。
+
+    python benchmarks/bench_throughput.py [--requests 500] [--concurrency 1 8 32]
+        [--latency 0.02] [--jitter 0.01] [--error-rate 0] [--fault-rate 0]
+        [--workloads link_receive get_balance get_history send_message] [--clients sync async]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PayPaython_mobile import PayPay, RequestPolicies, RequestPolicy
+from PayPaython_mobile.mock_server import MockPayPayServer
+
+WORKLOADS = {
+    "link_receive": lambda client, i: client.link_receive(f"https://pay.paypay.ne.jp/bench{i}"),
+    "get_balance": lambda client, i: client.get_balance(),
+    "get_history": lambda client, i: client.get_history(size=20),
+    "send_message": lambda client, i: client.send_message("sendbird_group_channel_mock", f"bench {i}"),
+}
+
+def make_client(cls, concurrency: int, **kwargs):
+    # 注入したエラーで結果が読みにくくならないよう、再試行はしない
+    policies = RequestPolicies(default=RequestPolicy(retries=0))
+    if cls is PayPay:
+        kwargs.update(pool_maxsize=concurrency)
+    else:
+        kwargs.update(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return cls(access_token="bench", auto_refresh=False, link_info_ttl=0, policies=policies, **kwargs)
+
+def report(name: str, client_name: str, concurrency: int, latencies: list, errors: int, elapsed: float):
+    latencies.sort()
+    n = len(latencies)
+    p50 = statistics.median(latencies) * 1000 if n else 0.0
+    p99 = latencies[min(n - 1, int(n * 0.99))] * 1000 if n else 0.0
+    print(f"{name:<14}{client_name:<7}{concurrency:>6}{(n + errors) / elapsed:>10.0f}{p50:>10.2f}{p99:>10.2f}{errors:>8}")
+
+def run_sync(server, name: str, concurrency: int, requests: int):
+    client = make_client(PayPay, concurrency)
+    server.attach(client)
+    op = WORKLOADS[name]
+
+    def call(i):
+        started = time.perf_counter()
+        try:
+            op(client, i)
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    op(client, -1)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = [r for r in results if r is not None]
+    report(name, "sync", concurrency, latencies, len(results) - len(latencies), elapsed)
+
+async def run_async(server, name: str, concurrency: int, requests: int):
+    from PayPaython_mobile import AsyncPayPay
+
+    client = make_client(AsyncPayPay, concurrency)
+    server.attach(client)
+    op = WORKLOADS[name]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(i):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await op(client, i)
+            except Exception:
+                return None
+            return time.perf_counter() - started
+
+    await op(client, -1)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(call(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    latencies = [r for r in results if r is not None]
+    report(name, "async", concurrency, latencies, len(results) - len(latencies), elapsed)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500, help="ワークロード・並列数ごとの呼び出し回数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=0.02, help="モックサーバーの応答待ち（秒）")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 503 を返す割合")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="resultCode をエラーにする割合")
+    parser.add_argument("--workloads", nargs="+", default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument("--clients", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    args = parser.parse_args()
+
+    with MockPayPayServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          fault_rate=args.fault_rate, seed=0) as server:
+        print(f"mock server {server.url}  latency {args.latency * 1000:.0f}ms + jitter {args.jitter * 1000:.0f}ms")
+        print(f"{'workload':<14}{'client':<7}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name in args.workloads:
+            for concurrency in args.concurrency:
+                if "sync" in args.clients:
+                    run_sync(server, name, concurrency, args.requests)
+                if "async" in args.clients:
+                    asyncio.run(run_async(server, name, concurrency, args.requests))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+
+from PayPaython_mobile import AsyncPayPay, PayPay
+from PayPaython_mobile.mock_server import MockPayPayServer
+
+SEARCH_BAR = "https://app4.paypay.ne.jp/bff/v1/getSearchBar"
+
+class Records():
+    def __init__(self):
+        self.records = []
+
+    def observe(self, record):
+        self.records.append(record)
+
+    def errors(self):
+        return {record.endpoint: record.error for record in self.records}
+
+class HtmlAdapter(BaseAdapter):
+    """JSON ではないページを返す"""
+    def send(self, request, **kwargs):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = b"<html>maintenance</html>"
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self):
+        pass
+
+def test_alive_ignores_failed_extra_calls_but_records_them():
+    metrics = Records()
+    with MockPayPayServer() as server:
+        client = PayPay(access_token="test", auto_refresh=False, metrics=metrics)
+        server.attach(client)
+        client.session.mount(SEARCH_BAR, HtmlAdapter())
+        client.alive()
+        assert server.hits["bff/v3/getHomeDisplayInfo"] == 1
+    errors = metrics.errors()
+    assert errors["bff/v1/getSearchBar"] == "non_json"
+    assert errors["bff/v3/getHomeDisplayInfo"] is None
+
+def test_async_alive_ignores_failed_extra_calls():
+    async def run():
+        metrics = Records()
+        client = AsyncPayPay(access_token="test", auto_refresh=False, metrics=metrics)
+        server.attach(client)
+        inner = client.transport
+
+        class HtmlTransport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request):
+                if str(request.url).startswith(SEARCH_BAR):
+                    return httpx.Response(200, content=b"<html>maintenance</html>")
+                return await inner.handle_async_request(request)
+
+        client.client = httpx.AsyncClient(transport=HtmlTransport(), timeout=None)
+        try:
+            await client.alive()
+        finally:
+            await client.aclose()
+        return metrics
+
+    with MockPayPayServer() as server:
+        metrics = asyncio.run(run())
+    assert metrics.errors()["bff/v1/getSearchBar"] == "non_json"
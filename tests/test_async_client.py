@@ -0,0 +1,64 @@
+import asyncio
+
+import httpx
+import pytest
+
+from PayPaython_mobile import AsyncPayPay
+from PayPaython_mobile.mock_server import _link_info, _ok
+
+class CookieTransport(httpx.AsyncBaseTransport):
+    """app4 の応答で .paypay.ne.jp の Cookie を配り、www に届いた Cookie ヘッダーを記録する"""
+    seen = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    async def handle_async_request(self, request):
+        if request.url.host == "www.paypay.ne.jp":
+            CookieTransport.seen.append(request.headers.get("cookie"))
+            return httpx.Response(200, json=_link_info(None, {}, b""))
+        return httpx.Response(200, json=_ok(), headers={"set-cookie": "aws-waf-token=app; Domain=.paypay.ne.jp; Path=/"})
+
+    async def aclose(self):
+        pass
+
+def test_sync_only_methods_are_rejected():
+    async def run():
+        client = AsyncPayPay(access_token="test", auto_refresh=False)
+        try:
+            with pytest.raises(TypeError):
+                client.warm_up()
+            with pytest.raises(TypeError):
+                AsyncPayPay.restore(b"")
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+def test_arestore_round_trips_snapshot():
+    async def run():
+        client = AsyncPayPay(access_token="test", refresh_token="refresh", auto_refresh=False)
+        blob = client.snapshot()
+        await client.aclose()
+        restored = await AsyncPayPay.arestore(blob, verify=False, auto_refresh=False)
+        try:
+            return restored.access_token, restored.refresh_token
+        finally:
+            await restored.aclose()
+
+    assert asyncio.run(run()) == ("test", "refresh")
+
+def test_web_api_link_check_does_not_send_app_cookies(monkeypatch):
+    monkeypatch.setattr(httpx, "AsyncHTTPTransport", CookieTransport)
+    CookieTransport.seen = []
+
+    async def run():
+        client = AsyncPayPay(access_token="test", auto_refresh=False)
+        try:
+            await client.alive()
+            await client.link_check("https://pay.paypay.ne.jp/abcdefgh", web_api=True)
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert CookieTransport.seen == [None]
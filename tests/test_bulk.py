@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from PayPaython_mobile.bulk import aiter_many, iter_many
+
+def _strip(url):
+    return url.rsplit("/", 1)[-1]
+
+def test_results_cover_duplicates_and_errors():
+    def fn(code):
+        if code == "bad":
+            raise ValueError(code)
+        return code.upper()
+
+    urls = ["https://pay.paypay.ne.jp/a", "b", "a", "bad"]
+    results = sorted(iter_many(fn, urls, _strip, 2, None))
+    assert [(r.index, r.code, r.result) for r in results] == [(0, "a", "A"), (1, "b", "B"), (2, "a", "A"), (3, "bad", None)]
+    assert isinstance(results[3].error, ValueError)
+
+@pytest.mark.parametrize("concurrency", [0, -1])
+def test_iter_many_rejects_non_positive_concurrency(concurrency):
+    with pytest.raises(ValueError, match="concurrency"):
+        list(iter_many(str, ["a"], _strip, concurrency, None))
+
+@pytest.mark.parametrize("concurrency", [0, -1])
+def test_aiter_many_rejects_non_positive_concurrency(concurrency):
+    async def fn(code):
+        return code
+
+    async def run():
+        return [result async for result in aiter_many(fn, ["a"], _strip, concurrency, None)]
+
+    with pytest.raises(ValueError, match="concurrency"):
+        asyncio.run(run())
+
+def test_zero_rate_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_many(str, ["a"], _strip, 1, 0))
@@ -0,0 +1,60 @@
+import asyncio
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+from PayPaython_mobile import AsyncPayPay, PayPay, RateLimiter
+from PayPaython_mobile.cassette import CASSETTE_VERSION, Cassette
+from PayPaython_mobile.main import RATE_LIMITED, PayPayError, _balance_params
+from PayPaython_mobile.mock_server import _balance
+
+class Records():
+    def __init__(self):
+        self.records = []
+
+    def observe(self, record):
+        self.records.append(record)
+
+@pytest.fixture
+def recorded(tmp_path):
+    # get_balance() 1 回分の記録（応答はモックサーバーと同じ）
+    path = tmp_path / "balance.json"
+    interaction = {
+        "method": "GET",
+        "url": "https://app4.paypay.ne.jp/bff/v1/getBalanceInfo?" + urlencode(_balance_params()),
+        "status": 200,
+        "reason": "OK",
+        "headers": [["Content-Type", "application/json;charset=UTF-8"]],
+        "elapsed": 0.0,
+        "text": json.dumps(_balance(None, {}, b"")),
+    }
+    path.write_text(json.dumps({"v": CASSETTE_VERSION, "interactions": [interaction]}))
+    return str(path)
+
+def _limiter():
+    # bff は 1 回分だけ（補充はほぼない）
+    return RateLimiter({"bff": (0.001, 1)}, block=False)
+
+def test_replay_goes_through_rate_limiter_and_metrics(recorded):
+    metrics = Records()
+    client = PayPay(access_token="test", auto_refresh=False, cassette=Cassette(recorded, mode="replay"),
+                    rate_limiter=_limiter(), metrics=metrics)
+    assert client.get_balance().all_balance == 12345
+    with pytest.raises(PayPayError) as e:
+        client.get_balance()
+    assert e.value.args == (RATE_LIMITED,)
+    assert [record.error for record in metrics.records] == [None, "rate_limited"]
+
+def test_async_replay_goes_through_rate_limiter(recorded):
+    async def run():
+        client = AsyncPayPay(access_token="test", auto_refresh=False, cassette=Cassette(recorded, mode="replay"),
+                             rate_limiter=_limiter())
+        try:
+            assert (await client.get_balance()).all_balance == 12345
+            with pytest.raises(PayPayError):
+                await client.get_balance()
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
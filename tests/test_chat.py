@@ -0,0 +1,49 @@
+from PayPaython_mobile.chat import ChatCursor, ChatFanout
+
+class FakeClient():
+    """message_id の指定を無視して、直近 prev 件だけを返すサーバー"""
+    def __init__(self):
+        self.messages = {}
+        self.calls = []
+
+    def post(self, chat_room_id, n):
+        room = self.messages.setdefault(chat_room_id, [])
+        for _ in range(n):
+            i = len(room)
+            room.append({"messageId": f"{chat_room_id}-{i}", "createdAt": 1000 + i})
+
+    def get_chat_room_messages(self, chat_room_id, prev=15, next=0, include=False, message_id=None):
+        self.calls.append((chat_room_id, prev, next, message_id))
+        room = self.messages.get(chat_room_id, [])
+        return {"payload": {"messageList": room[-prev:] if prev else []}}
+
+    def get_chat_rooms(self, size=20, last_message=True):
+        rooms = []
+        for chat_room_id, room in self.messages.items():
+            rooms.append({"chatRoomId": "sendbird_group_channel_" + chat_room_id, "lastMessage": room[-1] if room else None})
+        return {"payload": {"chatRooms": rooms}}
+
+def _ids(messages):
+    return [message.message_id for message in messages]
+
+def test_cursor_sees_new_messages_when_server_ignores_anchor():
+    client = FakeClient()
+    client.post("a", 3)
+    cursor = ChatCursor(client, "a", page_size=5, initial=2)
+    assert _ids(cursor.fetch()) == ["a-1", "a-2"]
+    assert cursor.fetch() == []
+    client.post("a", 2)
+    assert _ids(cursor.fetch()) == ["a-3", "a-4"]
+
+def test_fanout_skips_rooms_whose_last_message_is_unchanged():
+    client = FakeClient()
+    client.post("a", 1)
+    client.post("b", 1)
+    fanout = ChatFanout(client, ["a", "b"], concurrency=1)
+    assert _ids(fanout.poll()) == ["a-0", "b-0"]
+    client.calls.clear()
+    assert fanout.poll() == []
+    assert client.calls == []
+    client.post("b", 1)
+    assert _ids(fanout.poll()) == ["b-1"]
+    assert [call[0] for call in client.calls] == ["b"]
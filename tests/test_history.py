@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from PayPaython_mobile import main
+from PayPaython_mobile import AsyncPayPay, PayPay
+from PayPaython_mobile.main import HISTORY_TRUNCATED, PayPayError
+from PayPaython_mobile.mock_server import MockPayPayServer
+
+def _client(server, cls=PayPay):
+    client = cls(access_token="test", auto_refresh=False)
+    server.attach(client)
+    return client
+
+@pytest.fixture
+def wrong_cursor_key(monkeypatch):
+    # サーバーは lastEvaluatedKey を返すが、クライアントは別のキーを探す（想定が外れた場合）
+    monkeypatch.setattr(main, "HISTORY_CURSOR_KEY", "nextPageKey")
+
+def test_follows_cursor_across_pages():
+    with MockPayPayServer(history_size=50) as server:
+        items = list(_client(server).iter_history(page_size=20))
+    assert len(items) == 50
+    assert server.hits["bff/v3/getPaymentHistory"] == 3
+
+def test_full_page_without_cursor_raises(wrong_cursor_key):
+    items = []
+    with MockPayPayServer(history_size=50) as server:
+        with pytest.raises(PayPayError) as e:
+            for item in _client(server).iter_history(page_size=20):
+                items.append(item)
+    assert e.value.args == (HISTORY_TRUNCATED,)
+    assert len(items) == 20
+
+def test_short_last_page_without_cursor_ends(wrong_cursor_key):
+    with MockPayPayServer(history_size=15) as server:
+        assert len(list(_client(server).iter_history(page_size=20))) == 15
+
+def test_limit_reached_on_full_page_does_not_raise(wrong_cursor_key):
+    with MockPayPayServer(history_size=50) as server:
+        assert len(list(_client(server).iter_history(page_size=20, limit=20))) == 20
+
+def test_async_full_page_without_cursor_raises(wrong_cursor_key):
+    async def run():
+        client = _client(server, AsyncPayPay)
+        items = []
+        try:
+            with pytest.raises(PayPayError):
+                async for item in client.iter_history(page_size=20):
+                    items.append(item)
+        finally:
+            await client.aclose()
+        return items
+
+    with MockPayPayServer(history_size=50) as server:
+        assert len(asyncio.run(run())) == 20
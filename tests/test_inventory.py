@@ -0,0 +1,67 @@
+import time
+
+from PayPaython_mobile.inventory import Inventory
+from PayPaython_mobile.main import LINK_NOT_PENDING, PayPayError, PayPayNetWorkError
+from PayPaython_mobile.results import CreateLink
+
+class FakeClient():
+    def __init__(self, cancel_errors=()):
+        self.created = 0
+        self.cancelled = []
+        self.cancel_errors = list(cancel_errors)
+
+    def create_link(self, amount, passcode=None, theme="default-sendmoney"):
+        self.created += 1
+        return CreateLink({"payload": {"link": f"https://pay.paypay.ne.jp/link{self.created:04d}",
+                                       "chatRoomId": "room", "orderId": f"o{self.created}"}})
+
+    def link_cancel(self, url):
+        self.cancelled.append(url)
+        if self.cancel_errors:
+            error = self.cancel_errors.pop(0)
+            if error is not None:
+                raise error
+
+def _expire_all(inventory):
+    for stock in inventory._stock.values():
+        for i, item in enumerate(stock):
+            stock[i] = item._replace(created_at=time.time() - inventory.ttl - 1)
+
+def test_refill_replaces_expired_stock_before_expire_runs():
+    client = FakeClient()
+    inventory = Inventory(client, ttl=60)
+    inventory.add(100, 2)
+    assert inventory.refill() == 2
+    _expire_all(inventory)
+    assert inventory.refill() == 2
+    assert inventory.take(100, create=False) is not None
+    assert inventory.take(100, create=False) is not None
+    assert client.created == 4
+
+def test_expire_cancels_only_expired_after_refill():
+    client = FakeClient()
+    inventory = Inventory(client, ttl=60)
+    inventory.add(100, 2)
+    inventory.refill()
+    _expire_all(inventory)
+    inventory.refill()
+    assert inventory.expire() == 2
+    assert client.cancelled == ["https://pay.paypay.ne.jp/link0001", "https://pay.paypay.ne.jp/link0002"]
+    assert inventory.available() == {("link", 100, "default-sendmoney"): 2}
+
+def test_failed_cancel_is_retried_and_survives_restart(tmp_path):
+    path = str(tmp_path / "inventory.json")
+    client = FakeClient([PayPayNetWorkError("timeout")])
+    inventory = Inventory(client, state_path=path)
+    inventory.add(100, 1)
+    inventory.refill()
+    inventory.add(100, 0)
+    inventory.expire()
+    assert [item.value for item in inventory.cancelling()] == ["https://pay.paypay.ne.jp/link0001"]
+
+    client = FakeClient([PayPayError(LINK_NOT_PENDING)])
+    inventory = Inventory(client, state_path=path)
+    assert len(inventory.cancelling()) == 1
+    inventory.expire()
+    assert inventory.cancelling() == []
+    assert client.cancelled == ["https://pay.paypay.ne.jp/link0001"]
@@ -0,0 +1,69 @@
+import pytest
+
+from PayPaython_mobile.links import ExtractedLink, LinkExtractor, extract_links, link_code
+
+CODE = "AbCdEf1234_-xyz"
+
+@pytest.mark.parametrize("text", [
+    f"https://pay.paypay.ne.jp/{CODE}",
+    f"http://pay.paypay.ne.jp/{CODE}",
+    f"pay.paypay.ne.jp/{CODE}",
+    f"<https://pay.paypay.ne.jp/{CODE}>",
+    f"[ここ](https://pay.paypay.ne.jp/{CODE})",
+    f"受け取って https://pay.paypay.ne.jp/{CODE} よろしく",
+    f"「https://pay.paypay.ne.jp/{CODE}」",
+    f"これです: https://pay.paypay.ne.jp/{CODE}.",
+])
+def test_extracts_link_forms(text):
+    assert extract_links(text) == [ExtractedLink("link", CODE, f"https://pay.paypay.ne.jp/{CODE}")]
+
+@pytest.mark.parametrize("text", [
+    f"https://xpay.paypay.ne.jp/{CODE}",
+    f"https://evil.pay.paypay.ne.jp/{CODE}",
+    f"https://pay-pay.paypay.ne.jp/{CODE}",
+    "https://pay.paypay.ne.jp/short",
+    f"https://pay.paypay.ne.jp/{'a' * 65}",
+    "https://example.com/page?q=paypay",
+    "",
+])
+def test_ignores_non_links(text):
+    assert extract_links(text) == []
+
+def test_kinds_and_dedupe_keep_first_occurrence_order():
+    text = (f"https://qr.paypay.ne.jp/p2p01_{CODE} https://pay.paypay.ne.jp/{CODE}2 "
+            f"pay.paypay.ne.jp/{CODE}2 https://pay.paypay.ne.jp/{CODE}1")
+    assert [link.code for link in extract_links(text)] == [f"p2p01_{CODE}", f"{CODE}2", f"{CODE}1"]
+    assert [link.kind for link in extract_links(text, kinds=("p2p_code",))] == ["p2p_code"]
+
+@pytest.mark.parametrize("url, code", [
+    (f"https://pay.paypay.ne.jp/{CODE}", CODE),
+    (f" https://pay.paypay.ne.jp/{CODE}\n", CODE),
+    (f"受け取って <https://pay.paypay.ne.jp/{CODE}>", CODE),
+    (CODE, CODE),
+    # 抽出の対象外でも、従来どおりプレフィックスだけは取り除く
+    ("https://pay.paypay.ne.jp/short", "short"),
+    ("short", "short"),
+])
+def test_link_code(url, code):
+    assert link_code(url) == code
+
+def test_link_code_prefers_send_links_over_p2p_codes():
+    assert link_code(f"https://qr.paypay.ne.jp/p2p01_{CODE} https://pay.paypay.ne.jp/{CODE}") == CODE
+
+def test_extractor_window():
+    extractor = LinkExtractor(window=60.0)
+    text = f"https://pay.paypay.ne.jp/{CODE}"
+    assert len(extractor.feed(text, now=0.0)) == 1
+    # 見るたびに窓が延びる
+    assert extractor.feed(text, now=59.0) == []
+    assert extractor.feed(text, now=118.0) == []
+    assert len(extractor.feed(text, now=178.0)) == 1
+
+def test_extractor_max_size_forgets_oldest():
+    extractor = LinkExtractor(window=60.0, max_size=2)
+    links = [f"https://pay.paypay.ne.jp/{CODE}{i}" for i in range(3)]
+    for i, link in enumerate(links):
+        assert len(extractor.feed(link, now=float(i))) == 1
+    assert len(extractor) == 2
+    assert len(extractor.feed(links[0], now=3.0)) == 1
+    assert extractor.feed(links[2], now=3.0) == []
@@ -0,0 +1,184 @@
+import time
+
+import pytest
+
+from PayPaython_mobile.main import HISTORY_TRUNCATED, RATE_LIMITED, PayPayError, PayPayLoginError, PayPayNetWorkError
+from PayPaython_mobile.outbox import DONE, FAILED, PENDING, UNKNOWN, Outbox
+from PayPaython_mobile.results import SendMoney
+
+class FakeClient():
+    """send_money の結果を outcomes の順に返し、iter_history は history をそのまま返す"""
+    def __init__(self, outcomes, history=()):
+        self.outcomes = list(outcomes)
+        self.history = list(history)
+        self.sent = []
+
+    def send_money(self, amount, receiver_id, pochibukuro=False, theme="default-sendmoney", request_id=None):
+        self.sent.append(request_id)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SendMoney({"payload": {"chatRoomId": "room", "orderStatus": "SUCCESS", "orderId": outcome}})
+
+    def iter_history(self, until_time=None, limit=None):
+        return iter(self.history)
+
+def _sent(order_id, amount=100, order_type="P2P_SEND", **extra):
+    return {"orderId": order_id, "orderType": order_type, "amount": amount, "amountPrefix": "-",
+            "dateTime": time.time(), **extra}
+
+def _older(order_id="old"):
+    """送信より前の取引（ここまで履歴を遡れたことになる）"""
+    return {"orderId": order_id, "orderType": "PAYMENT", "amount": 1, "amountPrefix": "-",
+            "dateTime": time.time() - 3600}
+
+@pytest.fixture
+def outbox_for(tmp_path):
+    opened = []
+
+    def make(client, **kwargs):
+        kwargs.setdefault("settle", 0.0)
+        kwargs.setdefault("retry_delay", 0.0)
+        outbox = Outbox(client, str(tmp_path / "outbox.sqlite3"), workers=1, **kwargs)
+        opened.append(outbox)
+        return outbox
+
+    yield make
+    for outbox in opened:
+        outbox.close()
+
+def test_success_is_done(outbox_for):
+    client = FakeClient(["o1"])
+    outbox = outbox_for(client)
+    key = outbox.send_money(100, "user")
+    outbox.drain(timeout=5)
+    entry = outbox.get(key)
+    assert (entry.status, entry.order_id, entry.attempts) == (DONE, "o1", 1)
+    assert client.sent == [key]
+
+@pytest.mark.parametrize("error", [KeyError("header"), ValueError("bad json"), PayPayNetWorkError("timeout")])
+def test_unexpected_error_is_reconciled_before_resend(outbox_for, error):
+    client = FakeClient([error], history=[_sent("o1")])
+    outbox = outbox_for(client)
+    key = outbox.send_money(100, "user")
+    outbox.drain(timeout=5)
+    entry = outbox.get(key)
+    assert (entry.status, entry.order_id) == (DONE, "o1")
+    assert entry.result["history"]["orderId"] == "o1"
+    assert len(client.sent) == 1
+
+def test_unexpected_error_is_resent_when_history_covers_send_time(outbox_for):
+    client = FakeClient([KeyError("header"), "o2"], history=[_older()])
+    outbox = outbox_for(client)
+    key = outbox.send_money(100, "user")
+    outbox.drain(timeout=5)
+    assert outbox.get(key).status == DONE
+    assert client.sent == [key, key]
+
+@pytest.mark.parametrize("history", [[], [_sent("newer", amount=300)], [_sent("o%d" % i, amount=300) for i in range(5)]])
+def test_history_not_reaching_send_time_needs_manual_resolution(outbox_for, history):
+    client = FakeClient([KeyError("header"), "o2"], history=history)
+    outbox = outbox_for(client, history_limit=3)
+    key = outbox.send_money(100, "user")
+    outbox.drain(timeout=5)
+    entry = outbox.get(key)
+    assert (entry.status, entry.manual) == (UNKNOWN, True)
+    assert outbox.unresolved() == [entry]
+    assert client.sent == [key]
+
+def test_truncated_history_needs_manual_resolution(outbox_for):
+    class TruncatedClient(FakeClient):
+        def iter_history(self, until_time=None, limit=None):
+            yield _sent("newer", amount=300)
+            raise PayPayError(HISTORY_TRUNCATED)
+
+    client = TruncatedClient([KeyError("header")])
+    outbox = outbox_for(client)
+    key = outbox.send_money(100, "user")
+    outbox.drain(timeout=5)
+    assert outbox.get(key).manual
+    assert client.sent == [key]
+
+@pytest.mark.parametrize("sent, status", [(True, DONE), (False, PENDING)])
+def test_resolve(outbox_for, sent, status):
+    client = FakeClient([KeyError("header")], history=[])
+    outbox = outbox_for(client)
+    key = outbox.send_money(100, "user")
+    outbox.drain(timeout=5)
+    outbox.resolve(key, sent, order_id="o1" if sent else None)
+    entry = outbox.get(key)
+    assert (entry.status, entry.manual) == (status, False)
+    if not sent:
+        client.outcomes = ["o2"]
+        outbox.drain(timeout=5)
+        assert outbox.get(key).order_id == "o2"
+        assert client.sent == [key, key]
+
+def test_unknown_waits_for_settle(outbox_for):
+    client = FakeClient([KeyError("header")])
+    outbox = outbox_for(client, settle=60.0)
+    key = outbox.send_money(100, "user")
+    outbox.drain(timeout=0.2)
+    assert outbox.get(key).status == UNKNOWN
+    assert len(client.sent) == 1
+
+@pytest.mark.parametrize("error", [PayPayError(RATE_LIMITED), PayPayLoginError("まずはログインしてください")])
+def test_not_sent_is_pending(outbox_for, error):
+    client = FakeClient([error])
+    outbox = outbox_for(client, retry_delay=60.0)
+    key = outbox.send_money(100, "user")
+    outbox.drain(timeout=0.2)
+    assert outbox.get(key).status == PENDING
+
+def test_api_error_fails(outbox_for):
+    client = FakeClient([PayPayError({"header": {"resultCode": "P2P_ERROR"}})])
+    outbox = outbox_for(client)
+    key = outbox.send_money(100, "user")
+    outbox.drain(timeout=5)
+    assert outbox.get(key).status == FAILED
+
+@pytest.mark.parametrize("item", [
+    _sent("o1", order_type="PAYMENT"),
+    _sent("o1", order_type="P2P_RECEIVE"),
+    _sent("o1", amount=200),
+    _sent("o1", externalUserId="someone-else"),
+    _sent("o1", description="someone else"),
+])
+def test_unrelated_history_does_not_match(outbox_for, item):
+    client = FakeClient([PayPayNetWorkError("timeout"), "o2"], history=[item, _older()])
+    outbox = outbox_for(client)
+    key = outbox.send_money(100, "user", receiver_name="receiver")
+    outbox.drain(timeout=5)
+    entry = outbox.get(key)
+    assert (entry.status, entry.order_id) == (DONE, "o2")
+    assert len(client.sent) == 2
+
+def test_sender_takes_over_wrongly_reconciled_order_id(outbox_for):
+    # a の照合が、同時に送った b の取引を取ってしまった
+    client = FakeClient([PayPayNetWorkError("timeout")], history=[_sent("o1")])
+    outbox = outbox_for(client)
+    a = outbox.send_money(100, "user")
+    outbox.drain(timeout=5)
+    assert outbox.get(a).order_id == "o1"
+
+    client.outcomes = ["o1", "o3"]
+    client.history = [_older()]
+    b = outbox.send_money(100, "user")
+    outbox.drain(timeout=5)
+    assert (outbox.get(b).status, outbox.get(b).order_id) == (DONE, "o1")
+    # 照合をやり直し、送信時刻まで遡っても履歴にないので a は送り直される
+    assert (outbox.get(a).status, outbox.get(a).order_id) == (DONE, "o3")
+    assert client.sent == [a, b, a]
+
+def test_inflight_becomes_unknown_after_restart(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    with Outbox(FakeClient([]), path) as outbox:
+        key = outbox.send_money(100, "user")
+        outbox._claim(1)
+        outbox._before_send(outbox.get(key))
+    client = FakeClient([], history=[_sent("o1")])
+    with Outbox(client, path, settle=0.0) as outbox:
+        assert outbox.get(key).status == UNKNOWN
+        outbox.drain(timeout=5)
+        assert (outbox.get(key).status, outbox.get(key).order_id) == (DONE, "o1")
+    assert client.sent == []
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from PayPaython_mobile import AsyncPayPay, PayPay, RequestPolicies, RequestPolicy
+from PayPaython_mobile.main import PayPayError, PayPayNetWorkError
+from PayPaython_mobile.mock_server import PAYPAY_API, MockPayPayServer
+
+RETRYING = RequestPolicies(default=RequestPolicy(retries=2, backoff=0.0))
+
+class FailingAdapter(BaseAdapter):
+    """送るたびに error() の例外を投げ、呼ばれた回数を数える"""
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        raise self.error()
+
+    def close(self):
+        pass
+
+def _refused():
+    reason = NewConnectionError(None, "接続を拒否されました")
+    return requests.ConnectionError(MaxRetryError(None, PAYPAY_API, reason))
+
+def _client(cls=PayPay, **kwargs):
+    return cls(access_token="test", auto_refresh=False, link_info_ttl=0, **kwargs)
+
+@pytest.fixture
+def failing_server():
+    with MockPayPayServer(error_rate=1.0, error_status=503) as server:
+        yield server
+
+def test_default_policy_does_not_retry(failing_server):
+    client = _client()
+    failing_server.attach(client)
+    with pytest.raises(PayPayError):
+        client.get_balance()
+    assert failing_server.hits["bff/v1/getBalanceInfo"] == 1
+
+def test_get_is_retried_on_5xx(failing_server):
+    client = _client(policies=RETRYING)
+    failing_server.attach(client)
+    with pytest.raises(PayPayError):
+        client.get_balance()
+    assert failing_server.hits["bff/v1/getBalanceInfo"] == 3
+
+def test_post_is_not_retried_on_5xx(failing_server):
+    client = _client(policies=RETRYING)
+    failing_server.attach(client)
+    with pytest.raises(PayPayError):
+        client.send_message("sendbird_group_channel_mock", "hello")
+    assert failing_server.hits["p2p/v1/sendP2PMessage"] == 1
+
+def test_search_is_retried_as_idempotent_post(failing_server):
+    client = _client(policies=RETRYING)
+    failing_server.attach(client)
+    with pytest.raises(PayPayError):
+        client.search_p2puser("someone")
+    assert failing_server.hits["p2p/v3/searchP2PUser"] == 3
+
+def test_post_is_retried_when_not_sent():
+    client = _client(policies=RETRYING)
+    adapter = FailingAdapter(_refused)
+    client.session.mount(PAYPAY_API, adapter)
+    with pytest.raises(PayPayNetWorkError):
+        client.send_message("sendbird_group_channel_mock", "hello")
+    assert adapter.calls == 3
+
+def test_post_is_not_retried_after_read_timeout():
+    client = _client(policies=RETRYING)
+    adapter = FailingAdapter(requests.ReadTimeout)
+    client.session.mount(PAYPAY_API, adapter)
+    with pytest.raises(PayPayNetWorkError):
+        client.send_message("sendbird_group_channel_mock", "hello")
+    assert adapter.calls == 1
+
+def test_get_is_retried_after_read_timeout():
+    client = _client(policies=RETRYING)
+    adapter = FailingAdapter(requests.ReadTimeout)
+    client.session.mount(PAYPAY_API, adapter)
+    with pytest.raises(PayPayNetWorkError):
+        client.get_balance()
+    assert adapter.calls == 3
+
+def test_async_get_is_retried_but_post_is_not(failing_server):
+    async def main():
+        client = _client(AsyncPayPay, policies=RETRYING)
+        failing_server.attach(client)
+        try:
+            with pytest.raises(PayPayError):
+                await client.get_balance()
+            with pytest.raises(PayPayError):
+                await client.send_message("sendbird_group_channel_mock", "hello")
+        finally:
+            await client.aclose()
+
+    asyncio.run(main())
+    assert failing_server.hits["bff/v1/getBalanceInfo"] == 3
+    assert failing_server.hits["p2p/v1/sendP2PMessage"] == 1
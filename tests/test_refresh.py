@@ -0,0 +1,32 @@
+import time
+
+from PayPaython_mobile import PayPay
+from PayPaython_mobile.mock_server import MockPayPayServer
+
+class RacingPayPay(PayPay):
+    """期限の確認と更新の間に、別のスレッドの更新が終わった状況を再現する"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.refreshes = 0
+        self.race = True
+
+    def token_refresh(self, refresh_token=None):
+        self.refreshes += 1
+        self.access_token = f"token-{self.refreshes}"
+        self.token_expires_at = time.time() + 3600
+
+    def _token_expiring(self):
+        expiring = super()._token_expiring()
+        if expiring and self.race:
+            self.race = False
+            self._refresh_access_token(self.access_token)
+        return expiring
+
+def test_expiring_token_is_refreshed_once_when_another_refresh_wins():
+    with MockPayPayServer() as server:
+        client = RacingPayPay(access_token="token-0", refresh_token="refresh", auto_refresh=True)
+        client.token_expires_at = time.time()
+        server.attach(client)
+        client.get_balance()
+    assert client.refreshes == 1
+    assert client.access_token == "token-1"
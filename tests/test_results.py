@@ -0,0 +1,33 @@
+import pickle
+
+from PayPaython_mobile.results import DeviceHeaders, GetBalance, SendMoney
+
+BALANCE = {"payload": {"walletSummary": {"allTotalBalanceInfo": {"balance": 300},
+                                         "usableBalanceInfoWithoutCashback": {"balance": 200}}}}
+
+def test_missing_sections_are_none_with_and_without_raw():
+    for keep_raw in (True, False):
+        balance = GetBalance(BALANCE, keep_raw)
+        assert (balance.all_balance, balance.useable_balance) == (300, 200)
+        assert (balance.money, balance.money_light, balance.points) == (None, None, None)
+
+def test_compares_equal_to_tuples_like_a_namedtuple():
+    raw = {"payload": {"chatRoomId": "room", "orderId": "o1"}}
+    send = SendMoney(raw)
+    assert send == ("room", "o1", raw)
+    assert ("room", "o1", raw) == send
+    assert send != ("room", "o2", raw)
+    chat_room_id, order_id, _ = send
+    assert (chat_room_id, order_id) == ("room", "o1")
+
+def test_same_type_compares_by_fields_and_pickles():
+    raw = {"payload": {"chatRoomId": "room", "orderId": "o1"}}
+    assert SendMoney(raw) == SendMoney(raw, keep_raw=False)
+    assert pickle.loads(pickle.dumps(SendMoney(raw))) == SendMoney(raw)
+
+def test_hash_matches_equal_tuple():
+    headers = DeviceHeaders(None, device_orientation="a", device_orientation_2="b", device_rotation="c",
+                            device_rotation_2="d", device_acceleration="e", device_acceleration_2="f")
+    assert headers == ("a", "b", "c", "d", "e", "f")
+    assert hash(headers) == hash(("a", "b", "c", "d", "e", "f"))
+    assert {headers: 1}[("a", "b", "c", "d", "e", "f")] == 1
@@ -0,0 +1,98 @@
+import asyncio
+
+from PayPaython_mobile.watcher import PaymentWatcher
+
+class FakeClient():
+    """iter_history は items（新しい順）をそのまま返す"""
+    def __init__(self, items=()):
+        self.items = list(items)
+
+    def iter_history(self, page_size=20, until_order_id=None, limit=None):
+        return iter(self.items)
+
+class FakeAsyncClient(FakeClient):
+    async def iter_history(self, page_size=20, until_order_id=None, limit=None):
+        for item in self.items:
+            yield item
+
+def _item(order_id, order_type):
+    return {"orderId": order_id, "orderType": order_type, "amount": 100}
+
+def _watcher(client, **kwargs):
+    kwargs.setdefault("kinds", ("received",))
+    kwargs.setdefault("min_interval", 0.0)
+    kwargs.setdefault("emit_existing", True)
+    return PaymentWatcher(client, **kwargs)
+
+def test_first_fetch_skips_existing_by_default():
+    client = FakeClient([_item("r1", "P2P_RECEIVE")])
+    watcher = _watcher(client, emit_existing=False)
+    assert watcher.fetch() == []
+    client.items.insert(0, _item("r2", "P2P_RECEIVE"))
+    assert [event.order_id for event in watcher.fetch()] == ["r2"]
+
+def test_unacked_event_is_redelivered_past_newer_skipped_one():
+    # 古い順に r1（通知する）、s1（kinds 外）
+    client = FakeClient([_item("s1", "P2P_SEND"), _item("r1", "P2P_RECEIVE")])
+    watcher = _watcher(client)
+    assert [event.order_id for event in watcher.fetch()] == ["r1"]
+    # r1 を ack しないまま取り直す
+    assert [event.order_id for event in watcher.fetch()] == ["r1"]
+    watcher.ack(*watcher.fetch())
+    assert watcher.fetch() == []
+    assert watcher._seen[:2] == ["s1", "r1"]
+
+def test_skipped_events_older_than_delivered_ones_are_marked_at_once():
+    client = FakeClient([_item("r1", "P2P_RECEIVE"), _item("s1", "P2P_SEND")])
+    watcher = _watcher(client)
+    assert [event.order_id for event in watcher.fetch()] == ["r1"]
+    assert watcher._seen == ["s1"]
+
+def test_out_of_order_ack_is_held_until_older_events_are_acked():
+    client = FakeClient([_item("r2", "P2P_RECEIVE"), _item("r1", "P2P_RECEIVE")])
+    watcher = _watcher(client)
+    r1, r2 = watcher.fetch()
+    watcher.ack(r2)
+    assert watcher._seen == []
+    assert watcher.fetch() == [r1]
+    watcher.ack(r1)
+    assert watcher._seen == ["r2", "r1"]
+
+def test_run_retries_from_failed_event():
+    client = FakeClient([_item("r2", "P2P_RECEIVE"), _item("s1", "P2P_SEND"), _item("r1", "P2P_RECEIVE")])
+    watcher = _watcher(client)
+    handled = []
+
+    def handler(event):
+        handled.append(event.order_id)
+        if handled == ["r1"]:
+            raise RuntimeError("handler failed")
+        if event.order_id == "r2":
+            watcher.stop()
+
+    watcher.run(handler)
+    assert handled == ["r1", "r1", "r2"]
+    assert watcher.fetch() == []
+
+def test_run_async_retries_from_failed_event():
+    client = FakeAsyncClient([_item("r2", "P2P_RECEIVE"), _item("r1", "P2P_RECEIVE")])
+    watcher = _watcher(client)
+    handled = []
+
+    async def handler(event):
+        handled.append(event.order_id)
+        if handled == ["r1"]:
+            raise RuntimeError("handler failed")
+        if event.order_id == "r2":
+            watcher.stop()
+
+    asyncio.run(watcher.run_async(handler))
+    assert handled == ["r1", "r1", "r2"]
+
+def test_acked_state_survives_restart(tmp_path):
+    path = str(tmp_path / "watcher.json")
+    client = FakeClient([_item("r1", "P2P_RECEIVE")])
+    watcher = _watcher(client, state_path=path)
+    watcher.poll()
+    client.items.insert(0, _item("r2", "P2P_RECEIVE"))
+    assert [event.order_id for event in _watcher(client, state_path=path).fetch()] == ["r2"]